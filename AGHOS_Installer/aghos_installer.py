@@ -10,14 +10,16 @@ License: Open Source, provided under the MIT License.
 
 import sys
 import os
-import glob
-import importlib.util
+
+# trace pierwszy – jego czas importu to punkt zero pomiaru „pierwszego okna”
+from aghos_installer import trace, stages, logsink
+
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel,
-    QComboBox, QPushButton, QDialog, QTextEdit
+    QComboBox, QPushButton, QDialog, QPlainTextEdit
 )
 from PySide6.QtGui import QPixmap, QPalette, QColor
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
 LANGUAGES = {
     "Polski": "pl",
@@ -33,9 +35,16 @@ class ConsoleWindow(QDialog):
         self.setWindowTitle("Konsola")
         self.setGeometry(300, 200, 800, 400)
         layout = QVBoxLayout()
-        self.console_output = QTextEdit()
+        # zwykły tekst z limitem wierszy – najstarsze znikają, pełny log jest w logsink.LOG_PATH
+        self.console_output = QPlainTextEdit()
         self.console_output.setReadOnly(True)
+        self.console_output.setMaximumBlockCount(logsink.CONSOLE_LINES)
         layout.addWidget(self.console_output)
+        # wiersze z dowolnych wątków trafiają do kolejki; timer wkleja je partiami
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(100)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start()
         
         
 
@@ -52,14 +61,19 @@ class ConsoleWindow(QDialog):
         self.setLayout(layout)
 
     def append(self, text):
-        self.console_output.append(text)
+        logsink.write(text)
+
+    def flush(self):
+        batch = logsink.drain()
+        if batch:
+            self.console_output.appendPlainText("\n".join(batch))
 
 class AghOsInstaller(QMainWindow):
     def __init__(self):
         super().__init__()
         self.lang_code = "pl"
         self.console_window = ConsoleWindow(self)
-        self.script_queue = []
+        self.stages = stages.Orchestrator(self.console_window)
 
         self.setWindowTitle("AGHOS Installer")
         self.setGeometry(100, 100, 1000, 700)
@@ -99,7 +113,8 @@ class AghOsInstaller(QMainWindow):
         self.layout.addWidget(author_label)
 
         self.set_language("Polski")
-        self.index_scripts()
+        # etap 1 (import i dane) przygotowuje się w tle, gdy użytkownik wybiera język
+        QTimer.singleShot(0, lambda: self.stages.prepare(0))
 
     def set_language(self, lang_display):
         self.lang_code = LANGUAGES.get(lang_display, "pl")
@@ -125,34 +140,18 @@ class AghOsInstaller(QMainWindow):
             "fr": "Afficher la console"
         }.get(self.lang_code, "Pokaż konsolę"))
 
-    def index_scripts(self):
-        script_folder = os.path.join(os.path.dirname(__file__), "scripts")
-        if not os.path.exists(script_folder):
-            os.makedirs(script_folder)
-        script_files = sorted(glob.glob(os.path.join(script_folder, "*.py")))
-        self.script_queue = sorted(script_files, key=lambda x: int(os.path.basename(x).split("_")[0]))
-
     def run_first_script(self):
-        if not self.script_queue:
+        if not self.stages.stages:
             self.console_window.append("⚠️ Brak skryptów do uruchomienia.")
             return
-
-        script_path = self.script_queue[0]
-        module_name = os.path.splitext(os.path.basename(script_path))[0]
-        spec = importlib.util.spec_from_file_location(module_name, script_path)
-        if spec and spec.loader:
-            module = importlib.util.module_from_spec(spec)
-            try:
-                spec.loader.exec_module(module)
-                if hasattr(module, "run"):
-                    module.run(self.lang_code, self.console_window)
-                else:
-                    self.console_window.append(f"⚠️ Skrypt {module_name} nie zawiera funkcji run().\n")
-            except Exception as e:
-                self.console_window.append(f"❌ Błąd w {module_name}:\n{str(e)}\n")
+        self.stages.start(self.lang_code)
 
 if __name__ == "__main__":
+    # ślad instalacji (trace.json + podsumowanie), AGHOS_PROFILE=1 – cProfile etapów
+    trace.install()
+    trace.enter_stage("0_start")
     app = QApplication(sys.argv)
+    ui_stalls = trace.watch_ui_stalls()
     app.setStyle("Fusion")
 
     dark_palette = QPalette()
@@ -194,4 +193,8 @@ if __name__ == "__main__":
 
     window = AghOsInstaller()
     window.show()
+    QTimer.singleShot(0, lambda: trace.since_start('first_window'))
+    if os.environ.get('AGHOS_BENCH_QUIT'):
+        # stages --bench: tylko pomiar czasu do pierwszego okna
+        QTimer.singleShot(0, app.quit)
     sys.exit(app.exec())
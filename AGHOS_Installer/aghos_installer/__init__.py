@@ -0,0 +1,6 @@
+"""
+Wspólne moduły instalatora AGHOS (bez zależności od widżetów Qt).
+
+Skrypty z katalogu scripts/ ładowane są po ścieżce, więc dopisują katalog
+AGHOS_Installer do sys.path i importują stąd np. `aghos_installer.stream`.
+"""
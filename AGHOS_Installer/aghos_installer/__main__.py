@@ -0,0 +1,48 @@
+"""
+Instalacja bez ekranu (konsola szeregowa, PXE):
+
+    python -m aghos_installer --unattended plan.json
+
+Format pliku odpowiedzi – aghos_installer.engine.plan.
+"""
+
+import os
+import sys
+import argparse
+
+from aghos_installer import trace, logsink
+from aghos_installer.engine import StageError, plan
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m aghos_installer",
+                                 description="Instalator AGHOS bez GUI")
+    ap.add_argument('--unattended', metavar='PLAN', required=True,
+                    help="plik odpowiedzi JSON/YAML")
+    args = ap.parse_args(argv)
+
+    if os.geteuid() != 0:
+        print("❌ Uruchom jako root.", file=sys.stderr)
+        return 1
+
+    def log(msg: str):
+        print(msg, flush=True)
+        logsink.write(msg)
+
+    trace.install()
+    try:
+        plan.run(plan.load(args.unattended), log=log)
+    except StageError as e:
+        log(f"❌ {e.title}: {e}")
+        return 1
+    except Exception as e:
+        log(f"❌ {type(e).__name__}: {e}")
+        return 1
+    finally:
+        # etapy, procesy, przepustowość → tabela + trace.json
+        trace.finish(log=log)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
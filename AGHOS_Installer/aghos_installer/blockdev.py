@@ -0,0 +1,327 @@
+"""
+Inwentarz urządzeń blokowych współdzielony przez etapy instalatora.
+
+Jeden odczyt /sys/block i /sys/class/block/*/size (rozmiary, hierarchia
+dysk → partycja) oraz jedno `lsblk -J -O -b` (UUID, PARTUUID, fstype,
+model) – uruchamiane równolegle z przeglądaniem sysfs. Zamiast
+`lsblk`/`blkid` przy każdym zapytaniu edytor partycji i generator fstab
+pytają `inventory()`. Dane są unieważniane przez zdarzenia udev
+(`udevadm monitor`, jeśli jest dostępny) albo jawnie przez `refresh()`
+/ `invalidate()` – np. po partycjonowaniu i mkfs.
+
+Inwentarz działa też na sztucznym drzewie sysfs:
+    Inventory(sysfs='/tmp/fake/sys', lsblk=None)
+i tak sprawdza go `python -m aghos_installer.blockdev --selftest`.
+"""
+
+import os
+import sys
+import json
+import atexit
+import shutil
+import threading
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+SECTOR = 512
+
+
+class BlockDevice:
+    __slots__ = ('name', 'path', 'type', 'size', 'parent', 'number', 'model', 'removable',
+                 'rotational', 'fstype', 'uuid', 'partuuid', 'label', 'partlabel',
+                 'mountpoints', 'children')
+
+    def __init__(self, name: str, type: str = 'disk', size: int = 0, parent: Optional[str] = None):
+        self.name = name
+        self.path = f"/dev/{name}"
+        self.type = type
+        self.size = size
+        self.parent = parent
+        self.number = 0
+        self.model = ''
+        self.removable = False
+        self.rotational = False
+        self.fstype: Optional[str] = None
+        self.uuid: Optional[str] = None
+        self.partuuid: Optional[str] = None
+        self.label: Optional[str] = None
+        self.partlabel: Optional[str] = None
+        self.mountpoints: List[str] = []
+        self.children: List[str] = []
+
+    def __repr__(self):
+        return f"BlockDevice({self.path} {self.type} {self.size} B)"
+
+
+def _read(path: str, default: str = '') -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def _run_lsblk() -> subprocess.Popen:
+    return subprocess.Popen(['lsblk', '-J', '-O', '-b'], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True)
+
+
+class Inventory:
+    """
+    Migawka urządzeń blokowych. `lsblk` to funkcja zwracająca Popen z JSON-em
+    na stdout (domyślnie `lsblk -J -O -b`); None – tylko sysfs.
+    """
+
+    def __init__(self, sysfs: str = '/sys', lsblk=_run_lsblk):
+        self.sysfs = sysfs
+        self.lsblk = lsblk
+        self._lock = threading.Lock()
+        self._devices: Optional[Dict[str, BlockDevice]] = None
+
+    # ---- odczyt ----
+
+    def _scan_sysfs(self) -> Dict[str, BlockDevice]:
+        devs: Dict[str, BlockDevice] = {}
+        cls = os.path.join(self.sysfs, 'class', 'block')
+        disks = set(os.listdir(os.path.join(self.sysfs, 'block'))) \
+            if os.path.isdir(os.path.join(self.sysfs, 'block')) else set()
+        names = sorted(os.listdir(cls)) if os.path.isdir(cls) else sorted(disks)
+        for name in names:
+            node = os.path.join(cls, name)
+            if not os.path.exists(node):
+                node = os.path.join(self.sysfs, 'block', name)
+            size = int(_read(os.path.join(node, 'size'), '0') or 0) * SECTOR
+            number = _read(os.path.join(node, 'partition'))
+            if number:
+                parent = os.path.basename(os.path.dirname(os.path.realpath(node)))
+                devs[name] = BlockDevice(name, 'part', size, parent)
+                devs[name].number = int(number)
+            elif name in disks:
+                d = BlockDevice(name, 'disk', size)
+                d.removable = _read(os.path.join(node, 'removable')) == '1'
+                d.rotational = _read(os.path.join(node, 'queue', 'rotational')) == '1'
+                d.model = _read(os.path.join(node, 'device', 'model'))
+                devs[name] = d
+        for d in devs.values():
+            if d.parent in devs:
+                devs[d.parent].children.append(d.name)
+        return devs
+
+    @staticmethod
+    def _merge_lsblk(devs: Dict[str, BlockDevice], data: dict):
+        stack = list(data.get('blockdevices', []))
+        while stack:
+            e = stack.pop()
+            stack.extend(e.get('children') or [])
+            name = e.get('kname') or e.get('name')
+            d = devs.get(name)
+            if d is None:
+                # np. dm/LVM bez wpisu w /sys/block – bierzemy z lsblk
+                d = devs[name] = BlockDevice(name, e.get('type') or 'disk', int(e.get('size') or 0),
+                                             e.get('pkname'))
+            if e.get('type'):
+                d.type = e['type']
+            if e.get('model'):
+                d.model = e['model'].strip()
+            d.fstype = e.get('fstype')
+            d.uuid = e.get('uuid')
+            d.partuuid = e.get('partuuid')
+            d.label = e.get('label')
+            d.partlabel = e.get('partlabel')
+            d.mountpoints = [m for m in (e.get('mountpoints') or [e.get('mountpoint')]) if m]
+
+    def refresh(self) -> "Inventory":
+        """Ponowny odczyt: lsblk działa w tle, a w tym czasie przeglądamy sysfs."""
+        proc = self.lsblk() if self.lsblk else None
+        devs = self._scan_sysfs()
+        if proc is not None:
+            out, _ = proc.communicate()
+            if proc.returncode == 0 and out:
+                try:
+                    self._merge_lsblk(devs, json.loads(out))
+                except ValueError:
+                    pass
+        with self._lock:
+            self._devices = devs
+        return self
+
+    def invalidate(self):
+        with self._lock:
+            self._devices = None
+
+    def _all(self) -> Dict[str, BlockDevice]:
+        with self._lock:
+            devs = self._devices
+        if devs is None:
+            devs = self.refresh()._devices
+        return devs
+
+    # ---- zapytania ----
+
+    def get(self, dev: str) -> Optional[BlockDevice]:
+        """Urządzenie po nazwie (`sda1`) albo ścieżce (`/dev/sda1`, dowiązania udev)."""
+        name = os.path.basename(os.path.realpath(dev)) if dev.startswith('/dev/') else dev
+        return self._all().get(name)
+
+    def size(self, dev: str) -> int:
+        d = self.get(dev)
+        return d.size if d else 0
+
+    def disks(self) -> List[BlockDevice]:
+        """Dyski o niezerowym rozmiarze (jak `lsblk -d`)."""
+        return [d for d in self._all().values() if d.parent is None and d.type != 'part' and d.size > 0]
+
+    def partitions(self, disk: str) -> List[BlockDevice]:
+        d = self.get(disk)
+        if not d:
+            return []
+        devs = self._all()
+        return sorted((devs[c] for c in d.children if c in devs), key=lambda p: p.number)
+
+    def id_for(self, dev: str) -> Tuple[Optional[str], Optional[str]]:
+        """('UUID', …) albo ('PARTUUID', …) do fstab; (None, None) gdy brak."""
+        d = self.get(dev)
+        if d and d.uuid:
+            return 'UUID', d.uuid
+        if d and d.partuuid:
+            return 'PARTUUID', d.partuuid
+        return None, None
+
+    def by_fstype(self, fstype: str) -> List[BlockDevice]:
+        return [d for d in self._all().values() if d.fstype == fstype]
+
+
+# ---- współdzielona instancja + unieważnianie przez udev ----
+
+_inventory: Optional[Inventory] = None
+_watcher: Optional[subprocess.Popen] = None
+
+
+def _watch_udev(inv: Inventory):
+    global _watcher
+    udevadm = shutil.which('udevadm')
+    if not udevadm:
+        return
+    try:
+        _watcher = subprocess.Popen([udevadm, 'monitor', '--udev', '--subsystem-match=block'],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except OSError:
+        return
+    atexit.register(_stop_watch)
+    proc = _watcher
+
+    def loop():
+        for line in proc.stdout:
+            if line.startswith('UDEV'):
+                inv.invalidate()
+
+    threading.Thread(target=loop, daemon=True).start()
+
+
+def _stop_watch():
+    """Kończy `udevadm monitor` razem z instalatorem (inaczej żyje do następnego zapisu)."""
+    global _watcher
+    w, _watcher = _watcher, None
+    if w is not None and w.poll() is None:
+        w.terminate()
+        try:
+            w.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            w.kill()
+            w.wait()
+
+
+def inventory() -> Inventory:
+    """Wspólny inwentarz (leniwie tworzony; unieważniany zdarzeniami udev)."""
+    global _inventory
+    if _inventory is None:
+        _inventory = Inventory()
+        _watch_udev(_inventory)
+    return _inventory
+
+
+def _selftest() -> int:
+    import tempfile
+
+    failed = []
+
+    def check(name: str, ok: bool, detail: str = ''):
+        print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+        if not ok:
+            failed.append(name)
+
+    def write(path: str, text: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text + "\n")
+
+    with tempfile.TemporaryDirectory() as sysfs:
+        devices = os.path.join(sysfs, 'devices', 'virtual', 'block')
+
+        def disk(name: str, sectors: int, rotational='0', removable='0', model=''):
+            d = os.path.join(devices, name)
+            write(os.path.join(d, 'size'), str(sectors))
+            write(os.path.join(d, 'removable'), removable)
+            write(os.path.join(d, 'queue', 'rotational'), rotational)
+            if model:
+                write(os.path.join(d, 'device', 'model'), model)
+            for link in (os.path.join(sysfs, 'block', name), os.path.join(sysfs, 'class', 'block', name)):
+                os.makedirs(os.path.dirname(link), exist_ok=True)
+                os.symlink(d, link)
+
+        def part(parent: str, name: str, number: int, sectors: int):
+            d = os.path.join(devices, parent, name)
+            write(os.path.join(d, 'size'), str(sectors))
+            write(os.path.join(d, 'partition'), str(number))
+            os.symlink(d, os.path.join(sysfs, 'class', 'block', name))
+
+        disk('sda', 2 * 1024 ** 3 // SECTOR, rotational='1', model='QEMU HARDDISK')
+        disk('nvme0n1', 4 * 1024 ** 3 // SECTOR)
+        disk('loop0', 0)                        # pusty loop – pomijany jak w `lsblk -d`
+        part('sda', 'sda2', 2, 2048)
+        part('sda', 'sda1', 1, 4096)
+        part('nvme0n1', 'nvme0n1p1', 1, 8192)
+
+        lsblk = {'blockdevices': [
+            {'kname': 'sda', 'type': 'disk', 'children': [
+                {'kname': 'sda1', 'type': 'part', 'fstype': 'vfat', 'uuid': 'AB12-CD34'},
+                {'kname': 'sda2', 'type': 'part', 'partuuid': '0000-p2'}]},
+            {'kname': 'nvme0n1', 'type': 'disk', 'model': 'Fake NVMe  ', 'children': [
+                {'kname': 'nvme0n1p1', 'type': 'part', 'fstype': 'ext4', 'uuid': 'u-root',
+                 'mountpoints': ['/mnt', None]}]},
+        ]}
+
+        def fake_lsblk():
+            return subprocess.Popen([sys.executable, '-c', f"print({json.dumps(json.dumps(lsblk))})"],
+                                    stdout=subprocess.PIPE, text=True)
+
+        inv = Inventory(sysfs=sysfs, lsblk=fake_lsblk)
+        disks = {d.name: d for d in inv.disks()}
+        check("dyski (bez pustego loop)", sorted(disks) == ['nvme0n1', 'sda'], ' '.join(sorted(disks)))
+        check("atrybuty z sysfs", disks['sda'].rotational and disks['sda'].model == 'QEMU HARDDISK'
+              and disks['sda'].size == 2 * 1024 ** 3)
+        parts = [p.name for p in inv.partitions('/dev/sda')]
+        check("partycje wg numeru", parts == ['sda1', 'sda2'], ' '.join(parts))
+        check("rodzic partycji NVMe", inv.get('nvme0n1p1').parent == 'nvme0n1')
+        check("UUID, potem PARTUUID", inv.id_for('/dev/sda1') == ('UUID', 'AB12-CD34')
+              and inv.id_for('sda2') == ('PARTUUID', '0000-p2') and inv.id_for('sda') == (None, None))
+        check("dane z lsblk", disks['nvme0n1'].model == 'Fake NVMe'
+              and inv.get('nvme0n1p1').mountpoints == ['/mnt']
+              and [d.name for d in inv.by_fstype('ext4')] == ['nvme0n1p1'])
+
+        part('nvme0n1', 'nvme0n1p2', 2, 8192)
+        check("migawka do unieważnienia", inv.get('nvme0n1p2') is None)
+        inv.invalidate()
+        check("po invalidate() nowa partycja", [p.name for p in inv.partitions('nvme0n1')]
+              == ['nvme0n1p1', 'nvme0n1p2'])
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    if '--selftest' in sys.argv:
+        sys.exit(_selftest())
+    for disk in inventory().disks():
+        print(f"{disk.path:16} {disk.size / 1024**3:8.1f} GB  {disk.model}")
+        for p in inventory().partitions(disk.name):
+            print(f"  {p.path:14} {p.size / 1024**3:8.1f} GB  {p.fstype or '-':6} {p.uuid or ''}")
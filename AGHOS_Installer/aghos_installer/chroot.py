@@ -0,0 +1,264 @@
+"""
+Jedna sesja chroot na całą konfigurację systemu.
+
+`arch-chroot` przy każdym wywołaniu montuje i odmontowuje proc/sys/dev/run,
+które konfiguracja i tak montuje raz (rbind) przed wejściem do /mnt.
+`ChrootSession` uruchamia jeden `chroot /mnt /bin/sh` i wysyła mu polecenia
+przez potok; po każdym poleceniu powłoka wypisuje znacznik z kodem wyjścia,
+więc każde polecenie ma własny kod, wyjście (stdout+stderr) i czas.
+`ChrootPool` trzyma kilka takich sesji dla kroków wykonywanych równolegle.
+
+Dane wejściowe (np. hasła dla chpasswd) idą przez heredoc, nie przez argv.
+Proste edycje plików (`write_file`, `set_shell_vars`) robimy w procesie,
+bezpośrednio pod /mnt – bez `bash -c`, `sed` i `printf`.
+"""
+
+import os
+import re
+import time
+import queue
+import shlex
+import secrets
+import threading
+import subprocess
+from typing import Callable, Dict, List, Optional, Sequence
+
+from aghos_installer import trace
+
+CHROOT_ENV = {
+    'PATH': '/usr/local/sbin:/usr/local/bin:/usr/bin:/usr/sbin:/bin:/sbin',
+    'HOME': '/root',
+    'LANG': 'C.UTF-8',
+    'TERM': 'dumb',
+    'SHELL': '/bin/sh',
+}
+
+
+class ChrootError(RuntimeError):
+    pass
+
+
+def _nolog(_msg: str):
+    pass
+
+
+def _summary(results: List["ChrootResult"], seconds: float) -> str:
+    bad = sum(1 for r in results if not r.ok)
+    return f"⏱ chroot: {len(results)} poleceń w {seconds:0.1f} s (błędy: {bad})"
+
+
+class ChrootResult:
+    __slots__ = ('argv', 'rc', 'output', 'seconds')
+
+    def __init__(self, argv: List[str], rc: int, output: str, seconds: float):
+        self.argv = argv
+        self.rc = rc
+        self.output = output
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.rc == 0
+
+    def __repr__(self):
+        return f"ChrootResult({self.argv[0]!r}, rc={self.rc}, {self.seconds:0.2f} s)"
+
+
+class ChrootSession:
+    """
+    with ChrootSession('/mnt', log) as ch:
+        r = ch.run(['locale-gen'])
+        ch.run(['chpasswd'], input="root:…\\n")
+    """
+
+    def __init__(self, root: str = '/mnt', log: Callable[[str], None] = print):
+        self.root = root
+        self.log = log
+        self.results: List[ChrootResult] = []
+        self._proc: Optional[subprocess.Popen] = None
+        self._tok = secrets.token_hex(8)
+        self._started = 0.0
+
+    def start(self) -> "ChrootSession":
+        if not os.path.exists(os.path.join(self.root, 'bin/sh')):
+            raise ChrootError(f"Brak {self.root}/bin/sh – system nie został rozpakowany?")
+        self._started = time.monotonic()
+        self._proc = subprocess.Popen(['chroot', self.root, '/bin/sh'],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.STDOUT, env=CHROOT_ENV,
+                                      text=True, bufsize=1, cwd='/')
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _script(self, argv: Sequence[str], input: Optional[str]) -> str:
+        cmd = ' '.join(shlex.quote(str(a)) for a in argv)
+        if input is None:
+            # stdin z /dev/null – polecenie nie może zjeść kolejnych poleceń z potoku
+            body = f"{cmd} </dev/null 2>&1\n"
+        else:
+            eof = f"__AGHOS_IN_{self._tok}"
+            data = input if input.endswith('\n') else input + '\n'
+            body = f"{cmd} 2>&1 <<'{eof}'\n{data}{eof}\n"
+        return body + f"printf '\\n__AGHOS_RC_{self._tok} %d\\n' \"$?\"\n"
+
+    def run(self, argv: Sequence[str], input: Optional[str] = None) -> ChrootResult:
+        """Wykonuje `argv` w chroocie; zwraca kod wyjścia, wyjście i czas."""
+        if self._proc is None or self._proc.poll() is not None:
+            raise ChrootError("Sesja chroot nie działa")
+        argv = [str(a) for a in argv]
+        start = trace.now_us()
+        t0 = time.perf_counter()
+        try:
+            self._proc.stdin.write(self._script(argv, input))
+            self._proc.stdin.flush()
+        except BrokenPipeError:
+            raise ChrootError("Sesja chroot zakończyła się nieoczekiwanie")
+
+        marker = f"__AGHOS_RC_{self._tok} "
+        out: List[str] = []
+        while True:
+            line = self._proc.stdout.readline()
+            if not line:
+                raise ChrootError(f"Sesja chroot zakończyła się podczas: {argv[0]}")
+            if line.startswith(marker):
+                rc = int(line[len(marker):])
+                break
+            out.append(line)
+        # printf dokłada '\n' przed znacznikiem
+        text = ''.join(out)
+        text = text[:-1] if text.endswith('\n') else text
+
+        res = ChrootResult(argv, rc, text, time.perf_counter() - t0)
+        self.results.append(res)
+        trace.complete(os.path.basename(argv[0]), 'chroot', start, trace.now_us() - start,
+                       argv=argv, exit=rc)
+        return res
+
+    def batch(self, cmds: Sequence[Sequence[str]], stop_on_error: bool = False) -> List[ChrootResult]:
+        out = []
+        for argv in cmds:
+            r = self.run(argv)
+            out.append(r)
+            if stop_on_error and not r.ok:
+                break
+        return out
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.write("exit 0\n")
+            proc.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        self.log(_summary(self.results, time.monotonic() - self._started))
+
+
+class ChrootPool:
+    """
+    Do `size` sesji naraz, uruchamianych w miarę potrzeby – równoległe kroki
+    (taskgraph) dostają osobne powłoki; interfejs `run()` jak w ChrootSession.
+    """
+
+    def __init__(self, root: str = '/mnt', size: int = 2, log: Callable[[str], None] = print):
+        self.root = root
+        self.size = size
+        self.log = log
+        self._idle: "queue.Queue[Optional[ChrootSession]]" = queue.Queue()
+        self._all: List[ChrootSession] = []
+        self._free = size       # ile powłok można jeszcze uruchomić
+        self._lock = threading.Lock()
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _spawn(self) -> ChrootSession:
+        ses = ChrootSession(self.root, log=_nolog).start()
+        with self._lock:
+            self._all.append(ses)
+        return ses
+
+    def _acquire(self) -> ChrootSession:
+        with self._lock:
+            spawn = self._idle.empty() and self._free > 0
+            if spawn:
+                self._free -= 1
+        # None w kolejce = miejsce po martwej powłoce
+        ses = None if spawn else self._idle.get()
+        return ses or self._spawn()
+
+    def run(self, argv: Sequence[str], input: Optional[str] = None) -> ChrootResult:
+        ses = self._acquire()
+        try:
+            res = ses.run(argv, input)
+        except ChrootError:
+            # martwa powłoka nie wraca do puli; jej miejsce dostaje kolejne wywołanie
+            with self._lock:
+                self._all.remove(ses)
+            ses.close()
+            self._idle.put(None)
+            raise
+        self._idle.put(ses)
+        return res
+
+    @property
+    def results(self) -> List[ChrootResult]:
+        return [r for ses in self._all for r in ses.results]
+
+    def close(self):
+        results = self.results
+        for ses in self._all:
+            ses.close()
+        self._all = []
+        if results:
+            self.log(_summary(results, time.monotonic() - self._started))
+
+
+# ---- edycje plików w procesie ----
+
+def write_file(path: str, text: str, mode: int = 0o644):
+    """Atomowy zapis (tmp + rename) z prawami `mode`."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.aghos-tmp"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.chmod(tmp, mode)
+    os.replace(tmp, path)
+
+
+def set_shell_vars(path: str, values: Dict[str, str]):
+    """
+    KEY=wartość w pliku w stylu /etc/default/grub: podmienia aktywne linie
+    `KEY=` (zakomentowane zostają), brakujące klucze dopisuje na końcu.
+    """
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        lines = []
+    todo = dict(values)
+    for i, line in enumerate(lines):
+        m = re.match(r'^\s*([A-Za-z_][A-Za-z0-9_]*)=', line)
+        if m and m.group(1) in values:
+            lines[i] = f"{m.group(1)}={values[m.group(1)]}"
+            todo.pop(m.group(1), None)
+    lines += [f"{k}={v}" for k, v in todo.items()]
+    mode = os.stat(path).st_mode & 0o7777 if os.path.exists(path) else 0o644
+    write_file(path, "\n".join(lines) + "\n", mode)
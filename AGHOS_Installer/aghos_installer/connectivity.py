@@ -0,0 +1,130 @@
+"""
+Sprawdzanie łączności bez blokowania GUI i bez jednorazowego „zgadywania”.
+
+`check()` ściga kilka sond naraz, w stylu Happy Eyeballs (każda kolejna
+startuje `STAGGER` s po poprzedniej, pierwsza udana wygrywa, reszta jest
+anulowana): TCP do DNS Cloudflare po IPv4 i IPv6 oraz połączenie z serwerem
+AGHOS (rozwiązanie nazwy + TCP 443, v4/v6 wg RFC 8305 w asyncio).
+
+`wait_online()` nie sprawdza raz, tuż po `nmcli con up`, gdy DHCP jeszcze
+trwa: ponawia sondy po każdej zmianie stanu NetworkManagera (`nmcli
+monitor`), aż do skutku albo limitu czasu, i raportuje postęp przez
+`status` – w GUI podpięte pod sygnał statusu zadania (`jobs.submit`).
+"""
+
+import time
+import select
+import asyncio
+import subprocess
+from typing import Callable, List, Optional, Tuple
+
+ORIGIN = ("aghos.agh.edu.pl", 443)
+PROBES: List[Tuple[str, str, int]] = [
+    ('dns-v4', '1.1.1.1', 53),
+    ('dns-v6', '2606:4700:4700::1111', 53),
+    ('aghos', ORIGIN[0], ORIGIN[1]),
+]
+STAGGER = 0.25
+PROBE_TIMEOUT = 3.0
+
+
+def _nolog(_msg: str):
+    pass
+
+
+class Result:
+    __slots__ = ('ok', 'via', 'seconds', 'errors')
+
+    def __init__(self, ok: bool, via: Optional[str], seconds: float, errors: dict):
+        self.ok = ok
+        self.via = via
+        self.seconds = seconds
+        self.errors = errors
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        if self.ok:
+            return f"Result(ok via {self.via}, {self.seconds * 1e3:0.0f} ms)"
+        return f"Result(brak łączności: {self.errors})"
+
+
+async def _probe(name: str, host: str, port: int, delay: float, timeout: float) -> str:
+    await asyncio.sleep(delay)
+    _r, w = await asyncio.wait_for(
+        asyncio.open_connection(host, port, happy_eyeballs_delay=STAGGER), timeout)
+    w.close()
+    return name
+
+
+async def _race(probes, timeout: float) -> Tuple[Optional[str], dict]:
+    tasks = {asyncio.ensure_future(_probe(n, h, p, i * STAGGER, timeout)): n
+             for i, (n, h, p) in enumerate(probes)}
+    errors = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    return t.result(), errors
+                e = t.exception()
+                errors[tasks[t]] = str(e) or type(e).__name__
+        return None, errors
+    finally:
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+
+def check(probes=PROBES, timeout: float = PROBE_TIMEOUT) -> Result:
+    """Pierwsza udana sonda z `probes` (równolegle, z przesunięciem STAGGER)."""
+    t0 = time.perf_counter()
+    via, errors = asyncio.run(_race(probes, timeout))
+    return Result(via is not None, via, time.perf_counter() - t0, errors)
+
+
+def _nm_monitor() -> Optional[subprocess.Popen]:
+    try:
+        return subprocess.Popen(['nmcli', 'monitor'], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    except OSError:
+        return None
+
+
+def wait_online(timeout: float = 30.0, status: Callable[[str], None] = _nolog,
+                log: Callable[[str], None] = _nolog, probes=PROBES, poll: float = 3.0) -> Result:
+    """
+    Sondy po każdym zdarzeniu NetworkManagera (a bez niego co `poll` s),
+    aż do łączności albo `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    mon = _nm_monitor()
+    try:
+        while True:
+            res = check(probes)
+            if res.ok or time.monotonic() >= deadline:
+                return res
+            status("Czekam na sieć…")
+            # następna próba po zmianie stanu NM (DHCP, łączność) albo po `poll` s
+            wait = min(poll, max(deadline - time.monotonic(), 0))
+            if mon is not None and mon.poll() is None:
+                ready, _, _ = select.select([mon.stdout], [], [], wait)
+                if ready:
+                    line = mon.stdout.readline().strip()
+                    if line:
+                        log(f"  NM: {line}")
+                        status(line)
+            else:
+                time.sleep(wait)
+    finally:
+        if mon is not None:
+            mon.terminate()
+            mon.wait()
+
+
+if __name__ == '__main__':
+    for _ in range(3):
+        print(check())
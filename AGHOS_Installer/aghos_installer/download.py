@@ -0,0 +1,440 @@
+"""
+Równoległe pobieranie archiwów RootFS zakresami HTTP (Range) ze wznawianiem.
+
+Plik docelowy jest prealokowany na pełny `Content-Length`, dzielony na N
+zakresów pobieranych przez pulę wątków i zapisywanych `os.pwrite` pod
+właściwy offset. Postęp każdego zakresu trafia do pliku `<dest>.state`,
+więc przerwane pobieranie wznawia się od miejsca, w którym stanęło.
+Gdy serwer ignoruje nagłówek Range, pobieramy jednym strumieniem.
+
+SHA-512 liczona jest w trakcie pobierania: wątek wywołujący dohashowuje
+ciągły, już zapisany prefiks pliku (czytany z page cache), więc po
+zakończeniu nie trzeba czytać archiwum drugi raz.
+
+Zamiast jednego adresu można podać listę luster (`mirrors.select`):
+zakresy rozkładane są na `stripe` pierwszych, a zakres przerwany błędem
+przejmuje – od miejsca przerwania – następne lustro z listy.
+
+`python -m aghos_installer.download --selftest` sprawdza to wszystko na
+lokalnym `http.server` z obsługą Range: równoległe zakresy, wznowienie
+z `.state`, serwer odpowiadający 200 zamiast 206 i serwer bez Range.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import time
+import threading
+import http.client
+import urllib.request
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+CHUNK = 1024 * 1024
+MIN_PART = 8 * 1024 * 1024
+STATE_EVERY = 4 * 1024 * 1024
+TIMEOUT = 30
+
+
+# błędy sieci, po których zakres może przejąć inne lustro
+NET_ERRORS = (OSError, http.client.HTTPException)
+
+
+def _nolog(_msg: str):
+    pass
+
+
+class RangeNotSupported(RuntimeError):
+    pass
+
+
+class Cancelled(RuntimeError):
+    """Pobieranie zatrzymane przez `cancel` – stan w `<dest>.state` pozwala je wznowić."""
+
+
+def _host(url: str) -> str:
+    return urllib.parse.urlsplit(url).netloc or url
+
+
+def state_path(dest: str) -> str:
+    return dest + ".state"
+
+
+def probe(url: str) -> Tuple[int, bool]:
+    """Zwraca (rozmiar, czy serwer obsługuje Range)."""
+    req = urllib.request.Request(url, headers={'Range': 'bytes=0-0'})
+    with urllib.request.urlopen(req, timeout=TIMEOUT) as r:
+        if r.status == 206:
+            crange = r.getheader('Content-Range') or ''
+            total = crange.rpartition('/')[2]
+            if total.isdigit():
+                return int(total), True
+        return int(r.getheader('Content-Length') or 0), False
+
+
+def split_ranges(size: int, parts: int) -> List[List[int]]:
+    """Dzieli [0, size) na zakresy [start, end (włącznie), pos]."""
+    parts = max(1, min(parts, size // MIN_PART or 1))
+    step = -(-size // parts)
+    return [[s, min(s + step, size) - 1, s] for s in range(0, size, step)]
+
+
+class _State:
+    def __init__(self, path: str, url: str, size: int, ranges: List[List[int]]):
+        self.path = path
+        self.url = url
+        self.size = size
+        self.ranges = ranges
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, urls: Sequence[str], size: int) -> Optional["_State"]:
+        """Stan wznawiania, jeśli dotyczy tego samego pliku (z dowolnego lustra z `urls`)."""
+        try:
+            with open(path) as f:
+                d = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if d.get('url') not in urls or d.get('size') != size:
+            return None
+        return cls(path, d['url'], size, [list(r) for r in d['ranges']])
+
+    def contiguous(self) -> int:
+        """Długość ciągłego, w pełni zapisanego prefiksu pliku."""
+        with self.lock:
+            for start, end, pos in sorted(self.ranges):
+                if pos <= end:
+                    return pos
+            return self.size
+
+    def done(self) -> int:
+        with self.lock:
+            return sum(pos - start for start, _end, pos in self.ranges)
+
+    def advance(self, idx: int, pos: int):
+        with self.lock:
+            self.ranges[idx][2] = pos
+
+    def save(self):
+        with self.lock:
+            data = {'url': self.url, 'size': self.size, 'ranges': self.ranges}
+        with self.save_lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+
+
+def _fetch_range_from(url: str, fd: int, state: _State, idx: int, stop: "_Stop", chunk: int):
+    start, end, pos = state.ranges[idx]
+    if pos > end:
+        return
+    req = urllib.request.Request(url, headers={'Range': f'bytes={pos}-{end}'})
+    try:
+        with urllib.request.urlopen(req, timeout=TIMEOUT) as r:
+            if r.status != 206:
+                raise RangeNotSupported(url)
+            unsaved = 0
+            while pos <= end and not stop.is_set():
+                buf = r.read(min(chunk, end - pos + 1))
+                if not buf:
+                    raise ConnectionError(f"Połączenie przerwane na {pos}/{end}")
+                os.pwrite(fd, buf, pos)
+                pos += len(buf)
+                state.advance(idx, pos)
+                unsaved += len(buf)
+                if unsaved >= STATE_EVERY:
+                    state.save()
+                    unsaved = 0
+    finally:
+        state.save()
+
+
+def _fetch_range(urls: Sequence[str], fd: int, state: _State, idx: int, stop: "_Stop",
+                 chunk: int, log: Callable[[str], None]):
+    """Zakres `idx` z pierwszego lustra z `urls`; po błędzie dokańcza go następne."""
+    for n, url in enumerate(urls):
+        try:
+            _fetch_range_from(url, fd, state, idx, stop, chunk)
+            return
+        except (RangeNotSupported, *NET_ERRORS) as e:
+            if n == len(urls) - 1 or stop.is_set():
+                raise
+            log(f"⚠️ {_host(url)}: {e} – zakres {idx + 1} przejmuje {_host(urls[n + 1])}")
+
+
+def _range_urls(urls: Sequence[str], stripe: int, idx: int) -> List[str]:
+    """Kolejność luster dla zakresu `idx`: rotacja wśród `stripe` pierwszych, potem reszta."""
+    head = list(urls[:stripe])
+    k = idx % len(head)
+    return head[k:] + head[:k] + list(urls[stripe:])
+
+
+class _Stop:
+    """
+    Zatrzymanie wątków zakresów: własne zdarzenie albo `cancel` wywołującego.
+    `cancel` jest tylko czytany – błąd wątku nie może go ustawić (fallback na
+    jeden strumień dostałby je już ustawione i od razu rzucił `Cancelled`).
+    """
+
+    def __init__(self, cancel: Optional[threading.Event]):
+        self.own = threading.Event()
+        self.cancel = cancel
+
+    def set(self):
+        self.own.set()
+
+    def is_set(self) -> bool:
+        return self.own.is_set() or (self.cancel is not None and self.cancel.is_set())
+
+
+class _PrefixHasher:
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.h = hashlib.sha512()
+        self.pos = 0
+
+    def feed_until(self, end: int):
+        while self.pos < end:
+            buf = os.pread(self.fd, min(CHUNK * 8, end - self.pos), self.pos)
+            if not buf:
+                break
+            self.h.update(buf)
+            self.pos += len(buf)
+
+
+def _single_stream(url: str, dest: str, progress, chunk: int,
+                   cancel: Optional[threading.Event] = None) -> str:
+    h = hashlib.sha512()
+    start = time.time()
+    with urllib.request.urlopen(url, timeout=TIMEOUT) as r, open(dest, 'wb') as f:
+        total = int(r.getheader('Content-Length') or 0)
+        done = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise Cancelled(url)
+            buf = r.read(chunk)
+            if not buf:
+                break
+            h.update(buf)
+            f.write(buf)
+            done += len(buf)
+            if progress:
+                progress(done, total, done / max(time.time() - start, 0.001))
+    return h.hexdigest()
+
+
+def _single_stream_any(urls: Sequence[str], dest: str, progress, chunk: int,
+                      log: Callable[[str], None], cancel: Optional[threading.Event] = None) -> str:
+    for n, url in enumerate(urls):
+        try:
+            return _single_stream(url, dest, progress, chunk, cancel)
+        except NET_ERRORS as e:
+            if n == len(urls) - 1:
+                raise
+            log(f"⚠️ {_host(url)}: {e} – próbuję {_host(urls[n + 1])}")
+
+
+def _probe_any(urls: Sequence[str], log: Callable[[str], None]) -> Tuple[int, bool]:
+    for n, url in enumerate(urls):
+        try:
+            return probe(url)
+        except NET_ERRORS as e:
+            if n == len(urls) - 1:
+                raise
+            log(f"⚠️ {_host(url)}: {e} – próbuję {_host(urls[n + 1])}")
+
+
+def download(url: Union[str, Sequence[str]], dest: str, parts: int = 4,
+             progress: Optional[Callable[[int, int, float], None]] = None,
+             log: Callable[[str], None] = print, chunk: int = CHUNK, stripe: int = 1,
+             cancel: Optional[threading.Event] = None) -> str:
+    """
+    Pobiera `url` (albo listę luster tego samego pliku, najlepsze pierwsze) do
+    `dest`, wznawiając z `<dest>.state`, jeśli istnieje. Zakresy rozkładane są
+    na `stripe` pierwszych luster. Zwraca SHA-512 pobranego pliku; ustawienie
+    `cancel` przerywa pobieranie wyjątkiem `Cancelled` (z zapisanym stanem).
+
+    `progress(done, total, bytes_per_s)` wołane jest z wątku wywołującego,
+    więc może bezpośrednio aktualizować widżety.
+    """
+    urls = [url] if isinstance(url, str) else list(url)
+    stripe = max(1, min(stripe, len(urls)))
+    spath = state_path(dest)
+    size, ranged = _probe_any(urls, log)
+    if not ranged or not size:
+        log("Serwer nie obsługuje zakresów – pobieram jednym strumieniem.")
+        digest = _single_stream_any(urls, dest, progress, chunk, log, cancel)
+        if os.path.exists(spath):
+            os.remove(spath)
+        return digest
+
+    state = _State.load(spath, urls, size) if os.path.exists(dest) else None
+    fd = os.open(dest, os.O_RDWR | os.O_CREAT, 0o644)
+    if state:
+        log(f"Wznawiam pobieranie ({state.done() / 1024**2:0.1f} MiB już jest).")
+    else:
+        state = _State(spath, urls[0], size, split_ranges(size, max(parts, stripe)))
+        os.ftruncate(fd, 0)
+    try:
+        if os.fstat(fd).st_size != size:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, size)
+        state.save()
+
+        stop = _Stop(cancel)
+        hasher = _PrefixHasher(fd)
+        base = state.done()
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=len(state.ranges)) as pool:
+            futs = [pool.submit(_fetch_range, _range_urls(urls, stripe, i), fd, state, i, stop, chunk, log)
+                    for i in range(len(state.ranges))]
+            pending = set(futs)
+            try:
+                while pending:
+                    finished, pending = wait(pending, timeout=0.1, return_when=FIRST_EXCEPTION)
+                    for f in finished:
+                        f.result()
+                    hasher.feed_until(state.contiguous())
+                    if progress:
+                        done = state.done()
+                        progress(done, size, (done - base) / max(time.time() - start, 0.001))
+            except BaseException:
+                stop.set()
+                raise
+        if stop.is_set():
+            raise Cancelled(urls[0])
+        hasher.feed_until(size)
+    except RangeNotSupported:
+        os.close(fd)
+        fd = -1
+        log("Serwer zignorował Range – pobieram jednym strumieniem.")
+        os.remove(spath)
+        return _single_stream_any(urls, dest, progress, chunk, log, cancel)
+    finally:
+        if fd >= 0:
+            os.close(fd)
+    os.remove(spath)
+    return hasher.h.hexdigest()
+
+
+def _selftest() -> int:
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    MB = 1024 ** 2
+    blob = os.urandom(4 * MIN_PART + 3 * MB)
+    digest = hashlib.sha512(blob).hexdigest()
+
+    def server(ranges: str = 'yes', rate: float = 0):
+        """ranges: 'yes' – 206; 'probe-only' – 206 tylko dla bytes=0-0 (jak proxy); 'no' – 200."""
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_a):
+                pass
+
+            def do_GET(self):
+                start, end = 0, len(blob) - 1
+                rng = self.headers.get('Range')
+                honour = rng and (ranges == 'yes' or (ranges == 'probe-only' and rng == 'bytes=0-0'))
+                if honour:
+                    a, _, b = rng.split('=', 1)[1].partition('-')
+                    start, end = int(a), int(b) if b else len(blob) - 1
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{len(blob)}')
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Length', str(end - start + 1))
+                self.end_headers()
+                with srv.lock:
+                    srv.requested += end - start + 1
+                    srv.active += 1
+                    srv.peak = max(srv.peak, srv.active)
+                try:
+                    for pos in range(start, end + 1, 256 * 1024):
+                        buf = blob[pos:min(pos + 256 * 1024, end + 1)]
+                        self.wfile.write(buf)
+                        if rate:
+                            time.sleep(len(buf) / rate)
+                except OSError:
+                    pass        # klient przerwał (anulowanie)
+                finally:
+                    with srv.lock:
+                        srv.active -= 1
+
+        srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        srv.lock = threading.Lock()
+        srv.requested = srv.active = srv.peak = 0
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return srv, f"http://127.0.0.1:{srv.server_address[1]}/rootfs.tar.zst"
+
+    failed = []
+
+    def check(name: str, ok: bool, detail: str = ''):
+        print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+        if not ok:
+            failed.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dest = os.path.join(tmp, 'rootfs.tar.zst')
+
+        srv, url = server()
+        try:
+            got = download(url, dest, parts=4, log=_nolog)
+            check("równoległe zakresy", got == digest and srv.peak >= 4,
+                  f"{srv.peak} naraz, SHA-512 {'OK' if got == digest else 'niezgodna'}")
+        finally:
+            srv.shutdown()
+        os.remove(dest)
+
+        srv, url = server(rate=40 * MB)
+        try:
+            cancel = threading.Event()
+
+            def stop_at_third(done, total, _rate):
+                if done >= total // 3:
+                    cancel.set()
+            try:
+                download(url, dest, parts=4, progress=stop_at_third, log=_nolog, cancel=cancel)
+                check("anulowanie", False, "pobieranie nie zostało przerwane")
+            except Cancelled:
+                check("anulowanie", os.path.exists(state_path(dest)), "stan zapisany w .state")
+            first = srv.requested
+            got = download(url, dest, parts=4, log=_nolog)
+            again = srv.requested - first - 1       # bez sondy bytes=0-0
+            check("wznowienie z .state", got == digest and 0 < again < len(blob),
+                  f"dociągnięto {again / MB:0.1f} z {len(blob) / MB:0.1f} MiB")
+            check("brak .state po pobraniu", not os.path.exists(state_path(dest)))
+        finally:
+            srv.shutdown()
+        os.remove(dest)
+
+        srv, url = server('probe-only')
+        try:
+            cancel = threading.Event()      # jak etap 3 i prefetch: z własnym `cancel`
+            try:
+                got = download(url, dest, parts=4, log=_nolog, cancel=cancel)
+                check("200 zamiast 206 → jeden strumień", got == digest and not cancel.is_set())
+            except Cancelled:
+                check("200 zamiast 206 → jeden strumień", False, "Cancelled bez anulowania")
+        finally:
+            srv.shutdown()
+        os.remove(dest)
+
+        srv, url = server('no')
+        try:
+            got = download(url, dest, parts=4, log=_nolog)
+            check("serwer bez Range", got == digest and srv.peak == 1)
+        finally:
+            srv.shutdown()
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    if '--selftest' in sys.argv:
+        sys.exit(_selftest())
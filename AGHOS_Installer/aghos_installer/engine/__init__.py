@@ -0,0 +1,19 @@
+"""
+Silnik instalacji bez Qt – te same etapy co okna w scripts/, wołane
+z GUI (przez `jobs.submit`) albo bez ekranu z pliku odpowiedzi:
+
+    python -m aghos_installer --unattended plan.json
+
+Moduły etapów: `network`, `disks`, `rootfs`, `config`, `finish`; plik
+odpowiedzi i pomiar czasu etapów – `plan`. Funkcje przyjmują `log`
+(i ewentualnie `progress`/`status`) zamiast widżetów, błędy zgłaszają
+przez `StageError`.
+"""
+
+
+class StageError(RuntimeError):
+    """Błąd etapu: StageError(tytuł, treść) – GUI pokazuje tytuł w oknie dialogowym."""
+
+    def __init__(self, title: str, message: str):
+        super().__init__(message)
+        self.title = title
@@ -0,0 +1,454 @@
+"""
+Etap 3b: konfiguracja zainstalowanego systemu w /mnt – fstab (UUID/PARTUUID
++ SWAP), strefa, locale, vconsole, branding, użytkownicy, GRUB (UEFI/BIOS,
+z wpisem dla Windows).
+"""
+
+import os
+import re
+import subprocess
+from typing import Callable, List, Optional, Tuple
+
+from aghos_installer import slowtarget, taskgraph, tzlocale
+from aghos_installer.chroot import ChrootPool, write_file, set_shell_vars
+from aghos_installer.blockdev import inventory
+from aghos_installer.mounts import read_mounts, unmount_tree
+
+
+def get_id_for(dev: str) -> Tuple[Optional[str], Optional[str]]:
+    # UUID, a gdy go brak PARTUUID – z inwentarza (jedno lsblk zamiast blkid na urządzenie)
+    return inventory().id_for(dev)
+
+
+def is_mount_in_mnt(rel: str) -> bool:
+    target = os.path.join('/mnt', rel.strip('/'))
+    try:
+        return any(m.target == target for m in read_mounts())
+    except OSError:
+        return False
+
+
+def detect_root_disk_for_mnt():
+    try:
+        part = subprocess.run(
+            ['findmnt', '-n', '-o', 'SOURCE', '/mnt'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        disk = re.sub(r'p?\d+$', '', part)
+        return disk if disk.startswith('/dev/') else None
+    except Exception:
+        return None
+
+
+def configure(cfg: dict, log: Callable[[str], None] = print):
+    """
+    cfg: {'tz', 'locale', 'font', 'map', 'user', 'user_pass', 'root_pass'}
+    (+ opcjonalnie 'extra_locales': dodatkowe locale do locale-gen).
+    Rzuca RuntimeError, gdy nie da się odczytać montowań /mnt.
+    """
+    # trwałe opcje montowania wracają przed findmnt → fstab
+    slowtarget.restore(log=log)
+    # UUID-y z mkfs w etapie 2 – świeży odczyt na potrzeby fstab
+    inventory().refresh()
+
+    # fstab – na podstawie findmnt (odporne na Btrfs subvol)
+    log("Generuję /mnt/etc/fstab (na podstawie UUID/PARTUUID)")
+    entries: List[str] = []
+    try:
+        out = subprocess.run(
+            ['findmnt', '-Rrno', 'SOURCE,TARGET,FSTYPE,OPTIONS', '/mnt'],
+            capture_output=True, text=True, check=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"findmnt nie powiodło się:\n{e.stderr}")
+
+    def _clean_src(dev: str) -> str:
+        return re.sub(r'\[.*\]$', '', dev)
+
+    for line in out.stdout.strip().splitlines():
+        parts = line.split(None, 3)
+        if len(parts) < 4:
+            continue
+        src, target, fstype, options = parts[:4]
+        src = _clean_src(src)
+        target = re.sub(r'^[├└─│\s]+', '', target).strip()
+
+        if not src.startswith('/dev/'):
+            continue
+
+        id_key, uuid = get_id_for(src)
+        if not uuid:
+            log(f"⚠️  Pomijam {src}: brak UUID/PARTUUID")
+            continue
+
+        if target == '/mnt':
+            mountpoint = '/'
+        elif target.startswith('/mnt/'):
+            mountpoint = target.replace('/mnt', '', 1)
+        else:
+            mountpoint = target
+
+        if mountpoint == '/' and fstype == 'ext4':
+            opts = 'noatime,nodiratime,lazytime,commit=60,errors=remount-ro'
+        else:
+            opts = ','.join([o for o in options.split(',') if o != 'rw']) or 'defaults'
+
+        dump = 0
+        passno = 1 if mountpoint == '/' else 2
+        entries.append(f"{id_key}={uuid}\t{mountpoint}\t{fstype}\t{opts}\t{dump} {passno}")
+
+    os.makedirs('/mnt/etc', exist_ok=True)
+    if not entries:
+        # fallback minimalny
+        try:
+            root_src = subprocess.run(['findmnt','-n','-o','SOURCE','/mnt'],
+                                      capture_output=True, text=True, check=True).stdout.strip()
+            root_fst = subprocess.run(['findmnt','-n','-o','FSTYPE','/mnt'],
+                                      capture_output=True, text=True, check=True).stdout.strip()
+            key, val = get_id_for(_clean_src(root_src))
+            if key and val and root_fst:
+                entries.append(f"{key}={val}\t/\t{root_fst}\tnoatime\t0 1")
+        except Exception as e:
+            log(f"⚠️  Fallback fstab niepełny: {e}")
+
+    # --- SWAP: dopisz do fstab + upewnij się, że aktywny ---
+    swap_lines = []
+
+    # 1) aktywny swap (preferowane) — pomiń zram*
+    try:
+        r = subprocess.run(['swapon', '--noheadings', '--show=NAME'],
+                           capture_output=True, text=True, check=False)
+        active_swaps = [d for d in r.stdout.strip().splitlines() if d and not os.path.basename(d).startswith('zram')]
+    except Exception:
+        active_swaps = []
+
+    # 2) jeśli nic nieaktywne, poszukaj TYPE=swap w inwentarzu
+    if not active_swaps:
+        active_swaps = [d.path for d in inventory().by_fstype('swap') if not d.name.startswith('zram')]
+
+    # 3) jeśli swapfile w docelowym systemie
+    if os.path.exists('/mnt/swapfile'):
+        swap_lines.append("/swapfile\tnone\tswap\tdefaults\t0 0")
+        # można od razu włączyć:
+        subprocess.run(['swapon', '/mnt/swapfile'], check=False)
+
+    # 4) zbuduj wpisy po UUID/PARTUUID i ewentualnie włącz jeśli nieaktywny
+    for dev in active_swaps:
+        if not dev:
+            continue
+        if dev.startswith('/dev/'):
+            key, val = get_id_for(dev)
+            if key and val:
+                swap_lines.append(f"{key}={val}\tnone\tswap\tdefaults\t0 0")
+            # aktywuj (bezpiecznie – jeśli już aktywny, rc=0)
+            subprocess.run(['swapon', dev], check=False)
+        elif dev.startswith('/'):  # np. /swapfile spoza /mnt
+            # nie dodawaj /swapfile hosta live do fstab docelowego
+            pass
+
+    # deduplikacja swap_lines
+    seen = set()
+    dedup = []
+    for ln in swap_lines:
+        if ln not in seen:
+            seen.add(ln); dedup.append(ln)
+    swap_lines = dedup
+
+    if swap_lines:
+        entries.extend(swap_lines)
+        log(f"Dodano wpisy SWAP do fstab (liczba: {len(swap_lines)})")
+    else:
+        log("Brak wykrytego SWAP do dopisania w fstab (OK, jeśli używasz zram lub swapfile tworzony później).")
+
+    with open('/mnt/etc/fstab', 'w') as f:
+        f.write("\n".join(entries) + ("\n" if entries else ""))
+
+    log(f"Zapisano /mnt/etc/fstab (wpisów: {len(entries)})")
+
+    # montujemy pseudo-fs po fstab, z --make-rslave
+    for fs in ('proc','sys','dev','run'):
+        dst=f"/mnt/{fs}"; os.makedirs(dst,exist_ok=True)
+        if fs=='proc':
+            subprocess.run(['mount','-t','proc','proc',dst],check=False)
+        else:
+            subprocess.run(['mount','--rbind',f"/{fs}",dst],check=False)
+            subprocess.run(['mount','--make-rslave',dst],check=False)
+    os.makedirs('/mnt/tmp',exist_ok=True)
+    subprocess.run(['mount','--rbind','/tmp','/mnt/tmp'],check=False)
+    subprocess.run(['mount','--make-rslave','/mnt/tmp'],check=False)
+
+    # kroki niezależne (locale-gen, useradd, grub-install…) idą równolegle;
+    # każdy wątek ma własną powłokę w chroocie zamiast arch-chroot na polecenie
+    workers = min(4, os.cpu_count() or 1)
+    with ChrootPool('/mnt', size=workers, log=log) as ch:
+        ctx = {'cfg': cfg, 'ch': ch, 'log': log}
+        report = taskgraph.run(CONFIG_STEPS, ctx, workers=workers, log=log)
+    log(report.summary())
+
+
+# ---- kroki konfiguracji (ctx: cfg, ch, log + wyniki kroków) ----
+
+def _step_timezone(ctx):
+    tz=ctx['cfg']['tz']
+    ctx['log'](f"Strefa: {tz}")
+    try:
+        if os.path.lexists('/mnt/etc/localtime'):
+            os.remove('/mnt/etc/localtime')
+        os.symlink(f"/usr/share/zoneinfo/{tz}", '/mnt/etc/localtime')
+    except OSError as e:
+        ctx['log'](f"⚠️  Nie udało się ustawić strefy: {e}")
+
+
+def _step_locale(ctx):
+    cfg, log = ctx['cfg'], ctx['log']
+    # tylko wybrane locale (LANG + ewentualne 'extra_locales') – locale-gen kompiluje każde z osobna
+    selected = [cfg['locale']] + list(cfg.get('extra_locales', []))
+    with open('/mnt/etc/locale.gen','w') as f:
+        for line in tzlocale.locale_gen_lines(selected, root='/mnt'):
+            f.write(line + "\n")
+    r = ctx['ch'].run(['locale-gen'])
+    if not r.ok:
+        log(f"⚠️  locale-gen rc={r.rc}: {r.output.strip()}")
+    with open('/mnt/etc/locale.conf','w') as f:
+        f.write(f"LANG={cfg['locale']}\n")
+
+
+def _step_vconsole(ctx):
+    # vconsole: FONT + FONT_MAP + KEYMAP
+    cfg = ctx['cfg']
+    font=cfg['font']; mp=cfg['map']
+    lang = cfg['locale'].split('.')[0][:2]
+    keymap = {'pl':'pl','de':'de','fr':'fr','es':'es'}.get(lang,'us')
+    ctx['log'](f"vconsole: KEYMAP={keymap} FONT={font} FONT_MAP={mp}")
+    write_file('/mnt/etc/vconsole.conf', f"KEYMAP={keymap}\nFONT={font}\nFONT_MAP={mp}\n")
+
+
+def _step_branding(ctx):
+    # branding: os-release (pełny + symlink)
+    log = ctx['log']
+    log("Branding systemu jako AGHOS")
+    os_release = """NAME="Arch Greybeards Hall Linux"
+PRETTY_NAME="AGHOS"
+ID=arch
+BUILD_ID=rolling
+ANSI_COLOR="38;2;0;105;60"
+HOME_URL="https://aghos.agh.edu.pl"
+DOCUMENTATION_URL="https://aghos.agh.edu.pl"
+SUPPORT_URL="https://aghos.agh.edu.pl"
+BUG_REPORT_URL="https://aghos.agh.edu.pl"
+PRIVACY_POLICY_URL="https://aghos.agh.edu.pl"
+LOGO=aghos-logo
+"""
+    os.makedirs('/mnt/usr/lib', exist_ok=True)
+    with open('/mnt/usr/lib/os-release', 'w') as f:
+        f.write(os_release)
+    os.makedirs('/mnt/etc', exist_ok=True)
+    try:
+        if os.path.exists('/mnt/etc/os-release') and not os.path.islink('/mnt/etc/os-release'):
+            os.remove('/mnt/etc/os-release')
+        if os.path.islink('/mnt/etc/os-release'):
+            os.unlink('/mnt/etc/os-release')
+        os.symlink('/usr/lib/os-release', '/mnt/etc/os-release')
+    except Exception as e:
+        log(f"⚠️  Nie udało się utworzyć symlinku /etc/os-release: {e}")
+
+
+def _step_hostname(ctx):
+    # hostname + hosts jeżeli nie istnieją
+    if not os.path.exists('/mnt/etc/hostname'):
+        with open('/mnt/etc/hostname','w') as f:
+            f.write('aghos\n')
+    with open('/mnt/etc/hosts','w') as f:
+        f.write('127.0.0.1\tlocalhost\n::1\tlocalhost\n127.0.1.1\taghos\n')
+
+
+def _step_users(ctx):
+    cfg, ch, log = ctx['cfg'], ctx['ch'], ctx['log']
+    usr=cfg['user']
+    if usr:
+        log(f"Tworzę {usr} (kopiuję /etc/skel)…")
+        r = ch.run(['useradd','-m','-G','wheel',usr])
+        if not r.ok:
+            log(f"⚠️  useradd rc={r.rc}: {r.output.strip()}")
+    # hasła jednym chpasswd, przez stdin (nie w argv/ps)
+    passwords = []
+    if usr:
+        passwords.append(f"{usr}:{cfg['user_pass']}")
+    if cfg['root_pass']:
+        log("Ustawiam hasło roota")
+        passwords.append(f"root:{cfg['root_pass']}")
+    if passwords:
+        r = ch.run(['chpasswd'], input="\n".join(passwords))
+        if not r.ok:
+            log(f"⚠️  chpasswd rc={r.rc}: {r.output.strip()}")
+
+
+def _step_sudoers(ctx):
+    # włącz sudo dla wheel
+    os.makedirs('/mnt/etc/sudoers.d', mode=0o750, exist_ok=True)
+    write_file('/mnt/etc/sudoers.d/10-wheel', "%wheel ALL=(ALL:ALL) ALL\n", 0o440)
+
+
+def _step_hwclock(ctx):
+    ctx['ch'].run(['hwclock','--systohc'])
+
+
+def _step_esp(ctx):
+    # wykryj ESP jako istniejący mountpoint wewnątrz chroota
+    for cand in ['/boot', '/efi', '/boot/efi', '/boot/EFI']:
+        if is_mount_in_mnt(cand):
+            return {'efi_dir': cand}
+    return {'efi_dir': None}
+
+
+def _step_windows(ctx):
+    """
+    {'windows': (windows_uefi, windows_bios)}.
+    - UEFI: sprawdza obecność pliku EFI/Microsoft/Boot/bootmgfw.efi na ESP.
+    - BIOS: heurystyka: obecność partycji NTFS w systemie.
+    """
+    efi_dir_ = ctx['efi_dir']
+    win_uefi = False
+    win_bios = False
+    try:
+        if efi_dir_:
+            candidate = os.path.join('/mnt', efi_dir_.strip('/'), 'EFI', 'Microsoft', 'Boot', 'bootmgfw.efi')
+            if os.path.exists(candidate):
+                win_uefi = True
+        # BIOS / MBR – sprawdź, czy są w systemie wolumeny NTFS
+        if not win_uefi:
+            if inventory().by_fstype('ntfs'):
+                win_bios = True
+    except Exception as e:
+        ctx['log'](f"⚠️  Błąd wykrywania Windows: {e}")
+    return {'windows': (win_uefi, win_bios)}
+
+
+def _step_grub_install(ctx):
+    ch, log, efi_dir = ctx['ch'], ctx['log'], ctx['efi_dir']
+    os.makedirs('/mnt/boot', exist_ok=True)
+    os.makedirs('/mnt/boot/EFI/BOOT', exist_ok=True)
+    log("Instaluję GRUB")
+    if efi_dir:
+        # UEFI instalacja
+        log(f"UEFI: --efi-directory={efi_dir}")
+        r = ch.run([
+            'grub-install',
+            '--target=x86_64-efi',
+            f'--efi-directory={efi_dir}',
+            '--bootloader-id=AGHOS',
+            '--removable'
+        ])
+        if not r.ok:
+            log(f"⚠️  grub-install (UEFI) rc={r.rc}: {r.output.strip()}")
+    else:
+        # BIOS instalacja
+        disk = detect_root_disk_for_mnt()
+        if not disk:
+            log("Nie udało się wykryć dysku dla /mnt – próbuję /dev/sda (fallback).")
+            disk = '/dev/sda'
+        else:
+            log(f"Tryb BIOS: instaluję na {disk}")
+        r = ch.run(['grub-install','--boot-directory=/boot', disk])
+        if not r.ok:
+            log(f"⚠️  grub-install (BIOS) rc={r.rc}: {r.output.strip()}")
+
+
+def _step_grub_defaults(ctx):
+    # Branding i ustawienia GRUB
+    os.makedirs('/mnt/boot', exist_ok=True)
+    subprocess.run(['cp', '/boot/logo.png', '/mnt/boot/logo.png'], check=False)
+    # Włącz wpis tła i dystrybutora
+    set_shell_vars('/mnt/etc/default/grub', {'GRUB_BACKGROUND': '"/boot/logo.png"',
+                                             'GRUB_DISTRIBUTOR': '"AGHOS"'})
+
+
+def _step_grub_windows(ctx):
+    # Przygotuj 41_windows (jeśli wykryto Windows)
+    log = ctx['log']
+    windows_uefi, windows_bios = ctx['windows']
+    if windows_uefi or windows_bios:
+        log("Wykryto Windows – dodaję wpis do GRUB (41_windows).")
+        lines = [
+            "#!/bin/sh",
+            "exec tail -n +3 $0",
+            "# ---- Windows entries added by AGHOS installer ----"
+        ]
+        if windows_uefi:
+            lines += [
+                "menuentry 'Windows Boot Manager (UEFI)' --class windows --class os {",
+                "    insmod part_gpt",
+                "    insmod fat",
+                "    insmod chain",
+                "    search --no-floppy --file --set=root /EFI/Microsoft/Boot/bootmgfw.efi",
+                "    chainloader /EFI/Microsoft/Boot/bootmgfw.efi",
+                "}"
+            ]
+        if windows_bios:
+            lines += [
+                "menuentry 'Windows (BIOS/MBR)' --class windows --class os {",
+                "    insmod part_msdos",
+                "    insmod ntfs",
+                "    insmod chain",
+                "    # Znajdź partycję z bootsectorem Windows (bootmgr)",
+                "    search --no-floppy --file --set=root /bootmgr",
+                "    chainloader +1",
+                "}"
+            ]
+        content = "\n".join(lines) + "\n"
+        try:
+            with open('/mnt/etc/grub.d/41_windows', 'w') as f:
+                f.write(content)
+            os.chmod('/mnt/etc/grub.d/41_windows', 0o755)
+        except Exception as e:
+            log(f"⚠️  Nie udało się zapisać 41_windows: {e}")
+    else:
+        log("Nie wykryto Windows – pomijam tworzenie 41_windows.")
+
+
+def _step_grub_mkconfig(ctx):
+    ch, log = ctx['ch'], ctx['log']
+    # Bezpiecznie wygeneruj grub.cfg po wszystkich zmianach
+    log("Generuję /boot/grub/grub.cfg…")
+    r = ch.run(['grub-mkconfig','-o','/boot/grub/grub.cfg'])
+    if not r.ok:
+        log(f"⚠️  grub-mkconfig rc={r.rc}: {r.output.strip()}")
+    else:
+        log("GRUB: wygenerowano /boot/grub/grub.cfg.")
+
+
+CONFIG_STEPS = [
+    taskgraph.Task('timezone', _step_timezone),
+    taskgraph.Task('locale', _step_locale),
+    taskgraph.Task('vconsole', _step_vconsole),
+    taskgraph.Task('branding', _step_branding),
+    taskgraph.Task('hostname', _step_hostname),
+    taskgraph.Task('users', _step_users),
+    taskgraph.Task('sudoers', _step_sudoers),
+    taskgraph.Task('hwclock', _step_hwclock),
+    taskgraph.Task('esp', _step_esp, provides=['efi_dir']),
+    taskgraph.Task('windows', _step_windows, needs=['efi_dir']),
+    taskgraph.Task('grub_install', _step_grub_install, needs=['efi_dir']),
+    taskgraph.Task('grub_defaults', _step_grub_defaults),
+    taskgraph.Task('grub_windows', _step_grub_windows, needs=['windows']),
+    # grub.cfg na końcu: po instalacji, /etc/default/grub, 41_windows i os-release
+    taskgraph.Task('grub_mkconfig', _step_grub_mkconfig,
+                   needs=['grub_install', 'grub_defaults', 'grub_windows', 'branding']),
+]
+
+
+def cleanup_ids(log: Callable[[str], None] = print):
+    """Usuwa machine-id i random-seed – system wygeneruje je przy pierwszym starcie."""
+    log("Czyszczę machine-id i random-seed")
+    for p in ['/mnt/etc/machine-id','/mnt/var/lib/systemd/random-seed']:
+        try: os.remove(p)
+        except Exception: pass
+
+
+def umount_binds(log: Callable[[str], None] = print):
+    """Odmontowanie bind-mountów chroota (proc/sys/dev/run/tmp)."""
+    log("Odmontowuję bind-mounty…")
+    table = read_mounts()
+    for fs in ('tmp','run','dev','sys','proc'):
+        for t, err in unmount_tree(f"/mnt/{fs}", mounts=table):
+            log(f"⚠️ umount {t}: {err}")
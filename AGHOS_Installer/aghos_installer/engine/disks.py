@@ -0,0 +1,125 @@
+"""Etap 2: partycjonowanie całego dysku albo montowanie istniejących partycji."""
+
+import os
+import re
+import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aghos_installer import partplan, mkfs
+from aghos_installer.blockdev import inventory
+from aghos_installer.engine import StageError
+
+SIZE_MUL = {'M': 1024**2, 'MB': 1024**2, 'G': 1024**3, 'GB': 1024**3,
+            'T': 1024**4, 'TB': 1024**4, None: 1}
+
+
+def parse_size(txt: str, total: int = 0) -> int:
+    """"500M", "2G", "1T", "10%" (z `total`) albo liczba bajtów → bajty; 0 gdy błędny."""
+    txt = str(txt).strip().upper()
+    if txt.endswith('%'):
+        try:
+            return int(float(txt.strip('%')) / 100 * total)
+        except ValueError:
+            return 0
+    m = re.match(r'^(\d+(?:\.\d+)?)([MGT]B?)?$', txt)
+    if m:
+        num, suf = m.groups()
+        return int(float(num) * SIZE_MUL[suf])
+    try:
+        return int(txt)
+    except ValueError:
+        return 0
+
+
+def _is_swap(r: dict) -> bool:
+    return r['mount'].lower() == 'swap' or r['fs'] in mkfs.SWAP_FS
+
+
+def _swapon(dev: str, log: Callable[[str], None], strict: bool = False):
+    res = subprocess.run(['swapon', dev], capture_output=True, text=True)
+    if res.returncode:
+        if strict:
+            raise StageError('Błąd swapon', res.stderr.strip())
+        log(f"⚠️ Błąd swapon {dev}: {res.stderr}")
+        return
+    log(f"✅ {dev} → swap (aktywowany)")
+
+
+def partition_and_mount(disk: str, ptype: str, plan: List[dict], discard: bool = True,
+                        log: Callable[[str], None] = print) -> Dict[int, str]:
+    """
+    Czyści `disk`, zakłada partycje z `plan` ([{'size', 'mount', 'fs', 'name'}]),
+    formatuje je równolegle i montuje pod /mnt. Zwraca {numer: węzeł}.
+    """
+    dev = disk if disk.startswith('/dev/') else f"/dev/{disk}"
+    root = next((i for i, r in enumerate(plan, 1) if r['mount'] == '/'), None)
+    if not root:
+        raise StageError("Błąd montowania", "Nie znaleziono partycji root (/)")
+
+    # tablica i partycje: jeden skrypt sfdisk zamiast N wywołań parted
+    try:
+        nodes = partplan.apply(dev, plan, ptype, log=log)
+    except partplan.PlanError as e:
+        raise StageError("Błąd", f"Nie udało się utworzyć tablicy partycji: {e}")
+
+    # formatowanie – wszystkie partycje naraz
+    root_dev = nodes[root]
+    failed = mkfs.format_all([(nodes[i], 'swap' if _is_swap(r) else r['fs']) for i, r in enumerate(plan, 1)],
+                             discard=discard, log=log)
+    if root_dev in failed:
+        raise StageError("Błąd formatowania", f"Nie udało się sformatować {root_dev}: {failed[root_dev]}")
+    for devn, err in failed.items():
+        log(f"⚠️ Błąd formatowania {devn}: {err}")
+
+    # montowanie: / najpierw, potem zagnieżdżone punkty
+    os.makedirs('/mnt', exist_ok=True)
+    mounts = {r['mount']: nodes[i] for i, r in enumerate(plan, 1)
+              if not _is_swap(r) and r['mount'].startswith('/') and nodes[i] not in failed}
+    errors = mkfs.mount_all(mounts, log=log)
+    if '/' in errors:
+        raise StageError("Błąd montowania", f"Nie udało się zamontować {root_dev}: {errors['/']}")
+    for mp, err in errors.items():
+        log(f"⚠️ Błąd montowania {mounts[mp]}: {err}")
+
+    for i, r in enumerate(plan, 1):
+        if _is_swap(r) and nodes[i] not in failed:
+            _swapon(nodes[i], log)
+    inventory().invalidate()
+    return nodes
+
+
+def mount_existing(parts: Dict[str, Tuple[str, str]], do_format: bool = True, discard: bool = True,
+                   log: Callable[[str], None] = print):
+    """
+    {punkt: (urządzenie, fstype)} – opcjonalny równoległy mkfs i montowanie
+    pod /mnt; klucz "swap" oznacza partycję wymiany.
+    """
+    if '/' not in parts:
+        raise StageError("Błąd montowania", "Nie wybrano partycji root (/)")
+    os.makedirs('/mnt', exist_ok=True)
+    swap = {mp: v for mp, v in parts.items() if mp.lower() == 'swap'}
+
+    if do_format:
+        targets = [(dev_node, 'swap' if mp in swap else fstype) for mp, (dev_node, fstype) in parts.items()]
+        failed = mkfs.format_all(targets, discard=discard, log=log)
+        if failed:
+            dev_node, err = next(iter(failed.items()))
+            raise StageError('Błąd formatowania', f"{dev_node}: {err}")
+
+    # / najpierw, potem zagnieżdżone punkty
+    errors = mkfs.mount_all({mp: dev_node for mp, (dev_node, _fs) in parts.items() if mp not in swap}, log=log)
+    if errors:
+        mp, err = next(iter(errors.items()))
+        raise StageError('Błąd montowania' if mp == '/' else f'Błąd montowania {mp}', err)
+
+    for dev_node, _fs in swap.values():
+        _swapon(dev_node, log, strict=True)
+    inventory().invalidate()
+
+
+def resolve_plan(disk: str, rows: List[dict], total: Optional[int] = None) -> List[dict]:
+    """Wiersze z pliku odpowiedzi ("size": "40G" / "10%") → plan z rozmiarami w bajtach."""
+    if total is None:
+        total = inventory().size(disk)
+    return [{'size': parse_size(r['size'], total), 'mount': r.get('mount', ''),
+             'fs': r.get('fs', 'ext4').lower(), 'name': r.get('name', '')} for r in rows]
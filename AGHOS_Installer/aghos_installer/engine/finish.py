@@ -0,0 +1,56 @@
+"""Etap 4: opróżnienie buforów, odmontowanie /mnt i restart."""
+
+import subprocess
+from typing import Callable, List, Optional, Tuple
+
+from aghos_installer import mounts, slowtarget, logsink, writeback
+
+
+def _nolog(_msg: str):
+    pass
+
+
+def flush_writes(log: Callable[[str], None] = print,
+                 progress: Optional[Callable[[int, int, float], None]] = None,
+                 status: Callable[[str], None] = _nolog,
+                 status_fmt: str = writeback.STATUS_FMT) -> bool:
+    """syncfs na systemach plików pod /mnt z postępem per dysk (writeback.flush)."""
+    try:
+        return writeback.flush('/mnt', progress=progress, status=status, log=log,
+                               status_fmt=status_fmt)
+    except Exception as e:
+        log(f"⚠️ flush: {e}")
+        return False
+
+
+def umount_all_under_mnt(log: Callable[[str], None] = _nolog) -> List[Tuple[str, str]]:
+    """Odmontowuje wszystko pod /mnt (od liści drzewa montowań); zwraca [(punkt, błąd)]."""
+    return mounts.unmount_tree('/mnt', log=log)
+
+
+def finish(log: Callable[[str], None] = print,
+           progress: Optional[Callable[[int, int, float], None]] = None,
+           status: Callable[[str], None] = _nolog,
+           status_fmt: str = writeback.STATUS_FMT,
+           step: Callable[[str], None] = _nolog) -> List[Tuple[str, str]]:
+    """
+    Trwałe opcje montowania, log do /mnt/var/log, sync, odmontowanie; zwraca
+    nieudane odmontowania. `step` dostaje nazwę kroku ('syncing', 'flushed',
+    'unmounting') – etap 4 zamienia ją na przetłumaczony komunikat.
+    """
+    slowtarget.restore(log=log)
+    logsink.copy_to('/mnt', log=log)
+    step('syncing')
+    flush_writes(log, progress, status, status_fmt)
+    step('flushed')
+    step('unmounting')
+    return umount_all_under_mnt(log)
+
+
+def reboot():
+    try:
+        rc = subprocess.run(["systemctl", "reboot", "-i"]).returncode
+        if rc != 0:
+            subprocess.run(["reboot"])
+    except Exception:
+        subprocess.run(["reboot"])
@@ -0,0 +1,58 @@
+"""Etap 1: sprawdzenie łączności i konfiguracja sieci przez nmcli."""
+
+import subprocess
+from typing import Callable, List, Optional
+
+from aghos_installer import connectivity, uplink, wifi
+
+NM_WAIT = 30        # s: nmcli --wait i czekanie na łączność po aktywacji
+
+
+def _nolog(_msg: str):
+    pass
+
+
+def is_connected() -> bool:
+    """Jednorazowe sprawdzenie (kilka sond równolegle, pierwsza udana wygrywa)."""
+    return connectivity.check().ok
+
+
+def links(sysfs: str = '/sys', probe_url: Optional[str] = None) -> List[uplink.Link]:
+    """Fizyczne łącza od najlepszego (uplink.rank); wirtualne są pomijane."""
+    return uplink.rank(uplink.links(sysfs), probe_url=probe_url)
+
+
+def interfaces(sysfs: str = '/sys', probe_url: Optional[str] = None) -> List[str]:
+    return [l.name for l in links(sysfs, probe_url)]
+
+
+def wifi_networks(iface: str, rescan: bool = False) -> List[str]:
+    """SSID-y bez duplikatów, od najsilniejszego sygnału (wifi.scan)."""
+    return [ap.ssid for ap in wifi.scan(iface, rescan=rescan)]
+
+
+def connect(iface: str, ssid: Optional[str] = None, password: str = "", dhcp: bool = True,
+            ip: str = "", gateway: str = "", dns: str = "",
+            log: Callable[[str], None] = print, status: Callable[[str], None] = _nolog) -> bool:
+    """
+    Łączy `iface` (Wi-Fi, gdy nazwa zaczyna się od "wl") i czeka, aż sieć
+    naprawdę działa (connectivity.wait_online) – nie tylko na koniec `nmcli`.
+    """
+    nmcli = ["nmcli", "--wait", str(NM_WAIT)]
+    status(f"Aktywuję {iface}…")
+    if iface.startswith("wl"):
+        subprocess.run(nmcli + ["dev", "wifi", "connect", ssid or "", "password", password,
+                                "ifname", iface], capture_output=True)
+    elif dhcp:
+        subprocess.run(nmcli + ["con", "up", iface], capture_output=True)
+    else:
+        subprocess.run(["nmcli", "con", "mod", iface,
+                        "ipv4.addresses", ip,
+                        "ipv4.gateway", gateway,
+                        "ipv4.dns", dns,
+                        "ipv4.method", "manual"], capture_output=True)
+        subprocess.run(nmcli + ["con", "up", iface], capture_output=True)
+    res = connectivity.wait_online(NM_WAIT, status=status, log=log)
+    detail = f" ({res.via}, {res.seconds * 1e3:0.0f} ms)" if res.ok else ""
+    log(f"{'✅' if res.ok else '❌'} {iface}: {'połączono' if res.ok else 'brak połączenia'}{detail}")
+    return res.ok
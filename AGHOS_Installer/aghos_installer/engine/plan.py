@@ -0,0 +1,132 @@
+"""
+Plik odpowiedzi i przebieg instalacji bez GUI.
+
+Przykład (JSON; YAML działa, jeśli jest PyYAML):
+
+    {
+      "network": {"iface": "enp1s0", "dhcp": true},
+      "disk": {"device": "nvme0n1", "table": "gpt", "discard": true,
+               "partitions": [
+                 {"size": "1G",  "mount": "/boot", "fs": "vfat",  "name": "boot"},
+                 {"size": "60%", "mount": "/",     "fs": "btrfs", "name": "root"},
+                 {"size": "8G",  "mount": "swap",  "fs": "swap",  "name": "swap"}]},
+      "rootfs": {"archive": "latest-rootfs.tar.zst", "stream": true},
+      "config": {"tz": "Europe/Warsaw", "locale": "pl_PL.UTF-8",
+                 "user": "student", "user_pass": "…", "root_pass": "…"},
+      "finish": {"reboot": false}
+    }
+
+Zamiast "disk" można podać "mount": {"/": ["/dev/sda2", "ext4"], …} oraz
+"format": true|false – odpowiednik ścieżki „istniejące partycje”.
+"rootfs": {"mirrors": false} – pobieranie tylko z "base" (bez wyboru luster).
+Brak sekcji "network" – etap pomijany (wymagana jest już łączność).
+"""
+
+import json
+import time
+from typing import Callable, Dict, List, Tuple
+
+from aghos_installer import trace
+from aghos_installer.engine import StageError, network, disks, rootfs, config, finish
+
+CONFIG_DEFAULTS = {
+    'tz': 'Europe/Warsaw',
+    'locale': 'pl_PL.UTF-8',
+    'font': 'Lat2-Terminus16',
+    'map': '8859-2',
+    'user': '',
+    'user_pass': '',
+    'root_pass': '',
+}
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(('.yml', '.yaml')):
+        try:
+            import yaml
+        except ImportError:
+            raise StageError("Plik odpowiedzi", "Do plików YAML potrzebny jest PyYAML (albo użyj JSON).")
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def _stage_network(plan: dict, log):
+    net = plan.get('network')
+    if not net:
+        if not network.is_connected():
+            raise StageError("Sieć", "Brak połączenia z internetem i brak sekcji \"network\".")
+        return
+    ok = network.connect(net['iface'], ssid=net.get('ssid'), password=net.get('password', ''),
+                         dhcp=net.get('dhcp', True), ip=net.get('ip', ''),
+                         gateway=net.get('gateway', ''), dns=net.get('dns', ''), log=log)
+    if not ok:
+        raise StageError("Sieć", f"Nie udało się połączyć przez {net['iface']}")
+
+
+def _stage_disks(plan: dict, log):
+    if 'disk' in plan:
+        d = plan['disk']
+        rows = disks.resolve_plan(d['device'], d['partitions'])
+        disks.partition_and_mount(d['device'], d.get('table', 'gpt'), rows,
+                                  discard=d.get('discard', True), log=log)
+    elif 'mount' in plan:
+        parts = {mp: tuple(v) for mp, v in plan['mount'].items()}
+        disks.mount_existing(parts, do_format=plan.get('format', False),
+                             discard=plan.get('discard', True), log=log)
+    else:
+        raise StageError("Dyski", "Plik odpowiedzi nie ma sekcji \"disk\" ani \"mount\".")
+
+
+def _stage_rootfs(plan: dict, log):
+    r = plan.get('rootfs', {})
+    last = [0.0]
+
+    def progress(done, total, rate):
+        # co ~5 s wiersz postępu – konsola szeregowa nie zniesie paska
+        if time.time() - last[0] >= 5 or (total and done >= total):
+            last[0] = time.time()
+            pct = f"{done * 100 // total}%" if total else f"{done // 1024**2} MiB"
+            log(f"  {pct} • {rate / 1024**2:0.1f} MB/s")
+
+    rootfs.install(r.get('archive', rootfs.DEFAULT_ARCHIVE), stream=r.get('stream', True),
+                   slow_target=r.get('slow_target'), base=r.get('base', rootfs.DISTRO_URL),
+                   cache=r.get('cache', rootfs.CACHE_DIR), use_mirrors=r.get('mirrors', True),
+                   progress=progress, log=log)
+
+
+def _stage_config(plan: dict, log):
+    config.configure(dict(CONFIG_DEFAULTS, **plan.get('config', {})), log=log)
+    config.cleanup_ids(log=log)
+
+
+def _stage_finish(plan: dict, log):
+    for t, err in finish.finish(log=log):
+        log(f"⚠️ umount {t}: {err.strip() if err else 'busy'}")
+
+
+STAGES: List[Tuple[str, Callable[[dict, Callable[[str], None]], None]]] = [
+    ('network', _stage_network),
+    ('disks', _stage_disks),
+    ('rootfs', _stage_rootfs),
+    ('config', _stage_config),
+    ('finish', _stage_finish),
+]
+
+
+def run(plan: dict, log: Callable[[str], None] = print) -> Dict[str, float]:
+    """Wykonuje etapy po kolei; zwraca {etap: czas w s}. Błąd etapu przerywa instalację."""
+    timings: Dict[str, float] = {}
+    for name, stage in STAGES:
+        log(f"➡️ Etap: {name}")
+        t0 = time.time()
+        try:
+            with trace.stage(name):
+                stage(plan, log)
+        finally:
+            timings[name] = time.time() - t0
+            log(f"⏱ {name}: {timings[name]:0.1f} s")
+    if plan.get('finish', {}).get('reboot'):
+        finish.reboot()
+    return timings
@@ -0,0 +1,189 @@
+"""Etap 3a: pobranie, weryfikacja i rozpakowanie RootFS do /mnt."""
+
+import os
+from typing import Callable, List, Optional, Tuple
+
+from aghos_installer import manifest, mirrors, slowtarget, trace
+from aghos_installer.stream import stream_extract, ChecksumMismatch
+from aghos_installer.download import download, state_path, NET_ERRORS
+from aghos_installer.verify import file_sha512, remember, forget
+from aghos_installer.extract import extract, format_eta
+
+DISTRO_URL = "https://aghos.agh.edu.pl/distro/"
+DEFAULT_ARCHIVE = "latest-rootfs.tar.zst"
+CACHE_DIR = "/root"
+SPACE_MARGIN = 1.1      # zapas na metadane systemu plików i dziennik
+
+Progress = Optional[Callable[[int, int, float], None]]
+
+
+def _nolog(_msg: str):
+    pass
+
+
+class NotEnoughSpace(RuntimeError):
+    pass
+
+
+def list_archives(base: str = DISTRO_URL) -> List[str]:
+    """Archiwa z manifestu (albo indeksu HTML) serwera, najnowsze pierwsze; awaryjnie latest-rootfs."""
+    return [r.name for r in manifest.releases(base)] or [DEFAULT_ARCHIVE]
+
+
+def fetch_checksum(url: str) -> Optional[str]:
+    text = manifest.fetch_text(url + ".sha512")
+    try:
+        return text.split()[0].strip() if text else None
+    except IndexError:
+        return None
+
+
+def free_bytes(path: str) -> int:
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize
+
+
+def check_space(rel: Optional[manifest.Release], local: str, with_archive: bool,
+                target: str = '/mnt', log: Callable[[str], None] = print):
+    """
+    Przed pobraniem: miejsce na rozpakowany system w `target` i (gdy `with_archive`)
+    na samo archiwum obok `local`. Bez rozmiarów w manifeście – tylko ostrzeżenie.
+    """
+    if rel is None or not rel.unpacked_size:
+        log("ℹ️ Brak rozmiaru systemu w manifeście – nie sprawdzam wolnego miejsca.")
+        return
+    need = {target: int(rel.unpacked_size * SPACE_MARGIN)}
+    if with_archive and rel.size:
+        cache = os.path.dirname(local) or '.'
+        if os.stat(cache).st_dev == os.stat(target).st_dev:
+            need[target] += rel.size
+        else:
+            need[cache] = rel.size
+    for path, n in need.items():
+        free = free_bytes(path)
+        if free < n:
+            raise NotEnoughSpace(f"Za mało miejsca w {path}: potrzeba {n / 1024**3:0.1f} GiB, "
+                                 f"wolne {free / 1024**3:0.1f} GiB ({rel.name})")
+
+
+def _mirror_urls(url: str, use_mirrors: bool, status: Callable[[str], None],
+                 log: Callable[[str], None]) -> Tuple[List[str], int]:
+    if not use_mirrors:
+        return [url], 1
+    status("Wybieranie lustra…")
+    base, _, archive = url.rpartition('/')
+    return mirrors.select(archive, base + '/', log=log)
+
+
+def fetch(url: str, local: str, stream: bool = False, slow_target: bool = False,
+          progress: Progress = None, status: Callable[[str], None] = _nolog,
+          log: Callable[[str], None] = print, use_mirrors: bool = True) -> bool:
+    """
+    Pobiera `url` do `local` (z cache, wznawianiem i weryfikacją SHA-512) albo –
+    przy `stream` – rozpakowuje go w locie do /mnt. Zwraca True, jeśli już rozpakowano.
+    Archiwum idzie z najszybszych luster (`mirrors`), suma zawsze z `url`:
+    do pliku zakresami z przejmowaniem przez kolejne lustra (`download`),
+    strumieniowo – od początku z następnego lustra, gdy poprzednie zawiedzie
+    przed przeniesieniem plików z katalogu roboczego (/mnt jest wtedy nietknięte).
+    """
+    base, _, archive = url.rpartition('/')
+    rel = manifest.find(base + '/', archive)
+    # suma z manifestu, a gdy jej tam nie ma – z pliku .sha512
+    exp = rel.sha512 if rel and rel.sha512 else fetch_checksum(url)
+    check_space(rel, local, with_archive=not stream and not os.path.exists(local), log=log)
+
+    if stream:
+        if exp is None:
+            log("⚠️  Nie mogę pobrać sumy .sha512 – rozpakuję bez weryfikacji.")
+        urls, _stripe = _mirror_urls(url, use_mirrors, status, log)
+        if slow_target:
+            slowtarget.enable('/mnt', log=log)
+        for n, src in enumerate(urls):
+            log(f"Pobieranie i rozpakowywanie {src}")
+            tp = trace.Throughput('download+extract', progress)
+            try:
+                stream_extract(src, exp, '/mnt', progress=tp, log=log)
+                return True
+            except (*NET_ERRORS, ChecksumMismatch) as e:
+                # nieaktualne lustro też kończy się niezgodną sumą – próbujemy następnego
+                if n == len(urls) - 1:
+                    raise
+                log(f"⚠️  {src}: {e} – zaczynam od nowa z {urls[n + 1]}")
+            finally:
+                tp.close()
+
+    need = True
+    if exp is None:
+        log("⚠️  Nie mogę pobrać sumy .sha512 – spróbuję pobrać archiwum.")
+    elif os.path.exists(state_path(local)):
+        log("Niedokończone pobieranie w cache – wznawiam.")
+    elif os.path.exists(local):
+        status("Liczenie sumy…")
+        try:
+            # file_sha512 raportuje (done, total); progress przyjmuje też prędkość
+            report = (lambda d, t: progress(d, t, 0.0)) if progress else None
+            got = file_sha512(local, report)
+        except OSError:
+            got = None
+        if got == exp:
+            log("Cache OK, pomijam pobieranie.")
+            need = False
+        else:
+            forget(local)
+            try: os.remove(local)
+            except Exception: pass
+
+    if need:
+        urls, stripe = _mirror_urls(url, use_mirrors, status, log)
+        log(f"Pobieranie {urls[0]}")
+        forget(local)
+        try:
+            # SHA-512 liczona w trakcie zapisu – bez drugiego czytania archiwum
+            tp = trace.Throughput('download', progress)
+            got = download(urls, local, parts=4, progress=tp, log=log, stripe=stripe)
+        except Exception as e:
+            log(f"⚠️  Pobieranie przerwane (można wznowić): {e}")
+            raise
+        finally:
+            tp.close()
+        remember(local, got)
+        if exp is None:
+            log("⚠️  Nie udało się sprawdzić sumy: brak pliku .sha512")
+            return False
+        log("Pobieranie zakończone.")
+        if got != exp:
+            raise ChecksumMismatch("Checksum mismatch po pobraniu")
+        log("Suma kontrolna OK.")
+    return False
+
+
+def unpack(local: str, slow_target: bool = False, progress: Progress = None,
+           status: Callable[[str], None] = _nolog, log: Callable[[str], None] = print) -> int:
+    """zstd -T0 | bsdtar do /mnt z postępem, liczbą wpisów i ETA; zwraca liczbę wpisów."""
+    def on_progress(done, total, rate, entries):
+        if progress:
+            progress(done, total, rate)
+        status(f"{rate/1024**2:0.1f} MB/s • {entries} plików • ETA {format_eta(done, total, rate)}")
+    if slow_target:
+        slowtarget.enable('/mnt', log=log)
+    tp = trace.Throughput('extract', on_progress)
+    try:
+        entries = extract(local, '/mnt', progress=tp)
+    finally:
+        tp.close()
+    log(f"Rozpakowano {entries} wpisów.")
+    return entries
+
+
+def install(archive: str = DEFAULT_ARCHIVE, stream: bool = True, slow_target: Optional[bool] = None,
+            base: str = DISTRO_URL, cache: str = CACHE_DIR, use_mirrors: bool = True,
+            progress: Progress = None, status: Callable[[str], None] = _nolog,
+            log: Callable[[str], None] = print):
+    """Całość etapu bez GUI: pobranie (lub strumień) i rozpakowanie."""
+    url = base.rstrip('/') + '/' + archive
+    local = os.path.join(cache, archive)
+    if slow_target is None:
+        slow_target = slowtarget.is_slow_target('/mnt')
+    stream = stream and not os.path.exists(local)
+    if not fetch(url, local, stream, slow_target, progress, status, log, use_mirrors):
+        unpack(local, slow_target, progress, status, log)
@@ -0,0 +1,166 @@
+"""
+Rozpakowywanie RootFS (.tar.zst) z rzeczywistym postępem.
+
+Potok: `zstd -T0 -dc` → `bsdtar -xpv` (każdy wpis "x …" na stderr to jeden
+zapisany plik). Dekompresja i zapis plików idą w osobnych procesach, więc
+nakładają się w czasie. Archiwum otwieramy sami i przekazujemy jako stdin
+zstd – wspólny offset pliku mówi, ile bajtów skompresowanych już zużyto,
+a Python nie kopiuje danych. Pasek postępu zamiast trybu nieokreślonego
+pokazuje więc procent, liczbę wpisów i ETA. Bez `zstd` w PATH bsdtar sam
+dekompresuje strumień.
+
+Porównanie z dotychczasowym `bsdtar -xpf` na syntetycznym rootfs:
+    python -m aghos_installer.extract --bench [--files 20000]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from typing import Callable, Optional
+
+PROGRESS_INTERVAL = 0.1
+
+
+class Extractor:
+    """
+    Potok zstd | bsdtar. Z `source` (plik) czyta sam; bez niego zasilany
+    jest kolejnymi fragmentami przez `feed()` (np. prosto z HTTP).
+    """
+
+    def __init__(self, target: str, source=None):
+        self.entries = 0
+        self.errors = deque(maxlen=20)
+        tar_cmd = ['bsdtar', '-xpvf', '-', '-C', target]
+        # stderr jest niebuforowany – bez tego -v to kilka write() na każdy plik
+        if shutil.which('stdbuf'):
+            tar_cmd = ['stdbuf', '-eL'] + tar_cmd
+        stdin = source if source is not None else subprocess.PIPE
+        zstd = shutil.which('zstd')
+        if zstd:
+            self.zproc = subprocess.Popen([zstd, '-T0', '-dcq'], stdin=stdin, stdout=subprocess.PIPE)
+            self.tproc = subprocess.Popen(tar_cmd, stdin=self.zproc.stdout, stderr=subprocess.PIPE)
+            self.zproc.stdout.close()
+            self.sink = self.zproc.stdin
+        else:
+            self.zproc = None
+            self.tproc = subprocess.Popen(tar_cmd, stdin=stdin, stderr=subprocess.PIPE)
+            self.sink = self.tproc.stdin
+        self._reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._reader.start()
+
+    def _read_stderr(self):
+        for line in self.tproc.stderr:
+            if line.startswith(b'x '):
+                self.entries += 1
+            else:
+                self.errors.append(line.decode(errors='replace').rstrip())
+
+    def feed(self, buf: bytes):
+        self.sink.write(buf)
+
+    def close(self):
+        """Kończy strumień i czeka na procesy; przy błędzie rzuca RuntimeError."""
+        if self.sink:
+            try:
+                self.sink.close()
+            except BrokenPipeError:
+                pass
+        zrc = self.zproc.wait() if self.zproc else 0
+        trc = self.tproc.wait()
+        self._reader.join()
+        if zrc != 0 or trc != 0:
+            raise RuntimeError(f"zstd rc={zrc}, bsdtar rc={trc}: " + "\n".join(self.errors))
+
+    def running(self) -> bool:
+        return self.tproc.poll() is None
+
+    def kill(self):
+        for p in (self.zproc, self.tproc):
+            if p and p.poll() is None:
+                p.kill()
+                p.wait()
+
+
+def extract(archive: str, target: str = '/mnt',
+            progress: Optional[Callable[[int, int, float, int], None]] = None) -> int:
+    """
+    Rozpakowuje `archive` do `target`; zwraca liczbę zapisanych wpisów.
+
+    `progress(done, total, bytes_per_s, entries)` – bajty skompresowane
+    zużyte z `total` (rozmiar archiwum); wołane co 0,1 s.
+    """
+    total = os.path.getsize(archive)
+    with open(archive, 'rb') as f:
+        ex = Extractor(target, source=f)
+        start = time.time()
+        try:
+            while ex.running():
+                time.sleep(PROGRESS_INTERVAL)
+                if progress:
+                    # ten sam opis otwartego pliku co stdin zstd → wspólny offset
+                    done = os.lseek(f.fileno(), 0, os.SEEK_CUR)
+                    progress(done, total, done / max(time.time() - start, 0.001), ex.entries)
+        except BaseException:
+            ex.kill()
+            raise
+        ex.close()
+    if progress:
+        progress(total, total, total / max(time.time() - start, 0.001), ex.entries)
+    return ex.entries
+
+
+def format_eta(done: int, total: int, rate: float) -> str:
+    if not rate or not total or done >= total:
+        return "0:00"
+    secs = int((total - done) / rate)
+    return f"{secs // 60}:{secs % 60:02d}"
+
+
+# ---- benchmark ----
+
+def _make_rootfs(root: str, files: int):
+    """Syntetyczny rootfs: dużo małych plików tekstowych + kilka większych binarek."""
+    rnd = os.urandom(1 << 20)
+    for i in range(files):
+        d = os.path.join(root, 'usr', 'share', f'd{i % 200:03d}')
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f'f{i}.txt'), 'w') as f:
+            f.write(f"# plik {i}\n" + "lorem ipsum dolor sit amet\n" * (i % 50 + 1))
+    os.makedirs(os.path.join(root, 'usr', 'lib'), exist_ok=True)
+    for i in range(16):
+        with open(os.path.join(root, 'usr', 'lib', f'lib{i}.so'), 'wb') as f:
+            f.write(rnd * 4)
+
+
+def _bench(files: int):
+    with tempfile.TemporaryDirectory(prefix='aghos-bench-') as tmp:
+        src = os.path.join(tmp, 'src')
+        archive = os.path.join(tmp, 'rootfs.tar.zst')
+        _make_rootfs(src, files)
+        subprocess.run(['bsdtar', '--zstd', '-cf', archive, '-C', src, '.'], check=True)
+        print(f"archiwum: {os.path.getsize(archive) / 1024**2:0.1f} MiB, {files} małych plików")
+
+        def run(name, fn):
+            dst = os.path.join(tmp, name)
+            os.makedirs(dst)
+            subprocess.run(['sync'])
+            t0 = time.time()
+            fn(dst)
+            print(f"{name:>8}: {time.time() - t0:6.2f} s")
+            shutil.rmtree(dst)
+
+        run('bsdtar', lambda dst: subprocess.run(['bsdtar', '-xpf', archive, '-C', dst], check=True))
+        run('potok', lambda dst: extract(archive, dst))
+
+
+if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        n = int(sys.argv[sys.argv.index('--files') + 1]) if '--files' in sys.argv else 20000
+        _bench(n)
+    else:
+        print(__doc__)
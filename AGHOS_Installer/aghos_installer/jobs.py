@@ -0,0 +1,96 @@
+"""
+Wspólny wykonawca zadań w tle dla okien instalatora.
+
+Etapy zlecają blokującą pracę (subprocess, pętle I/O, oczekiwanie na
+urządzenia) przez `submit()`, a wyniki, postęp i logi wracają sygnałami
+do wątku GUI. Postęp jest dławiony (`PROGRESS_INTERVAL`), więc nawet pętla
+czytająca 1 MiB fragmenty nie zalewa kolejki zdarzeń Qt – koniec z
+`QApplication.processEvents()` wołanym po każdym fragmencie.
+"""
+
+import time
+import traceback
+from typing import Callable, Optional
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from aghos_installer import trace
+
+PROGRESS_INTERVAL = 0.1
+
+# referencje do działających zadań – inaczej GC zabrałby obiekty sygnałów
+_running = set()
+
+
+class JobError(Exception):
+    """Błąd do pokazania w oknie dialogowym: JobError(tytuł, treść)."""
+
+    def __init__(self, title: str, message: str):
+        super().__init__(message)
+        self.title = title
+
+
+class JobSignals(QObject):
+    progress = Signal(object, object, float)  # done, total, bytes/s (int może przekroczyć 32 bity)
+    status = Signal(str)
+    log = Signal(str)
+    finished = Signal(object)
+    failed = Signal(object)
+
+
+class Job(QRunnable):
+    """Pojedyncze zadanie; `fn(job, *args, **kwargs)` dostaje job jako pierwszy argument."""
+
+    def __init__(self, fn: Callable, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self._last_report = 0.0
+
+    def run(self):
+        try:
+            with trace.job(getattr(self.fn, '__name__', 'job')):
+                result = self.fn(self, *self.args, **self.kwargs)
+        except Exception as e:
+            e.traceback = traceback.format_exc()
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+    # ---- API dla kodu działającego w wątku roboczym ----
+    def report(self, done: int, total: int, rate: float = 0.0):
+        now = time.monotonic()
+        if now - self._last_report < PROGRESS_INTERVAL and done != total:
+            return
+        self._last_report = now
+        self.signals.progress.emit(done, total, rate)
+
+    def log(self, msg: str):
+        self.signals.log.emit(msg)
+
+    def status(self, msg: str):
+        self.signals.status.emit(msg)
+
+
+def submit(fn: Callable, *args,
+           on_done: Optional[Callable] = None,
+           on_error: Optional[Callable] = None,
+           on_progress: Optional[Callable] = None,
+           on_status: Optional[Callable] = None,
+           on_log: Optional[Callable] = None,
+           **kwargs) -> Job:
+    """Uruchamia `fn(job, *args, **kwargs)` w puli wątków; callbacki wołane są w wątku GUI."""
+    job = Job(fn, *args, **kwargs)
+    s = job.signals
+    for sig, cb in ((s.progress, on_progress), (s.status, on_status), (s.log, on_log),
+                    (s.finished, on_done), (s.failed, on_error)):
+        if cb:
+            sig.connect(cb)
+    s.finished.connect(lambda _r: _running.discard(job))
+    s.failed.connect(lambda _e: _running.discard(job))
+    _running.add(job)
+    QThreadPool.globalInstance().start(job)
+    return job
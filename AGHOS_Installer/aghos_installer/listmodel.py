@@ -0,0 +1,76 @@
+"""
+Model listy dla długich list wyboru (strefy, locale): wiersze dociągane
+partiami (`fetchMore`) zamiast setek `addItem`, oraz filtr „podczas pisania”.
+
+Filtr jest przyrostowy – dopisanie znaku zawęża bieżące dopasowania,
+zamiast ponownie przeszukiwać całą listę.
+"""
+
+from typing import List, Sequence
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PySide6.QtWidgets import QComboBox, QCompleter
+
+BATCH = 200
+
+
+class FilterListModel(QAbstractListModel):
+    def __init__(self, items: Sequence[str], parent=None):
+        super().__init__(parent)
+        self._items: List[str] = list(items)
+        self._keys = [s.lower() for s in self._items]
+        self._filter = ''
+        self._match = list(range(len(self._items)))
+        self._shown = min(BATCH, len(self._match))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._shown
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self._items[self._match[index.row()]]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._shown < len(self._match)
+
+    def fetchMore(self, parent=QModelIndex()):
+        n = min(BATCH, len(self._match) - self._shown)
+        if n <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._shown, self._shown + n - 1)
+        self._shown += n
+        self.endInsertRows()
+
+    def set_filter(self, text: str):
+        text = text.strip().lower()
+        base = self._match if text.startswith(self._filter) else range(len(self._items))
+        self.beginResetModel()
+        self._filter = text
+        self._match = [i for i in base if text in self._keys[i]]
+        self._shown = min(BATCH, len(self._match))
+        self.endResetModel()
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._items
+
+
+def make_picker(combo: QComboBox, items: Sequence[str], current: str = '') -> FilterListModel:
+    """
+    Edytowalny QComboBox nad `items`: lista rozwijana ładuje się partiami,
+    a wpisywanie pokazuje podpowiedzi z przyrostowego filtra (podciąg, bez
+    rozróżniania wielkości liter – „wars” → Europe/Warsaw).
+    """
+    combo.setEditable(True)
+    combo.setInsertPolicy(QComboBox.NoInsert)
+    combo.setModel(FilterListModel(items, combo))
+
+    hints = FilterListModel(items, combo)
+    completer = QCompleter(hints, combo)
+    completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+    completer.setCaseSensitivity(Qt.CaseInsensitive)
+    combo.setCompleter(completer)
+    combo.lineEdit().textEdited.connect(hints.set_filter)
+    if current:
+        combo.setEditText(current)
+    return hints
@@ -0,0 +1,136 @@
+"""
+Log instalacji: zapis z dowolnego wątku bez blokowania wątku GUI.
+
+`write()` dokłada rekord do dwóch kolejek `deque` (append jest atomowy –
+piszący nie biorą żadnej blokady):
+  * ograniczonej (`CONSOLE_LINES`) – konsola GUI opróżnia ją partiami
+    timerem (`drain()`); gdy GUI nie nadąża, najstarsze wiersze odpadają,
+  * pełnej – wątek w tle dopisuje ją jako JSON lines do `LOG_PATH`.
+
+Na koniec instalacji `copy_to('/mnt')` kopiuje pełny log do
+/var/log/aghos-install.log systemu docelowego.
+"""
+
+import os
+import json
+import time
+import shutil
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+LOG_PATH = os.environ.get('AGHOS_LOG') or f"/tmp/aghos-install-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+TARGET_LOG = 'var/log/aghos-install.log'
+CONSOLE_LINES = 5000
+FLUSH_INTERVAL = 0.5
+
+_console: deque = deque(maxlen=CONSOLE_LINES)
+_pending: deque = deque()
+_wake = threading.Event()
+_write_lock = threading.Lock()       # tylko wątek zapisu vs flush(), nie piszący
+_writer: Optional[threading.Thread] = None
+_start_lock = threading.Lock()
+
+
+def _level(text: str) -> str:
+    if text.startswith('❌'):
+        return 'error'
+    if text.startswith('⚠️'):
+        return 'warning'
+    return 'info'
+
+
+def write(text: str, level: Optional[str] = None):
+    """Rekord do konsoli i do pliku; bezpieczne z każdego wątku."""
+    text = str(text)
+    _console.append(text)
+    _pending.append({'ts': round(time.time(), 3), 'level': level or _level(text),
+                     'thread': threading.current_thread().name, 'msg': text})
+    if _writer is None:
+        _start()
+
+
+def drain(limit: int = CONSOLE_LINES) -> List[str]:
+    """Zabiera do `limit` oczekujących wierszy konsoli (wątek GUI)."""
+    out = []
+    try:
+        while len(out) < limit:
+            out.append(_console.popleft())
+    except IndexError:
+        pass
+    return out
+
+
+def _write_pending():
+    with _write_lock:
+        if not _pending:
+            return
+        lines = []
+        try:
+            while True:
+                lines.append(json.dumps(_pending.popleft(), ensure_ascii=False))
+        except IndexError:
+            pass
+        try:
+            with open(LOG_PATH, 'a', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            pass
+
+
+def _loop():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        _write_pending()
+
+
+def _start():
+    global _writer
+    with _start_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_loop, name='logsink', daemon=True)
+            _writer.start()
+
+
+def flush():
+    """Zapisuje na dysk wszystko, co czeka w kolejce (synchronicznie)."""
+    _write_pending()
+
+
+def copy_to(root: str = '/mnt', log: Callable[[str], None] = print) -> Optional[str]:
+    """Kopiuje pełny log do `root`/var/log/aghos-install.log; zwraca ścieżkę lub None."""
+    flush()
+    dest = os.path.join(root, TARGET_LOG)
+    if not os.path.exists(LOG_PATH) or not os.path.isdir(os.path.join(root, 'var')):
+        return None
+    try:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(LOG_PATH, dest)
+        os.chmod(dest, 0o600)
+    except OSError as e:
+        log(f"⚠️ Nie udało się skopiować logu do {dest}: {e}")
+        return None
+    log(f"📝 Log instalacji: {dest}")
+    return dest
+
+
+if __name__ == '__main__':
+    # python -m aghos_installer.logsink – koszt write() z kilku wątków naraz
+    LOG_PATH = os.path.join('/tmp', f'aghos-logsink-bench-{os.getpid()}.jsonl')
+    N, T = 50000, 4
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=lambda: [write(f"wiersz {i}") for i in range(N)]) for _ in range(T)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    t1 = time.perf_counter()
+    flush()
+    t2 = time.perf_counter()
+    with open(LOG_PATH) as f:
+        written = sum(1 for _ in f)
+    os.remove(LOG_PATH)
+    print(f"write(): {N * T} rekordów w {(t1 - t0) * 1e3:0.0f} ms "
+          f"({(t1 - t0) / (N * T) * 1e6:0.2f} µs/rekord), zapis reszty {(t2 - t1) * 1e3:0.0f} ms")
+    print(f"w pliku: {written}, w konsoli: {len(drain())} (limit {CONSOLE_LINES})")
@@ -0,0 +1,226 @@
+"""
+Manifest wydań na serwerze dystrybucji (`<base>/manifest.json`):
+
+    {"releases": [
+      {"name": "aghos-2025.05-rootfs.tar.zst", "size": 1234567890,
+       "unpacked_size": 4567890123, "sha512": "…", "date": "2025-05-01"}, …]}
+
+Pobierany przez jedno współdzielone połączenie keep-alive na host
+(`Session`, http.client) i cache'owany na dysku z `ETag` – kolejne
+uruchomienia pytają `If-None-Match` i przy 304 biorą kopię z cache, a bez
+sieci – ostatnią znaną. W obrębie procesu manifest czytany jest raz
+(preload etapu 3 w tle, potem `find()` przy pobieraniu).
+
+Bez manifestu (404, zły JSON) – lista archiwów z indeksu HTML katalogu,
+jak dotąd, bez rozmiarów i sum.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+import http.client
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+from aghos_installer.tzlocale import cache_dir
+
+MANIFEST = 'manifest.json'
+TIMEOUT = 10
+
+
+class Response:
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: int, headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self) -> str:
+        return self.body.decode(errors='replace')
+
+
+class Session:
+    """Połączenia keep-alive po jednym na (schemat, host), bezpieczne dla wątków."""
+
+    def __init__(self, timeout: float = TIMEOUT):
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _conn(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        with self._lock:
+            pool = self._idle.get((scheme, netloc))
+            if pool:
+                return pool.pop()
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout)
+
+    def _release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection):
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(conn)
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, redirects: int = 3) -> Response:
+        u = urllib.parse.urlsplit(url)
+        path = (u.path or '/') + (f"?{u.query}" if u.query else '')
+        for attempt in (0, 1):
+            conn = self._conn(u.scheme, u.netloc)
+            reused = conn.sock is not None
+            try:
+                conn.request('GET', path, headers=headers or {})
+                r = conn.getresponse()
+                body = r.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if attempt or not reused:
+                    raise
+                continue    # serwer zamknął bezczynne połączenie – ponownie na nowym
+            if r.will_close:
+                conn.close()
+            else:
+                self._release(u.scheme, u.netloc, conn)
+            if r.status in (301, 302, 303, 307, 308) and redirects and r.getheader('Location'):
+                return self.get(urllib.parse.urljoin(url, r.getheader('Location')), headers, redirects - 1)
+            return Response(r.status, r.headers, body)
+
+    def close(self):
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for pool in pools.values():
+            for conn in pool:
+                conn.close()
+
+
+SESSION = Session()
+
+
+class Release:
+    __slots__ = ('name', 'size', 'unpacked_size', 'sha512', 'date')
+
+    def __init__(self, name: str, size: int = 0, unpacked_size: int = 0,
+                 sha512: Optional[str] = None, date: str = ''):
+        self.name = name
+        self.size = size
+        self.unpacked_size = unpacked_size
+        self.sha512 = sha512
+        self.date = date
+
+    @classmethod
+    def from_json(cls, d: dict) -> "Release":
+        return cls(d['name'], int(d.get('size') or 0), int(d.get('unpacked_size') or 0),
+                   d.get('sha512') or None, str(d.get('date') or ''))
+
+    def __repr__(self):
+        return f"Release({self.name!r}, {self.size / 1024**2:0.0f} MiB → {self.unpacked_size / 1024**2:0.0f} MiB)"
+
+
+def _cache_path(url: str) -> str:
+    return os.path.join(cache_dir(), f"manifest-{hashlib.sha1(url.encode()).hexdigest()[:12]}.json")
+
+
+def _read_cache(url: str) -> Tuple[Optional[str], Optional[str]]:
+    try:
+        with open(_cache_path(url)) as f:
+            d = json.load(f)
+        return d.get('etag'), d['body']
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+
+def _write_cache(url: str, etag: Optional[str], body: str):
+    path = _cache_path(url)
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'etag': etag, 'body': body}, f)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+
+
+def _parse(body: str) -> List[Release]:
+    d = json.loads(body)
+    items = d['releases'] if isinstance(d, dict) else d
+    out = [Release.from_json(x) for x in items]
+    # najnowsze pierwsze: data, potem nazwa
+    out.sort(key=lambda r: (r.date, r.name), reverse=True)
+    return out
+
+
+def fetch_manifest(base: str, session: Session = SESSION) -> Optional[List[Release]]:
+    """Wydania z manifest.json (warunkowo, z cache); None, gdy serwer nie ma manifestu."""
+    url = base.rstrip('/') + '/' + MANIFEST
+    etag, cached = _read_cache(url)
+    try:
+        r = session.get(url, {'If-None-Match': etag} if etag and cached else None)
+    except (OSError, http.client.HTTPException):
+        r = None
+    try:
+        if r is not None and r.status == 304 and cached:
+            return _parse(cached)
+        if r is not None and r.status == 200:
+            releases = _parse(r.text())
+            _write_cache(url, r.headers.get('ETag'), r.text())
+            return releases
+        if r is None and cached:
+            return _parse(cached)       # bez sieci – ostatni znany manifest
+    except (ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def scrape_index(base: str, session: Session = SESSION) -> List[Release]:
+    """Archiwa .tar.zst z indeksu HTML katalogu (najnowsze pierwsze, bez rozmiarów)."""
+    try:
+        r = session.get(base)
+        if r.status != 200:
+            return []
+    except (OSError, http.client.HTTPException):
+        return []
+    files = re.findall(r'href=["\']([^"\']+\.tar\.zst)["\']', r.text())
+    return [Release(name) for name in sorted(set(files), reverse=True)]
+
+
+_memo: Dict[str, List[Release]] = {}
+_memo_lock = threading.Lock()
+
+
+def releases(base: str, session: Session = SESSION, refresh: bool = False) -> List[Release]:
+    """Wydania z manifestu albo (bez niego) z indeksu HTML; w procesie pobierane raz."""
+    with _memo_lock:
+        if base in _memo and not refresh:
+            return _memo[base]
+    found = fetch_manifest(base, session)
+    if found is None:
+        found = scrape_index(base, session)
+    if found:
+        with _memo_lock:
+            _memo[base] = found
+    return found
+
+
+def find(base: str, name: str, session: Session = SESSION) -> Optional[Release]:
+    return next((r for r in releases(base, session) if r.name == name), None)
+
+
+def fetch_text(url: str, session: Session = SESSION) -> Optional[str]:
+    """Krótki plik tekstowy (np. .sha512) tym samym połączeniem; None przy błędzie."""
+    try:
+        r = session.get(url)
+    except (OSError, http.client.HTTPException):
+        return None
+    return r.text() if r.status == 200 else None
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    base = sys.argv[1] if len(sys.argv) > 1 else "https://aghos.agh.edu.pl/distro/"
+    for _ in range(2):
+        t0 = time.perf_counter()
+        rel = releases(base, refresh=True)
+        print(f"{len(rel)} wydań w {(time.perf_counter() - t0) * 1e3:0.0f} ms")
+    for r in rel[:5]:
+        print(f"  {r}")
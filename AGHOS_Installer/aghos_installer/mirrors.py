@@ -0,0 +1,249 @@
+"""
+Lustra serwera dystrybucji: lista, pomiar i wybór najszybszych.
+
+Lista (jeden adres bazowy na wiersz, `#` – komentarz) pochodzi z:
+  1. `AGHOS_MIRRORS` (adresy rozdzielone przecinkami) – testy, sieci lokalne,
+  2. `mirrors.txt` pobranego z serwera głównego (`refresh()`, cache w
+     `tzlocale.cache_dir()`),
+  3. `mirrors.txt` dołączonego do instalatora.
+Serwer główny jest zawsze na liście.
+
+`rank()` mierzy wszystkie lustra równolegle: opóźnienie (Range 0-0) i
+przepustowość krótkiego zakresu (`SAMPLE`); lustra z innym rozmiarem
+archiwum niż większość (nieaktualne) odpadają. `select()` zwraca adresy
+archiwum w kolejności rankingu i liczbę luster, między które
+`download.download` rozkłada zakresy – reszta służy tylko do przejęcia
+zakresu po błędzie. Suma SHA-512 zawsze z jednego pliku `.sha512` serwera
+głównego.
+
+Sprawdzenie na lokalnych serwerach z ograniczoną przepustowością:
+    python -m aghos_installer.mirrors --selftest
+"""
+
+import os
+import sys
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from aghos_installer.tzlocale import cache_dir
+
+SHIPPED = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mirrors.txt')
+LIST_NAME = 'mirrors.txt'
+SAMPLE = 512 * 1024
+PROBE_TIMEOUT = 5
+MAX_STRIPE = 4
+STRIPE_RATIO = 0.5      # do rozkładania zakresów: lustra ≥ 50% przepustowości najlepszego
+
+
+def parse(text: str) -> List[str]:
+    out = []
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if line:
+            out.append(line.rstrip('/') + '/')
+    return out
+
+
+def _read(path: str) -> List[str]:
+    try:
+        with open(path) as f:
+            return parse(f.read())
+    except OSError:
+        return []
+
+
+def load(origin: str) -> List[str]:
+    """Adresy bazowe luster (serwer główny pierwszy, bez powtórzeń)."""
+    env = os.environ.get('AGHOS_MIRRORS')
+    if env:
+        bases = parse(env.replace(',', '\n'))
+    else:
+        bases = _read(os.path.join(cache_dir(), LIST_NAME)) or _read(SHIPPED)
+    origin = origin.rstrip('/') + '/'
+    return list(dict.fromkeys([origin] + bases))
+
+
+def refresh(origin: str, timeout: float = 3, log: Callable[[str], None] = print) -> bool:
+    """Pobiera aktualny mirrors.txt z serwera głównego do cache."""
+    try:
+        with urllib.request.urlopen(origin.rstrip('/') + '/' + LIST_NAME, timeout=timeout) as r:
+            text = r.read(64 * 1024).decode(errors='replace')
+    except Exception:
+        return False
+    if not parse(text):
+        return False
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        path = os.path.join(cache_dir(), LIST_NAME)
+        with open(path + '.tmp', 'w') as f:
+            f.write(text)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        log(f"⚠️ Nie zapisałem listy luster: {e}")
+    return True
+
+
+class Probe:
+    __slots__ = ('base', 'url', 'latency', 'rate', 'size', 'error')
+
+    def __init__(self, base: str, url: str):
+        self.base = base
+        self.url = url
+        self.latency = 0.0      # s do pierwszego bajtu
+        self.rate = 0.0         # B/s na krótkim zakresie
+        self.size = 0
+        self.error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        if not self.ok:
+            return f"Probe({self.base}: {self.error})"
+        return f"Probe({self.base}: {self.latency * 1e3:0.0f} ms, {self.rate / 1024**2:0.1f} MB/s)"
+
+
+def probe(base: str, archive: str, sample: int = SAMPLE, timeout: float = PROBE_TIMEOUT) -> Probe:
+    """Opóźnienie (Range 0-0) i przepustowość zakresu `sample` bajtów archiwum na lustrze."""
+    p = Probe(base, base + archive)
+    try:
+        t0 = time.perf_counter()
+        req = urllib.request.Request(p.url, headers={'Range': 'bytes=0-0'})
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            r.read()
+            if r.status != 206:
+                raise RuntimeError("brak obsługi Range")
+            total = (r.getheader('Content-Range') or '').rpartition('/')[2]
+            p.size = int(total) if total.isdigit() else 0
+        p.latency = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        req = urllib.request.Request(p.url, headers={'Range': f'bytes=0-{sample - 1}'})
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            got = len(r.read())
+        p.rate = got / max(time.perf_counter() - t0 - p.latency, 1e-3)
+    except Exception as e:
+        p.error = str(e) or type(e).__name__
+    return p
+
+
+def rank(bases: Sequence[str], archive: str, sample: int = SAMPLE,
+         timeout: float = PROBE_TIMEOUT) -> List[Probe]:
+    """Wszystkie pomiary: działające od najszybszego, potem nieudane."""
+    with ThreadPoolExecutor(max_workers=max(1, len(bases)), thread_name_prefix='mirror') as ex:
+        probes = list(ex.map(lambda b: probe(b, archive, sample, timeout), bases))
+    sizes = Counter(p.size for p in probes if p.ok)
+    if sizes:
+        size = sizes.most_common(1)[0][0]
+        for p in probes:
+            if p.ok and p.size != size:
+                p.error = f"inny rozmiar archiwum ({p.size} zamiast {size})"
+    ok = sorted((p for p in probes if p.ok), key=lambda p: (-p.rate, p.latency))
+    return ok + [p for p in probes if not p.ok]
+
+
+def select(archive: str, origin: str, log: Callable[[str], None] = print,
+           refresh_list: bool = True) -> Tuple[List[str], int]:
+    """
+    (adresy archiwum od najlepszego, ile pierwszych dzieli się zakresami).
+    Bez działających luster – sam serwer główny.
+    """
+    if refresh_list and 'AGHOS_MIRRORS' not in os.environ:
+        refresh(origin, log=log)
+    bases = load(origin)
+    origin_url = origin.rstrip('/') + '/' + archive
+    if len(bases) == 1:
+        return [origin_url], 1
+    probes = rank(bases, archive)
+    for p in probes:
+        log(f"  lustro {p!r}")
+    ok = [p for p in probes if p.ok]
+    if not ok:
+        log("⚠️ Żadne lustro nie odpowiedziało – pobieram z serwera głównego.")
+        return [origin_url], 1
+    stripe = sum(1 for p in ok[:MAX_STRIPE] if p.rate >= ok[0].rate * STRIPE_RATIO)
+    log(f"➡️ Pobieranie z: {', '.join(p.base for p in ok[:stripe])}")
+    return [p.url for p in ok], stripe
+
+
+# ---- sprawdzenie na lokalnych serwerach ----
+
+def _selftest() -> int:
+    import hashlib
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from aghos_installer.download import download
+
+    blob = os.urandom(24 * 1024 * 1024)
+    digest = hashlib.sha512(blob).hexdigest()
+
+    def server(rate: float, fail_after: Optional[int] = None):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_a):
+                pass
+
+            def do_GET(self):
+                start, end = 0, len(blob) - 1
+                rng = self.headers.get('Range')
+                if rng:
+                    a, _, b = rng.split('=', 1)[1].partition('-')
+                    start, end = int(a), int(b) if b else len(blob) - 1
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{len(blob)}')
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Length', str(end - start + 1))
+                self.end_headers()
+                sent, step = 0, 64 * 1024
+                try:
+                    for pos in range(start, end + 1, step):
+                        if fail_after is not None and srv.served >= fail_after:
+                            self.connection.shutdown(2)
+                            return
+                        buf = blob[pos:min(pos + step, end + 1)]
+                        self.wfile.write(buf)
+                        sent += len(buf)
+                        srv.served += len(buf)
+                        time.sleep(len(buf) / rate)
+                except OSError:
+                    pass
+
+        srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        srv.served = 0
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return srv, f"http://127.0.0.1:{srv.server_address[1]}/"
+
+    MB = 1024 ** 2
+    fast, fast_url = server(12 * MB)
+    mid, mid_url = server(8 * MB, fail_after=6 * MB)   # zrywa połączenia po 6 MB
+    slow, slow_url = server(1 * MB)
+    os.environ['AGHOS_MIRRORS'] = ','.join([mid_url, slow_url])
+    try:
+        t0 = time.perf_counter()
+        urls, stripe = select('rootfs.tar.zst', fast_url, log=print)
+        print(f"ranking w {time.perf_counter() - t0:0.2f} s, rozkładanie na {stripe}")
+        with tempfile.TemporaryDirectory() as tmp:
+            dest = os.path.join(tmp, 'rootfs.tar.zst')
+            t0 = time.perf_counter()
+            got = download(urls, dest, parts=4, stripe=stripe, log=print)
+            dt = time.perf_counter() - t0
+        print(f"pobrano {len(blob) / MB:0.0f} MB w {dt:0.2f} s ({len(blob) / MB / dt:0.1f} MB/s); "
+              f"z luster: {fast.served / MB:0.1f} / {mid.served / MB:0.1f} / {slow.served / MB:0.1f} MB")
+        print("SHA-512 OK" if got == digest else "❌ SHA-512 niezgodna")
+        return 0 if got == digest else 1
+    finally:
+        for s in (fast, mid, slow):
+            s.shutdown()
+
+
+if __name__ == '__main__':
+    if '--selftest' in sys.argv:
+        sys.exit(_selftest())
+    origin = sys.argv[1] if len(sys.argv) > 1 else "https://aghos.agh.edu.pl/distro/"
+    for p in rank(load(origin), "latest-rootfs.tar.zst"):
+        print(p)
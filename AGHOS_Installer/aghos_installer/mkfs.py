@@ -0,0 +1,122 @@
+"""
+Równoległe formatowanie partycji i montowanie w kolejności zależności.
+
+mkfs na różnych partycjach nie zależą od siebie, a na dużych dyskach
+każdy z osobna potrafi długo trwać (tablice i-węzłów ext4, discard przy
+mkfs.btrfs). `format_all()` uruchamia je jednocześnie w ograniczonej puli
+i przekazuje wyjście każdego wiersz po wierszu z prefiksem `[sda2]`.
+Montowanie (`mount_all()`) idzie dopiero potem: najpierw `/`, następnie
+punkty zagnieżdżone od najpłytszych.
+
+`discard=False` pomija TRIM całego urządzenia (szybkie formatowanie).
+"""
+
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+MAX_WORKERS = 4
+SWAP_FS = ('swap', 'linux-swap', 'swapspace')
+
+# flaga „bez discard” dla danego mkfs
+NODISCARD = {
+    'ext2': ['-E', 'nodiscard'],
+    'ext3': ['-E', 'nodiscard'],
+    'ext4': ['-E', 'nodiscard'],
+    'btrfs': ['-K'],
+    'xfs': ['-K'],
+    'f2fs': ['-t', '0'],
+}
+
+
+def mkfs_cmd(device: str, fstype: str, discard: bool = True) -> List[str]:
+    fstype = fstype.lower()
+    if fstype in SWAP_FS:
+        return ['mkswap', device]
+    if fstype == 'btrfs':
+        cmd = ['mkfs.btrfs', '-f']
+    elif fstype == 'vfat':
+        cmd = ['mkfs.vfat', '-F', '32']
+    elif fstype in ('ext2', 'ext3', 'ext4'):
+        cmd = ['mkfs.' + fstype, '-F']
+    elif fstype == 'xfs':
+        cmd = ['mkfs.xfs', '-f']
+    elif fstype == 'f2fs':
+        cmd = ['mkfs.f2fs', '-f']
+    else:
+        fstype = 'ext4'
+        cmd = ['mkfs.ext4', '-F']
+    if not discard:
+        cmd += NODISCARD.get(fstype, [])
+    return cmd + [device]
+
+
+def _run_prefixed(cmd: List[str], prefix: str, log: Callable[[str], None]) -> Tuple[int, str]:
+    tail = deque(maxlen=20)
+    log(f"{prefix} {' '.join(cmd)}")
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, errors='replace')
+    except OSError as e:
+        return 127, str(e)
+    for line in proc.stdout:
+        line = line.rstrip()
+        if line:
+            tail.append(line)
+            log(f"{prefix} {line}")
+    return proc.wait(), "\n".join(tail)
+
+
+def format_all(targets: List[Tuple[str, str]], discard: bool = True,
+               log: Callable[[str], None] = print, workers: int = MAX_WORKERS) -> Dict[str, str]:
+    """
+    Formatuje [(urządzenie, fstype), …] równolegle. Zwraca {urządzenie: ostatnie
+    wiersze wyjścia} dla nieudanych; pusty słownik – wszystko OK.
+    """
+    if not targets:
+        return {}
+
+    def one(target):
+        dev, fstype = target
+        rc, out = _run_prefixed(mkfs_cmd(dev, fstype, discard), f"[{os.path.basename(dev)}]", log)
+        return dev, rc, out
+
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as pool:
+        for dev, rc, out in pool.map(one, targets):
+            if rc != 0:
+                failed[dev] = out
+            else:
+                log(f"✅ [{os.path.basename(dev)}] sformatowano")
+    return failed
+
+
+def mount_order(mounts: Dict[str, str]) -> List[Tuple[str, str]]:
+    """[(punkt, urządzenie)] – `/` pierwszy, potem od najpłytszych (/boot przed /boot/efi)."""
+    def depth(mp):
+        return 0 if mp == '/' else mp.rstrip('/').count('/')
+    return sorted(mounts.items(), key=lambda kv: (depth(kv[0]), kv[0]))
+
+
+def mount_all(mounts: Dict[str, str], root: str = '/mnt',
+              log: Callable[[str], None] = print) -> Dict[str, str]:
+    """
+    Montuje {punkt: urządzenie} pod `root` w kolejności zależności.
+    Punkt, którego rodzic się nie zamontował, jest pomijany. Zwraca {punkt: błąd}.
+    """
+    errors: Dict[str, str] = {}
+    for mp, dev in mount_order(mounts):
+        parent = next((p for p in errors if p == '/' or mp.startswith(p.rstrip('/') + '/')), None)
+        if parent:
+            errors[mp] = f"nie zamontowano {parent}"
+            continue
+        tgt = root if mp == '/' else root + mp
+        os.makedirs(tgt, exist_ok=True)
+        r = subprocess.run(['mount', dev, tgt], capture_output=True, text=True)
+        if r.returncode != 0:
+            errors[mp] = r.stderr.strip()
+            continue
+        log(f"✅ {dev} → {mp}")
+    return errors
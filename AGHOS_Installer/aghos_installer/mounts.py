@@ -0,0 +1,164 @@
+"""
+Tablica montowań z /proc/self/mountinfo (bez findmnt) i odmontowywanie
+drzewa montowań bez procesów potomnych.
+
+`unmount_tree('/mnt')` czyta mountinfo raz, buduje drzewo podmontowań
+i odmontowuje je od liści (`umount2`, jedno wywołanie na rzeczywiste
+montowanie – bez `umount -R`/`-l` na ślepo). Dla zajętych montowań
+`holders()` wskazuje procesy (otwarte pliki, cwd, root z /proc/<pid>).
+"""
+
+import os
+import re
+import ctypes
+import errno
+from typing import Callable, Dict, List, Optional, Tuple
+
+MOUNTINFO = '/proc/self/mountinfo'
+
+
+def _unescape(s: str) -> str:
+    return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), s)
+
+
+class Mount:
+    __slots__ = ('mount_id', 'parent_id', 'devno', 'root', 'target',
+                 'options', 'fstype', 'source', 'super_options')
+
+    def __init__(self, mount_id, parent_id, devno, root, target, options, fstype, source, super_options):
+        self.mount_id = mount_id
+        self.parent_id = parent_id
+        self.devno = devno
+        self.root = root
+        self.target = target
+        self.options = options
+        self.fstype = fstype
+        self.source = source
+        self.super_options = super_options
+
+    @classmethod
+    def parse(cls, line: str) -> "Mount":
+        pre, _, post = line.rstrip('\n').partition(' - ')
+        f = pre.split(' ')
+        fstype, source, sopts = (post.split(' ') + ['', ''])[:3]
+        return cls(int(f[0]), int(f[1]), f[2], _unescape(f[3]), _unescape(f[4]),
+                   f[5].split(','), fstype, _unescape(source), sopts.split(','))
+
+    def __repr__(self):
+        return f"Mount({self.source} → {self.target} [{self.fstype}])"
+
+
+def read_mounts(path: str = MOUNTINFO) -> List[Mount]:
+    with open(path) as f:
+        return [Mount.parse(line) for line in f if line.strip()]
+
+
+def mounts_under(root: str = '/mnt', mounts: Optional[List[Mount]] = None) -> List[Mount]:
+    """Montowania w `root` i poniżej, w kolejności z mountinfo (rodzic przed dzieckiem)."""
+    root = root.rstrip('/') or '/'
+    prefix = root + '/' if root != '/' else '/'
+    if mounts is None:
+        mounts = read_mounts()
+    return [m for m in mounts if m.target == root or m.target.startswith(prefix)]
+
+
+# ---- drzewo montowań ----
+
+MNT_FORCE = 1
+MNT_DETACH = 2
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _nolog(_msg: str):
+    pass
+
+
+def umount2(target: str, flags: int = 0):
+    if _libc.umount2(os.fsencode(target), flags) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), target)
+
+
+def unmount_order(root: str = '/mnt', mounts: Optional[List[Mount]] = None) -> List[Mount]:
+    """Montowania w `root` i poniżej od liści do korzenia (dzieci i nakładki przed rodzicem)."""
+    under = mounts_under(root, mounts)
+    ids = {m.mount_id for m in under}
+    children: Dict[int, List[Mount]] = {}
+    for m in under:
+        children.setdefault(m.parent_id, []).append(m)
+
+    order: List[Mount] = []
+
+    def visit(m: Mount):
+        # od ostatnio zamontowanych – tak jak zdejmuje je jądro
+        for c in reversed(children.get(m.mount_id, [])):
+            visit(c)
+        order.append(m)
+
+    for m in reversed(under):
+        if m.parent_id not in ids:
+            visit(m)
+    return order
+
+
+def holders(target: str, proc: str = '/proc') -> List[Tuple[int, str]]:
+    """[(pid, nazwa)] procesów z otwartym plikiem, cwd albo root w `target`."""
+    target = target.rstrip('/') or '/'
+    prefix = target + '/'
+
+    def inside(link: str) -> bool:
+        try:
+            path = os.readlink(link)
+        except OSError:
+            return False
+        return path == target or path.startswith(prefix)
+
+    out = []
+    for pid in os.listdir(proc):
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        base = os.path.join(proc, pid)
+        try:
+            fds = [os.path.join(base, 'fd', fd) for fd in os.listdir(os.path.join(base, 'fd'))]
+        except OSError:
+            fds = []
+        if any(inside(link) for link in [os.path.join(base, 'cwd'), os.path.join(base, 'root')] + fds):
+            try:
+                with open(os.path.join(base, 'comm')) as f:
+                    comm = f.read().strip()
+            except OSError:
+                comm = '?'
+            out.append((int(pid), comm))
+    return out
+
+
+def unmount_tree(root: str = '/mnt', lazy: bool = True, log: Callable[[str], None] = _nolog,
+                 mounts: Optional[List[Mount]] = None) -> List[Tuple[str, str]]:
+    """
+    Odmontowuje wszystko w `root` od liści; zajęte podmontowania (poza samym
+    `root`) odłącza leniwie, gdy `lazy`. Zwraca [(punkt, błąd)] nieodmontowanych.
+    """
+    root = root.rstrip('/') or '/'
+    failed = []
+    for m in unmount_order(root, mounts if mounts is not None else read_mounts()):
+        try:
+            umount2(m.target)
+            log(f"🔄 Odmontowano {m.target}")
+            continue
+        except OSError as e:
+            if e.errno in (errno.EINVAL, errno.ENOENT):
+                continue        # już odmontowane (np. razem z odłączonym rodzicem)
+            if e.errno != errno.EBUSY:
+                failed.append((m.target, e.strerror))
+                continue
+        who = ", ".join(f"{pid} ({comm})" for pid, comm in holders(m.target)) or "nieznany proces"
+        if lazy and m.target != root:
+            try:
+                umount2(m.target, MNT_DETACH)
+                log(f"⚠️ {m.target} zajęte przez {who} – odłączono leniwie")
+                continue
+            except OSError:
+                pass
+        failed.append((m.target, f"zajęte przez {who}"))
+    return failed
@@ -0,0 +1,197 @@
+"""
+Plan partycjonowania → jeden skrypt `sfdisk`.
+
+Zamiast osobnego `parted -s` na mklabel, każde mkpart, każdą flagę i nazwę
+(plus stałe `sleep`) lista wierszy edytora kompilowana jest do jednego
+skryptu sfdisk: tablica, typy (ESP / swap / Linux), rozmiary i nazwy GPT
+w jednym wywołaniu. Potem jedno `partx -u` i czekanie na zdarzenia udev
+(`udevadm settle --exit-if-exists=<ostatnia partycja>`), a nie na zegar.
+
+Węzły partycji liczone są z sysfs (aghos_installer.blockdev), z regułą
+nazewnictwa jądra jako zapasem: sda → sda2, nvme0n1 → nvme0n1p2.
+
+Próba na obrazie loop (wymaga roota i sfdisk):
+    python -m aghos_installer.partplan --loop-test
+"""
+
+import os
+import sys
+import time
+import shutil
+import subprocess
+import tempfile
+from typing import Callable, Dict, List
+
+from aghos_installer.blockdev import inventory
+
+MiB = 1024 ** 2
+SETTLE_TIMEOUT = 10
+
+GPT_TYPES = {
+    'esp': 'C12A7328-F81F-11D2-BA4B-00A0C93EC93B',
+    'swap': '0657FD6D-A4AB-43C4-84E5-0933C84B4F4F',
+    'linux': '0FC63DAF-8483-4772-8E79-3D69D8477DE4',
+}
+# /boot (vfat) w MBR: 0x0c bez flagi bootable – jak dawniej `parted mkpart primary fat32`
+DOS_TYPES = {'esp': 'c', 'fat32': 'c', 'swap': '82', 'linux': '83'}
+SWAP_FS = ('swap', 'linux-swap', 'swapspace')
+
+
+class PlanError(ValueError):
+    pass
+
+
+def _kind(row: dict) -> str:
+    if row['mount'] == '/boot' and row['fs'].startswith('vfat'):
+        return 'esp'
+    if row['fs'] in SWAP_FS or row['mount'].lower() == 'swap':
+        return 'swap'
+    if row['fs'].startswith('vfat'):
+        return 'fat32'
+    return 'linux'
+
+
+def compile_sfdisk(plan: List[dict], ptype: str) -> str:
+    """
+    Skrypt sfdisk dla wierszy planu ({'size', 'mount', 'fs', 'name'}).
+    `ptype` – 'gpt'; każda inna wartość ('mbr', 'msdos') to tablica DOS.
+    Rozmiary zaokrąglane w dół do MiB, partycje wyrównane do 1 MiB jedna
+    za drugą.
+    """
+    label = 'gpt' if ptype == 'gpt' else 'dos'
+    if label == 'dos' and len(plan) > 4:
+        raise PlanError("Tablica MBR mieści najwyżej 4 partycje podstawowe.")
+    lines = [f"label: {label}", ""]
+    for i, row in enumerate(plan, 1):
+        size_mib = row['size'] // MiB
+        if size_mib < 1:
+            raise PlanError(f"Nieprawidłowy rozmiar partycji {i}: {row['size']} B")
+        kind = _kind(row)
+        if label == 'gpt':
+            fields = [f"size={size_mib}MiB", f"type={GPT_TYPES.get(kind, GPT_TYPES['linux'])}"]
+            if row.get('name'):
+                fields.append('name="{}"'.format(row['name'].replace('"', '')))
+        else:
+            fields = [f"size={size_mib}MiB", f"type={DOS_TYPES[kind]}"]
+        lines.append(", ".join(fields))
+    return "\n".join(lines) + "\n"
+
+
+def _kernel_node(disk: str, number: int) -> str:
+    """Reguła jądra: po nazwie kończącej się cyfrą idzie 'p' (nvme0n1p2, mmcblk0p1)."""
+    disk = os.path.basename(disk)
+    sep = 'p' if disk[-1:].isdigit() else ''
+    return f"/dev/{disk}{sep}{number}"
+
+
+def partition_node(disk: str, number: int) -> str:
+    """Ścieżka /dev partycji `number` dysku `disk` (nazwa albo /dev/…)."""
+    for p in inventory().partitions(os.path.basename(disk)):
+        if p.number == number:
+            return p.path
+    return _kernel_node(disk, number)
+
+
+def _wait_for(nodes: List[str], timeout: float = SETTLE_TIMEOUT):
+    udevadm = shutil.which('udevadm')
+    if udevadm and nodes:
+        subprocess.run([udevadm, 'settle', f'--timeout={int(timeout)}',
+                        f'--exit-if-exists={nodes[-1]}'], check=False)
+    # bez udev (np. kontener) – krótkie odpytywanie zamiast stałego sleep
+    deadline = time.time() + timeout
+    while not all(os.path.exists(n) for n in nodes):
+        if time.time() > deadline:
+            missing = [n for n in nodes if not os.path.exists(n)]
+            raise PlanError(f"Brak węzłów partycji po {timeout:.0f} s: {', '.join(missing)}")
+        time.sleep(0.05)
+
+
+def apply(disk: str, plan: List[dict], ptype: str,
+          log: Callable[[str], None] = print) -> Dict[int, str]:
+    """
+    Zapisuje tablicę partycji jednym wywołaniem sfdisk i czeka na węzły.
+    Zwraca {numer partycji: '/dev/…'}.
+    """
+    dev = disk if disk.startswith('/dev/') else f"/dev/{disk}"
+    script = compile_sfdisk(plan, ptype)
+    log(f"sfdisk {dev}:\n{script.rstrip()}")
+    r = subprocess.run(['sfdisk', '--wipe', 'always', '--wipe-partitions', 'always', dev],
+                       input=script, capture_output=True, text=True)
+    if r.returncode != 0:
+        raise PlanError(f"sfdisk nie powiódł się:\n{r.stderr.strip()}")
+    subprocess.run(['partx', '-u', dev], capture_output=True)
+    inventory().invalidate()
+    _wait_for([_kernel_node(dev, i) for i in range(1, len(plan) + 1)])
+    inventory().refresh()
+    return {i: partition_node(dev, i) for i in range(1, len(plan) + 1)}
+
+
+# ---- próba na obrazie loop ----
+
+def _loop_test() -> int:
+    """
+    Plan na obrazie loop dla GPT i DOS; sprawdza typy i nazwy (`sfdisk -J`)
+    oraz węzły partycji. loopN kończy się cyfrą, więc węzły mają postać
+    loopNpM – ta sama reguła co nvme0n1p2.
+    """
+    import json
+
+    plan = [
+        {'size': 64 * MiB, 'mount': '/boot', 'fs': 'vfat', 'name': 'boot'},
+        {'size': 128 * MiB, 'mount': '/', 'fs': 'ext4', 'name': 'root'},
+        {'size': 32 * MiB, 'mount': 'swap', 'fs': 'swap', 'name': 'swap'},
+    ]
+    failed = []
+
+    def check(name: str, ok: bool, detail: str = ''):
+        print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+        if not ok:
+            failed.append(name)
+
+    for disk, n, node in (('sda', 2, '/dev/sda2'), ('nvme0n1', 2, '/dev/nvme0n1p2'),
+                          ('/dev/mmcblk0', 1, '/dev/mmcblk0p1'), ('loop7', 3, '/dev/loop7p3')):
+        check(f"nazwa węzła {disk} #{n}", _kernel_node(disk, n) == node, _kernel_node(disk, n))
+
+    missing = [t for t in ('sfdisk', 'losetup', 'partx') if not shutil.which(t)]
+    if missing:
+        print(f"❌ Brak narzędzi: {', '.join(missing)} – próba na loop pominięta.")
+        return 1
+
+    with tempfile.TemporaryDirectory(prefix='aghos-part-') as tmp:
+        img = os.path.join(tmp, 'disk.img')
+        subprocess.run(['truncate', '-s', '256M', img], check=True)
+        loop = subprocess.run(['losetup', '-f', '-P', '--show', img], capture_output=True,
+                              text=True, check=True).stdout.strip()
+        try:
+            for ptype in ('gpt', 'msdos'):
+                t0 = time.time()
+                nodes = apply(loop, plan, ptype, log=lambda _m: None)
+                print(f"{ptype}: {time.time() - t0:0.2f} s → {nodes}")
+                table = json.loads(subprocess.run(['sfdisk', '-J', loop], capture_output=True,
+                                                  text=True, check=True).stdout)['partitiontable']
+                parts = table['partitions']
+                check(f"{ptype}: etykieta", table['label'] == ('gpt' if ptype == 'gpt' else 'dos'),
+                      table['label'])
+                check(f"{ptype}: liczba partycji", len(parts) == len(plan), str(len(parts)))
+                types = GPT_TYPES if ptype == 'gpt' else DOS_TYPES
+                want = [types[_kind(r)].upper() for r in plan]
+                got = [p['type'].upper() for p in parts]
+                check(f"{ptype}: typy", got == want, ', '.join(got))
+                if ptype == 'gpt':
+                    names = [p.get('name') for p in parts]
+                    check("gpt: nazwy", names == [r['name'] for r in plan], str(names))
+                else:
+                    check("msdos: bez flagi bootable", not any(p.get('bootable') for p in parts))
+                want_nodes = {i: _kernel_node(loop, i) for i in range(1, len(plan) + 1)}
+                check(f"{ptype}: węzły", nodes == want_nodes and
+                      all(os.path.exists(n) for n in nodes.values()), ' '.join(nodes.values()))
+        finally:
+            subprocess.run(['losetup', '-d', loop])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    if '--loop-test' in sys.argv:
+        sys.exit(_loop_test())
+    else:
+        print(__doc__)
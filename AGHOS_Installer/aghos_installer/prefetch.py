@@ -0,0 +1,126 @@
+"""
+Pobieranie RootFS w tle, zanim użytkownik dojdzie do etapu 3.
+
+Po uzyskaniu łączności (etap 1) `start()` uruchamia wątek, który pobiera
+domyślne archiwum do cache (`rootfs.CACHE_DIR`) z najniższym priorytetem
+I/O i CPU. Etap 3 przed pobraniem woła `claim(archive)`:
+  * to samo archiwum – wątek jest zatrzymywany, a `download` wznawia plik
+    od miejsca przerwania (`<plik>.state`); gotowy plik ma już zapamiętaną
+    sumę (`verify.remember`), więc nie jest czytany drugi raz,
+  * inne archiwum – pobieranie w tle jest przerywane, a częściowy plik
+    usuwany (cache na Live leży zwykle w RAM).
+"""
+
+import os
+import ctypes
+import threading
+from typing import Callable, Optional
+
+from aghos_installer import manifest, mirrors
+from aghos_installer.download import download, state_path, Cancelled
+from aghos_installer.verify import remember, forget
+from aghos_installer.engine import rootfs
+
+# ioprio_set(2): klasa IDLE – dysk dostaje wątek tylko, gdy nikt inny go nie używa
+_SYS_IOPRIO_SET = {'x86_64': 251, 'aarch64': 30, 'i686': 289}.get(os.uname().machine)
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+FREE_FACTOR = 2         # pobieramy w tle tylko, gdy w cache jest 2× rozmiar archiwum
+
+
+def _nolog(_msg: str):
+    pass
+
+
+def _lower_priority():
+    """Najniższy priorytet I/O i CPU dla bieżącego wątku (Linux: per wątek)."""
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, 19)
+    except OSError:
+        pass
+    if _SYS_IOPRIO_SET:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.syscall(_SYS_IOPRIO_SET, IOPRIO_WHO_PROCESS, tid, IOPRIO_CLASS_IDLE << 13)
+
+
+class Prefetch:
+    def __init__(self, archive: str, base: str, cache: str, log: Callable[[str], None]):
+        self.archive = archive
+        self.base = base
+        self.local = os.path.join(cache, archive)
+        self.log = log
+        self.cancel = threading.Event()
+        self.done = False
+        self.thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+
+    def _run(self):
+        _lower_priority()
+        try:
+            rel = manifest.find(self.base, self.archive)
+            cache = os.path.dirname(self.local)
+            if rel and rel.size and rootfs.free_bytes(cache) < rel.size * FREE_FACTOR:
+                self.log(f"ℹ️ Za mało miejsca w {cache} na pobieranie w tle – pominięte.")
+                return
+            if os.path.exists(self.local) and not os.path.exists(state_path(self.local)):
+                self.done = True    # pełny plik już jest – sumę sprawdzi etap 3
+                return
+            urls, stripe = mirrors.select(self.archive, self.base, log=_nolog)
+            self.log(f"⬇️ Pobieram {self.archive} w tle…")
+            forget(self.local)
+            got = download(urls, self.local, parts=2, stripe=min(stripe, 2), log=_nolog,
+                           cancel=self.cancel)
+            remember(self.local, got)
+            self.done = True
+            self.log(f"✅ {self.archive} pobrane w tle.")
+        except Cancelled:
+            pass
+        except Exception as e:
+            # etap 3 i tak pobierze archiwum (i wznowi od tego, co już jest)
+            self.log(f"⚠️ Pobieranie w tle przerwane: {e}")
+
+    def stop(self, discard: bool = False):
+        self.cancel.set()
+        self.thread.join()
+        if discard and not self.done:
+            for p in (self.local, state_path(self.local)):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+
+
+_current: Optional[Prefetch] = None
+_lock = threading.Lock()
+
+
+def start(archive: str = rootfs.DEFAULT_ARCHIVE, base: str = rootfs.DISTRO_URL,
+          cache: str = rootfs.CACHE_DIR, log: Callable[[str], None] = print) -> bool:
+    """Uruchamia pobieranie w tle (raz); False, jeśli już trwa albo się skończyło."""
+    global _current
+    with _lock:
+        if _current is not None:
+            return False
+        _current = Prefetch(archive, base, cache, log)
+        _current.thread.start()
+        return True
+
+
+def claim(archive: str, log: Callable[[str], None] = print) -> bool:
+    """
+    Zatrzymuje pobieranie w tle przed pobraniem `archive` przez etap 3.
+    True, jeśli w cache zostało (częściowe albo pełne) to samo archiwum.
+    """
+    global _current
+    with _lock:
+        pf, _current = _current, None
+    if pf is None:
+        return False
+    same = pf.archive == archive
+    pf.stop(discard=not same)
+    if same and os.path.exists(pf.local):
+        log("Przejmuję archiwum pobrane w tle" + ("." if pf.done else " (wznowienie)."))
+        return True
+    if not same:
+        log(f"Pobieranie w tle ({pf.archive}) anulowane – wybrano {archive}.")
+    return False
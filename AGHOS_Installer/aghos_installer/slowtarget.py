@@ -0,0 +1,206 @@
+"""
+Tryb rozpakowywania dla wolnych nośników (pendrive USB, karty SD).
+
+Na wolnym flashu czas rozpakowania zjadają tysiące drobnych, synchronicznych
+zapisów metadanych. Na czas instalacji:
+- systemy plików pod /mnt są przemontowywane z `noatime` i długim `commit=`
+  (btrfs dodatkowo `compress=zstd:1`, `noflushoncommit`),
+- progi writeback jądra (vm.dirty_*) są podnoszone, żeby małe pliki trafiały
+  na nośnik dużymi paczkami, a nie co kilka sekund,
+- zamiast fsync na plik (bsdtar i tak go nie robi) wykonujemy jeden
+  `syncfs()` na każdy system plików pod /mnt.
+`restore()` robi syncfs i przywraca trwałe opcje – przed generowaniem fstab
+(findmnt kopiuje opcje montowania) i na początku `finish.finish`.
+
+Pomiar na urządzeniu loop (wymaga roota):
+    python -m aghos_installer.slowtarget --bench [--size 2G] [--files 20000]
+"""
+
+import os
+import sys
+import time
+import ctypes
+import shutil
+import tempfile
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+from aghos_installer.mounts import read_mounts, mounts_under
+
+FAST_OPTS = {
+    'ext4': ['noatime', 'commit=60'],
+    'btrfs': ['noatime', 'commit=120', 'compress=zstd:1', 'noflushoncommit'],
+    'f2fs': ['noatime'],
+    'xfs': ['noatime'],
+    'vfat': ['noatime'],
+}
+DEFAULT_COMMIT = {'ext4': '5', 'btrfs': '30'}
+
+FAST_SYSCTL = {
+    'vm/dirty_background_ratio': '50',
+    'vm/dirty_ratio': '80',
+    'vm/dirty_expire_centisecs': '6000',
+    'vm/dirty_writeback_centisecs': '1500',
+}
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+# zapamiętany stan sprzed enable(): {target: [opcje]}, {sysctl: wartość}
+_saved_mounts: Dict[str, List[str]] = {}
+_saved_sysctl: Dict[str, str] = {}
+
+
+def disk_of(source: str, sysfs: str = '/sys') -> Optional[str]:
+    """Węzeł sysfs całego dysku (/sys/devices/…/sda) dla źródła montowania /dev/…; None dla tmpfs itp."""
+    if not source.startswith('/dev/'):
+        return None
+    name = os.path.basename(os.path.realpath(source))
+    node = os.path.realpath(os.path.join(sysfs, 'class', 'block', name))
+    if not os.path.exists(node):
+        return None
+    if os.path.exists(os.path.join(node, 'partition')):
+        node = os.path.dirname(node)
+    return node
+
+
+def is_slow_target(root: str = '/mnt', sysfs: str = '/sys', mounts=None) -> bool:
+    """Czy system plików w `root` leży na nośniku wymiennym / USB / MMC."""
+    m = next((m for m in mounts_under(root, mounts) if m.target == root.rstrip('/')), None)
+    node = disk_of(m.source, sysfs) if m else None
+    if not node:
+        return False
+    try:
+        with open(os.path.join(node, 'removable')) as f:
+            removable = f.read().strip() == '1'
+    except OSError:
+        removable = False
+    return removable or '/usb' in node or os.path.basename(node).startswith('mmcblk')
+
+
+def syncfs(path: str):
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        if _libc.syncfs(fd) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+    finally:
+        os.close(fd)
+
+
+def _remount(target: str, opts: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(['mount', '-o', 'remount,' + ','.join(opts), target],
+                          capture_output=True, text=True)
+
+
+def _durable_opts(fstype: str, options: List[str], super_options: List[str]) -> List[str]:
+    """Opcje, które cofają FAST_OPTS do stanu sprzed enable()."""
+    # samo "relatime" nie zdejmuje MS_NOATIME przy remount – potrzebne "atime"
+    if 'noatime' in options:
+        opts = ['noatime']
+    else:
+        opts = ['atime', 'relatime' if 'relatime' in options else 'strictatime']
+    if fstype in DEFAULT_COMMIT:
+        commit = next((o for o in super_options if o.startswith('commit=')), None)
+        opts.append(commit or f"commit={DEFAULT_COMMIT[fstype]}")
+    if fstype == 'btrfs':
+        comp = next((o for o in super_options if o.startswith(('compress=', 'compress-force='))), None)
+        opts.append(comp or 'compress=no')
+        opts.append('flushoncommit' if 'flushoncommit' in super_options else 'noflushoncommit')
+    return opts
+
+
+def enable(root: str = '/mnt', log: Callable[[str], None] = print):
+    for m in mounts_under(root):
+        fast = FAST_OPTS.get(m.fstype)
+        if not fast or m.target in _saved_mounts:
+            continue
+        durable = _durable_opts(m.fstype, m.options, m.super_options)
+        r = _remount(m.target, fast)
+        if r.returncode != 0:
+            log(f"⚠️  remount {m.target} ({','.join(fast)}): {r.stderr.strip()}")
+            continue
+        _saved_mounts[m.target] = durable
+        log(f"Tryb wolnego nośnika: {m.target} → {','.join(fast)}")
+    for key, val in FAST_SYSCTL.items():
+        path = os.path.join('/proc/sys', key)
+        try:
+            with open(path) as f:
+                old = f.read().strip()
+            with open(path, 'w') as f:
+                f.write(val)
+            _saved_sysctl.setdefault(key, old)
+        except OSError as e:
+            log(f"⚠️  sysctl {key}: {e}")
+
+
+def restore(log: Callable[[str], None] = print):
+    """syncfs na każdym przyspieszonym systemie plików i powrót do trwałych opcji."""
+    if not _saved_mounts and not _saved_sysctl:
+        return
+    current = {m.target for m in read_mounts()}
+    for target in sorted(_saved_mounts, key=len, reverse=True):
+        opts = _saved_mounts.pop(target)
+        if target not in current:
+            continue
+        t0 = time.time()
+        try:
+            syncfs(target)
+        except OSError as e:
+            log(f"⚠️  syncfs {target}: {e}")
+        r = _remount(target, opts)
+        if r.returncode != 0:
+            log(f"⚠️  remount {target} ({','.join(opts)}): {r.stderr.strip()}")
+        else:
+            log(f"syncfs {target}: {time.time() - t0:0.1f} s, przywrócono {','.join(opts)}")
+    for key in list(_saved_sysctl):
+        try:
+            with open(os.path.join('/proc/sys', key), 'w') as f:
+                f.write(_saved_sysctl.pop(key))
+        except OSError as e:
+            log(f"⚠️  sysctl {key}: {e}")
+
+
+# ---- benchmark ----
+
+def _bench(size: str, files: int):
+    from aghos_installer.extract import extract, _make_rootfs
+
+    with tempfile.TemporaryDirectory(prefix='aghos-bench-') as tmp:
+        src = os.path.join(tmp, 'src')
+        archive = os.path.join(tmp, 'rootfs.tar.zst')
+        _make_rootfs(src, files)
+        subprocess.run(['bsdtar', '--zstd', '-cf', archive, '-C', src, '.'], check=True)
+        shutil.rmtree(src)
+        img = os.path.join(tmp, 'disk.img')
+        mnt = os.path.join(tmp, 'mnt')
+        os.makedirs(mnt)
+        subprocess.run(['truncate', '-s', size, img], check=True)
+        loop = subprocess.run(['losetup', '-f', '--show', img], capture_output=True,
+                              text=True, check=True).stdout.strip()
+        try:
+            for fast in (False, True):
+                subprocess.run(['mkfs.ext4', '-q', '-F', loop], check=True)
+                subprocess.run(['mount', loop, mnt], check=True)
+                try:
+                    t0 = time.time()
+                    if fast:
+                        enable(mnt, log=lambda _m: None)
+                    extract(archive, mnt)
+                    if fast:
+                        restore(log=lambda _m: None)
+                    else:
+                        syncfs(mnt)
+                    print(f"{'wolny nośnik' if fast else 'domyślnie':>13}: {time.time() - t0:6.2f} s")
+                finally:
+                    subprocess.run(['umount', mnt])
+        finally:
+            subprocess.run(['losetup', '-d', loop])
+
+
+if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        size = sys.argv[sys.argv.index('--size') + 1] if '--size' in sys.argv else '2G'
+        n = int(sys.argv[sys.argv.index('--files') + 1]) if '--files' in sys.argv else 20000
+        _bench(size, n)
+    else:
+        print(__doc__)
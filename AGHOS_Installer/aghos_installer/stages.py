@@ -0,0 +1,265 @@
+"""
+Orkiestrator etapów GUI: jedna pętla zdarzeń, zadeklarowana lista etapów
+i przygotowanie kolejnego etapu w tle, gdy bieżący jest aktywny.
+
+Etap to plik scripts/<nazwa>.py z funkcjami:
+
+- `preload()` (opcjonalnie) – dane etapu (lsblk, indeks serwera, …);
+  działa w wątku roboczym, więc nie tworzy widżetów,
+- `build(lang, console, data)` – ukryte okno etapu (wątek GUI).
+
+Okno może mieć `on_enter()` – efekty uboczne w chwili pokazania (np. otwarcie
+dokumentacji). Etap przechodzi dalej przez `advance()`; okno poprzedniego
+etapu jest zamykane i niszczone, a każdy plik importowany jest tylko raz.
+
+Moduł nie importuje PySide6 na poziomie modułu, więc `--compile` działa też
+na maszynie budującej obraz live:
+
+    python -m aghos_installer.stages --compile   # .pyc (checked-hash) dla squashfs
+    python -m aghos_installer.stages --bench     # jako root, na docelowym live
+"""
+
+import os
+import sys
+import time
+import threading
+import importlib.util
+from typing import Dict, List, Optional
+
+from aghos_installer import trace
+
+INSTALLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(INSTALLER_DIR, 'scripts')
+
+STAGES: List[str] = [
+    '1_connect_network',
+    '2_manage_disks',
+    '3_download_extract',
+    '4_finish',
+]
+
+_modules: Dict[str, object] = {}
+_load_lock = threading.Lock()
+_current: Optional["Orchestrator"] = None
+
+
+def load(name: str):
+    """Moduł etapu (import raz; bezpieczne z wątku roboczego)."""
+    with _load_lock:
+        mod = _modules.get(name)
+        if mod is None:
+            path = os.path.join(SCRIPTS_DIR, f"{name}.py")
+            spec = importlib.util.spec_from_file_location(f"aghos_stage_{name}", path)
+            mod = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(mod)
+            _modules[name] = mod
+        return mod
+
+
+def _prepare_job(job, name: str):
+    """Wątek roboczy: import etapu i jego dane."""
+    mod = load(name)
+    preload = getattr(mod, 'preload', None)
+    return mod, (preload() if preload else None)
+
+
+class Orchestrator:
+    """Prowadzi etapy z `stages` po kolei w jednym oknie naraz."""
+
+    def __init__(self, console, stages: List[str] = STAGES):
+        self.console = console
+        self.stages = stages
+        self.lang: Optional[str] = None
+        self.index = -1
+        self.widget = None
+        self._ready: Dict[int, tuple] = {}      # indeks → (moduł, dane)
+        self._built: Dict[int, object] = {}     # indeks → ukryte okno
+        self._loading = set()
+        self._waiting: Optional[tuple] = None   # (indeks, start) – advance() przed końcem preload
+
+    # ---- sterowanie ----
+    def prepare(self, i: int):
+        """Import i dane etapu `i` w tle; okno powstaje, gdy znany jest język."""
+        if i >= len(self.stages) or i in self._loading or i in self._ready or i in self._built:
+            return
+        from aghos_installer.jobs import submit
+        self._loading.add(i)
+        submit(_prepare_job, self.stages[i],
+               on_done=lambda res, i=i: self._on_prepared(i, res),
+               on_error=lambda e, i=i: self._on_prepare_error(i, e))
+
+    def start(self, lang: str, first: int = 0):
+        global _current
+        _current = self
+        self.lang = lang
+        self._switch(first, trace.now_us())
+
+    def advance(self):
+        if self.index + 1 < len(self.stages):
+            self._switch(self.index + 1, trace.now_us())
+
+    # ---- wewnętrzne ----
+    def _build(self, i: int):
+        mod, data = self._ready.pop(i)
+        self._built[i] = mod.build(self.lang, self.console, data)
+
+    def _on_prepared(self, i: int, res):
+        self._loading.discard(i)
+        self._ready[i] = res
+        if self.lang is not None:
+            try:
+                self._build(i)
+            except Exception as e:
+                self.console.append(f"⚠️ Nie udało się przygotować {self.stages[i]}: {e}")
+        self._resume(i)
+
+    def _on_prepare_error(self, i: int, e: Exception):
+        self._loading.discard(i)
+        self.console.append(f"⚠️ Nie udało się przygotować {self.stages[i]}: {e}")
+        self._resume(i)
+
+    def _resume(self, i: int):
+        if self._waiting and self._waiting[0] == i:
+            _i, start = self._waiting
+            self._waiting = None
+            from PySide6.QtWidgets import QApplication
+            QApplication.restoreOverrideCursor()
+            self._switch(i, start)
+
+    def _switch(self, i: int, start: float):
+        name = self.stages[i]
+        if i in self._loading:
+            # przygotowanie jeszcze trwa – przełączymy po jego końcu
+            from PySide6.QtCore import Qt
+            from PySide6.QtWidgets import QApplication
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            self._waiting = (i, start)
+            return
+
+        preloaded = i in self._built or i in self._ready
+        try:
+            if i in self._ready:
+                self._build(i)
+            widget = self._built.pop(i, None)
+            if widget is None:
+                mod = load(name)
+                preload = getattr(mod, 'preload', None)
+                widget = mod.build(self.lang, self.console, preload() if preload else None)
+        except Exception as e:
+            self.console.append(f"❌ Błąd w {name}:\n{e}\n")
+            return
+
+        trace.enter_stage(name)
+        old, self.widget, self.index = self.widget, widget, i
+        if hasattr(widget, 'on_enter'):
+            widget.on_enter()
+        widget.show()
+        # nowe okno pokazane przed zamknięciem starego – bez „ostatniego okna” po drodze
+        if old is not None:
+            old.close()
+            old.deleteLater()
+        trace.complete('switch', 'ui', start, trace.now_us() - start, stage=name, preloaded=preloaded)
+        self.console.append(f"➡️ [{self.lang}] {name}")
+        self.prepare(i + 1)
+
+
+def start(lang: str, console, first: Optional[str] = None) -> Orchestrator:
+    """Nowy orkiestrator od etapu `first` (samodzielne uruchomienie skryptu)."""
+    orch = Orchestrator(console)
+    orch.start(lang, STAGES.index(first) if first else 0)
+    return orch
+
+
+def advance():
+    """Przycisk „Dalej” etapu: przejście do kolejnego."""
+    if _current is not None:
+        _current.advance()
+
+
+# ---- bytecode i pomiary ----
+
+def precompile(quiet: bool = True) -> bool:
+    """
+    .pyc dla pakietu i etapów. Hash zamiast mtime – squashfs obrazu live
+    zmienia czasy plików, a znacznik czasu unieważniałby bytecode przy każdym starcie.
+    """
+    import compileall
+    import py_compile
+    mode = py_compile.PycInvalidationMode.CHECKED_HASH
+    ok = True
+    for d in (os.path.join(INSTALLER_DIR, 'aghos_installer'), SCRIPTS_DIR):
+        ok &= bool(compileall.compile_dir(d, quiet=quiet, invalidation_mode=mode))
+    return ok
+
+
+def _first_window(runs: int = 3) -> List[float]:
+    """Czas do pierwszego okna (s) z trace.json kolejnych uruchomień głównego okna."""
+    import json
+    import tempfile
+    import subprocess
+    out = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, AGHOS_TRACE_DIR=tmp, AGHOS_BENCH_QUIT='1',
+                       QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+            subprocess.run([sys.executable, os.path.join(INSTALLER_DIR, 'aghos_installer.py')],
+                           env=env, cwd=INSTALLER_DIR, capture_output=True, timeout=120)
+            try:
+                with open(os.path.join(tmp, 'trace.json')) as f:
+                    evs = json.load(f)['traceEvents']
+                out.append(next(e['dur'] for e in evs if e['name'] == 'first_window') / 1e6)
+            except (OSError, ValueError, StopIteration):
+                pass
+    return out
+
+
+def bench():
+    """
+    Przełączenie etapu: dotychczasowy import z pliku + budowa vs. etap przygotowany
+    w tle (bez `on_enter` – pomiar nie otwiera dokumentacji w przeglądarce).
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    class _Console:
+        def append(self, _txt):
+            pass
+
+    fw = _first_window()
+    if fw:
+        print(f"Pierwsze okno: min {min(fw):0.2f} s, max {max(fw):0.2f} s ({len(fw)} uruchomienia)")
+
+    print(f"{'etap':<22} {'import+budowa':>14} {'przygotowany':>13}")
+    console = _Console()
+    for n, name in enumerate(STAGES):
+        path = os.path.join(SCRIPTS_DIR, f"{name}.py")
+        # jak launch_next: świeży import pliku i budowa okna w chwili kliknięcia
+        t0 = time.perf_counter()
+        spec = importlib.util.spec_from_file_location(f"bench_{n}", path)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        preload = getattr(mod, 'preload', None)
+        w = mod.build('pl', console, preload() if preload else None)
+        w.show()
+        app.processEvents()
+        cold = time.perf_counter() - t0
+        w.close()
+
+        # orkiestrator: moduł, dane i okno gotowe – zostaje pokazanie
+        w = mod.build('pl', console, preload() if preload else None)
+        t0 = time.perf_counter()
+        w.show()
+        app.processEvents()
+        warm = time.perf_counter() - t0
+        w.close()
+        print(f"{name:<22} {cold * 1e3:11.0f} ms {warm * 1e3:10.0f} ms")
+
+
+if __name__ == '__main__':
+    if '--compile' in sys.argv:
+        sys.exit(0 if precompile(quiet='-v' not in sys.argv) else 1)
+    elif '--bench' in sys.argv:
+        bench()
+    else:
+        print(__doc__)
@@ -0,0 +1,117 @@
+"""
+Strumieniowe pobieranie i rozpakowywanie RootFS.
+
+Treść odpowiedzi HTTP czytana jest tylko raz: każdy fragment trafia do
+SHA-512 oraz do potoku `zstd | bsdtar` (aghos_installer.extract), który
+rozpakowuje archiwum do katalogu roboczego w /mnt. Dopiero gdy suma zgadza
+się z plikiem .sha512, zawartość katalogu roboczego jest przenoszona
+(rename) na swoje miejsce. Archiwum nie ląduje w /root na RAM-owym
+systemie live, a czas całości to w przybliżeniu max(pobieranie,
+rozpakowanie) zamiast ich sumy.
+
+Zawieszone lustro nie blokuje etapu na zawsze: każdy odczyt ma limit
+`TIMEOUT`, a odpowiedź krótsza niż `Content-Length` jest błędem sieci
+(zerwane połączenie), nie końcem archiwum.
+"""
+
+import os
+import time
+import errno
+import shutil
+import hashlib
+import subprocess
+import urllib.request
+from typing import Callable, Optional
+
+from aghos_installer.extract import Extractor
+
+CHUNK = 1024 * 1024
+TIMEOUT = 30            # s na połączenie i na każdy odczyt (jak download.TIMEOUT)
+STAGING_NAME = ".aghos-staging"
+
+
+class ChecksumMismatch(RuntimeError):
+    pass
+
+
+def _merge_into(src: str, dst: str):
+    """Przenosi zawartość src do dst; istniejące katalogi (np. punkty montowania) scala."""
+    for name in os.listdir(src):
+        s = os.path.join(src, name)
+        d = os.path.join(dst, name)
+        if os.path.isdir(d) and not os.path.islink(d) and os.path.isdir(s) and not os.path.islink(s):
+            _merge_into(s, d)
+            shutil.copystat(s, d)
+            os.chown(d, os.lstat(s).st_uid, os.lstat(s).st_gid)
+            os.rmdir(s)
+            continue
+        try:
+            os.replace(s, d)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # inny system plików (np. osobny /boot) – kopia z zachowaniem właściciela i xattr
+            subprocess.run(['cp', '-a', '--', s, d], check=True)
+            if os.path.isdir(s) and not os.path.islink(s):
+                shutil.rmtree(s)
+            else:
+                os.remove(s)
+
+
+def stream_extract(url: str, expected: Optional[str], target: str = '/mnt',
+                   progress: Optional[Callable[[int, int, float], None]] = None,
+                   log: Callable[[str], None] = print, chunk: int = CHUNK) -> str:
+    """
+    Pobiera `url` i rozpakowuje go w locie do `target`.
+
+    `progress(done, total, bytes_per_s)` wołane jest po każdym fragmencie.
+    Zwraca obliczoną sumę SHA-512. Przy niezgodności z `expected` katalog
+    roboczy jest usuwany, a `target` pozostaje nietknięty.
+    """
+    staging = os.path.join(target, STAGING_NAME)
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    os.makedirs(staging)
+
+    h = hashlib.sha512()
+    done = 0
+    start = time.time()
+    ex = Extractor(staging)
+    try:
+        with urllib.request.urlopen(url, timeout=TIMEOUT) as req:
+            total = int(req.getheader('Content-Length') or 0)
+            while True:
+                buf = req.read(chunk)
+                if not buf:
+                    if total and done < total:
+                        raise ConnectionError(f"Połączenie przerwane na {done}/{total} B")
+                    break
+                h.update(buf)
+                ex.feed(buf)
+                done += len(buf)
+                if progress:
+                    progress(done, total, done / max(time.time() - start, 0.001))
+    except BrokenPipeError:
+        pass
+    except BaseException:
+        ex.kill()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    try:
+        ex.close()
+    except RuntimeError:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    got = h.hexdigest()
+    if expected is None:
+        log("⚠️  Brak sumy .sha512 – przenoszę rozpakowane pliki bez weryfikacji.")
+    elif got != expected:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ChecksumMismatch(f"Checksum mismatch: {got} != {expected}")
+    else:
+        log("Suma kontrolna OK.")
+
+    _merge_into(staging, target)
+    os.rmdir(staging)
+    return got
@@ -0,0 +1,214 @@
+"""
+Graf zadań: kroki deklarują, czego potrzebują (`needs`) i co dostarczają
+(`provides`), a wykonawca uruchamia gotowe kroki równolegle w ograniczonej
+puli wątków i raportuje ścieżkę krytyczną.
+
+Krok to `fn(ctx) -> dict | None`; zwrócony słownik trafia do wspólnego `ctx`
+(np. `{'efi_dir': '/boot'}`), z którego czytają kroki zależne. Nazwa kroku
+jest zawsze jednym z jego wyników, więc można zależeć po prostu od kroku.
+Błąd kroku pomija kroki od niego zależne; pozostałe dokończą pracę, a na
+końcu `run()` rzuca pierwszy błąd.
+
+`Task` jest tylko deklaracją (listy kroków są stałymi modułów i służą wielu
+uruchomieniom, np. ponowieniu konfiguracji po błędzie); czasy i błędy
+jednego uruchomienia trzyma `Outcome` w `Report`.
+
+`python -m aghos_installer.taskgraph --selftest` – sprawdzenie wykonawcy.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from aghos_installer import trace
+
+
+class GraphError(ValueError):
+    pass
+
+
+class Task:
+    __slots__ = ('name', 'fn', 'needs', 'provides')
+
+    def __init__(self, name: str, fn: Callable[[dict], Optional[dict]],
+                 needs: Sequence[str] = (), provides: Sequence[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.needs = tuple(needs)
+        self.provides = (name,) + tuple(p for p in provides if p != name)
+
+    def __repr__(self):
+        return f"Task({self.name!r}, needs={self.needs})"
+
+
+class Outcome:
+    """Wynik kroku w jednym uruchomieniu grafu."""
+    __slots__ = ('start', 'end', 'error', 'skipped')
+
+    def __init__(self):
+        self.start = self.end = 0.0
+        self.error: Optional[BaseException] = None
+        self.skipped = False
+
+    @property
+    def seconds(self) -> float:
+        return max(self.end - self.start, 0.0)
+
+
+def _deps(tasks: Sequence[Task]) -> Dict[str, Set[str]]:
+    producers: Dict[str, Task] = {}
+    for t in tasks:
+        for p in t.provides:
+            if p in producers:
+                raise GraphError(f"{p!r} dostarczają {producers[p].name} i {t.name}")
+            producers[p] = t
+    deps = {}
+    for t in tasks:
+        missing = [n for n in t.needs if n not in producers]
+        if missing:
+            raise GraphError(f"{t.name}: nikt nie dostarcza {', '.join(missing)}")
+        deps[t.name] = {producers[n].name for n in t.needs}
+    return deps
+
+
+def _call(t: Task, res: Outcome, ctx: dict):
+    res.start = time.perf_counter()
+    try:
+        with trace.span(t.name, 'task'):
+            out = t.fn(ctx)
+        if out:
+            ctx.update(out)
+    except Exception as e:
+        res.error = e
+    finally:
+        res.end = time.perf_counter()
+
+
+class Report:
+    def __init__(self, results: Dict[str, Outcome], deps: Dict[str, Set[str]], wall: float):
+        self.results = results
+        self.deps = deps
+        self.wall = wall
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """Najdłuższy łańcuch zależności wg zmierzonych czasów kroków."""
+        memo: Dict[str, Tuple[float, List[str]]] = {}
+
+        def longest(name: str) -> Tuple[float, List[str]]:
+            if name not in memo:
+                best = max((longest(d) for d in self.deps[name]), default=(0.0, []))
+                memo[name] = (best[0] + self.results[name].seconds, best[1] + [name])
+            return memo[name]
+
+        secs, chain = max((longest(n) for n in self.results), default=(0.0, []))
+        return chain, secs
+
+    def summary(self) -> str:
+        busy = sum(r.seconds for r in self.results.values())
+        chain, secs = self.critical_path()
+        lines = [f"⏱ {len(self.results)} kroków: {self.wall:0.1f} s (suma kroków {busy:0.1f} s)",
+                 f"  ścieżka krytyczna ({secs:0.1f} s): {' → '.join(chain)}"]
+        for name, r in sorted(self.results.items(), key=lambda kv: -kv[1].seconds)[:5]:
+            state = " (pominięty)" if r.skipped else " (błąd)" if r.error else ""
+            lines.append(f"  {name:<16} {r.seconds:6.1f} s{state}")
+        return "\n".join(lines)
+
+
+def run(tasks: Sequence[Task], ctx: Optional[dict] = None, workers: Optional[int] = None,
+        log: Callable[[str], None] = print) -> Report:
+    """Wykonuje graf; `workers` domyślnie min(4, liczba rdzeni)."""
+    deps = _deps(tasks)
+    ctx = {} if ctx is None else ctx
+    workers = workers or min(4, os.cpu_count() or 1)
+    pending = {t.name: t for t in tasks}
+    results = {t.name: Outcome() for t in tasks}
+    done: Set[str] = set()
+    failed: Set[str] = set()
+    running = {}
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='task') as ex:
+        while pending or running:
+            for t in [t for t in pending.values() if deps[t.name] & failed]:
+                results[t.name].skipped = True
+                failed.add(t.name)
+                del pending[t.name]
+                log(f"⚠️  Pomijam {t.name}: nie powiodło się {', '.join(sorted(deps[t.name] & failed))}")
+            for t in [t for t in pending.values() if deps[t.name] <= done]:
+                del pending[t.name]
+                running[ex.submit(_call, t, results[t.name], ctx)] = t
+            if not running:
+                if pending:
+                    raise GraphError(f"cykl zależności: {', '.join(sorted(pending))}")
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for f in finished:
+                t = running.pop(f)
+                err = results[t.name].error
+                if err:
+                    failed.add(t.name)
+                    log(f"❌ {t.name}: {err}")
+                else:
+                    done.add(t.name)
+
+    report = Report(results, deps, time.perf_counter() - t0)
+    errors = [results[t.name].error for t in tasks if results[t.name].error]
+    if errors:
+        raise errors[0]
+    return report
+
+
+def _selftest() -> int:
+    failed = []
+
+    def check(name: str, ok: bool, detail: str = ''):
+        print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+        if not ok:
+            failed.append(name)
+
+    broken = {'esp': True}
+
+    def esp(ctx):
+        time.sleep(0.05)
+        if broken['esp']:
+            raise RuntimeError("boom")
+        return {'efi_dir': '/boot'}
+
+    def grub(ctx):
+        return {'grub': ctx['efi_dir']}
+
+    # te same obiekty Task w obu uruchomieniach – jak CONFIG_STEPS
+    steps = [Task('locale', lambda ctx: time.sleep(0.05)),
+             Task('esp', esp, provides=['efi_dir']),
+             Task('grub', grub, needs=['efi_dir'])]
+    quiet = lambda _m: None
+
+    try:
+        run(steps, {}, log=quiet)
+        check("błąd kroku przerywa graf", False, "brak wyjątku")
+    except RuntimeError as e:
+        check("błąd kroku przerywa graf", str(e) == "boom", str(e))
+
+    broken['esp'] = False
+    ctx = {}
+    try:
+        report = run(steps, ctx, log=quiet)
+        check("ponowienie po błędzie", ctx.get('grub') == '/boot', report.summary().splitlines()[1])
+        check("brak starego stanu w raporcie",
+              not any(r.error or r.skipped for r in report.results.values()))
+    except Exception as e:
+        check("ponowienie po błędzie", False, f"{type(e).__name__}: {e}")
+
+    try:
+        run([Task('a', quiet, needs=['b']), Task('b', quiet, needs=['a'])], log=quiet)
+        check("wykrycie cyklu", False)
+    except GraphError as e:
+        check("wykrycie cyklu", True, str(e))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    if '--selftest' in sys.argv:
+        sys.exit(_selftest())
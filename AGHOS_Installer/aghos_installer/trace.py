@@ -0,0 +1,382 @@
+"""
+Śledzenie czasu instalacji: spany etapów, zadań w tle i każdego procesu
+potomnego, liczniki przepustowości oraz przestoje wątku GUI.
+
+Zdarzenia zapisywane są w formacie Chrome trace-event (chrome://tracing,
+https://ui.perfetto.dev) w `trace_dir()/trace.json`, a `finish()` dopisuje
+tabelę podsumowania (summary.txt + log). Procesy potomne śledzone są przez
+podmianę `subprocess.Popen` (`install()`): argv, kod wyjścia, czas ścienny
+i CPU (z /proc zakończonego, jeszcze nie zebranego dziecka); wartości haseł w argv (`nmcli … password <PSK>`)
+są zamazywane (`redact`), a katalog wyników ma prawa 0700.
+
+`AGHOS_PROFILE=1` – każdy etap (i każde zadanie w tle) działa pod cProfile,
+a wyniki trafiają jako `<etap>.pstats` obok trace.json.
+`AGHOS_TRACE_DIR` – katalog wyników (domyślnie /tmp/aghos-trace/<czas>).
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import cProfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+PROFILE = os.environ.get('AGHOS_PROFILE') == '1'
+STALL_THRESHOLD = 0.1
+COUNTER_INTERVAL = 0.5
+# argumenty, po których w argv stoi sekret (nmcli: `password X`, `wifi-sec.psk X`)
+SECRET_KEYS = re.compile(r'^(--?)?(password|passwd|psk|secret|[\w-]+\.(psk|password|secret)[\w-]*)$',
+                         re.IGNORECASE)
+REDACTED = '***'
+
+_lock = threading.Lock()
+_events: List[dict] = []
+_pid = os.getpid()
+_t0 = time.perf_counter()
+_dir: Optional[str] = None
+_stage: Optional[dict] = None       # bieżący etap GUI (enter_stage)
+_finished = False
+
+
+def now_us() -> float:
+    return (time.perf_counter() - _t0) * 1e6
+
+
+def _emit(ev: dict):
+    ev.setdefault('pid', _pid)
+    ev.setdefault('tid', threading.get_ident())
+    with _lock:
+        _events.append(ev)
+
+
+def trace_dir() -> str:
+    global _dir
+    if _dir is None:
+        _dir = os.environ.get('AGHOS_TRACE_DIR') or \
+            os.path.join('/tmp/aghos-trace', time.strftime('%Y%m%d-%H%M%S'))
+        # trace.json zawiera argv procesów potomnych – tylko dla roota
+        os.makedirs(_dir, mode=0o700, exist_ok=True)
+        os.chmod(_dir, 0o700)
+    return _dir
+
+
+def redact(argv: List[str]) -> List[str]:
+    """argv z zamazanymi wartościami haseł: `password X`, `--password=X`, `wifi-sec.psk X`."""
+    out, hide = [], False
+    for a in argv:
+        key, eq, _val = a.partition('=')
+        if hide:
+            out.append(REDACTED)
+            hide = False
+        elif eq and SECRET_KEYS.match(key):
+            out.append(f"{key}={REDACTED}")
+        else:
+            out.append(a)
+            hide = bool(SECRET_KEYS.match(a))
+    return out
+
+
+# ---- spany ----
+
+def complete(name: str, cat: str, start_us: float, dur_us: float, **args):
+    _emit({'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': dur_us, 'args': args})
+
+
+def since_start(name: str, cat: str = 'ui', **args):
+    """Span od startu procesu (importu tego modułu) do teraz, np. 'first_window'."""
+    complete(name, cat, 0.0, now_us(), **args)
+
+
+@contextmanager
+def span(name: str, cat: str = 'app', **args):
+    start = now_us()
+    try:
+        yield args
+    finally:
+        complete(name, cat, start, now_us() - start, **args)
+
+
+@contextmanager
+def _profiled(name: str):
+    if not PROFILE:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(os.path.join(trace_dir(), f"{name}.pstats"))
+
+
+@contextmanager
+def stage(name: str):
+    """Span etapu (silnik bez GUI); z AGHOS_PROFILE=1 także cProfile."""
+    with span(name, 'stage'), _profiled(name):
+        yield
+
+
+def enter_stage(name: str):
+    """GUI: zamyka poprzedni etap i otwiera kolejny (etapy są sterowane zdarzeniami)."""
+    global _stage
+    leave_stage()
+    prof = None
+    if PROFILE:
+        prof = cProfile.Profile()
+        prof.enable()
+    _stage = {'name': name, 'start': now_us(), 'prof': prof}
+
+
+def leave_stage():
+    global _stage
+    st, _stage = _stage, None
+    if not st:
+        return
+    complete(st['name'], 'stage', st['start'], now_us() - st['start'])
+    if st['prof']:
+        st['prof'].disable()
+        st['prof'].dump_stats(os.path.join(trace_dir(), f"{st['name']}.pstats"))
+
+
+_job_seq = 0
+
+
+@contextmanager
+def job(name: str):
+    """Zadanie w tle (jobs.submit) – span w wątku roboczym, z AGHOS_PROFILE=1 osobny .pstats."""
+    global _job_seq
+    with _lock:
+        _job_seq += 1
+        seq = _job_seq
+    stage_name = _stage['name'] if _stage else 'job'
+    with span(name, 'job'), _profiled(f"{stage_name}-{name}-{seq}"):
+        yield
+
+
+# ---- przepustowość ----
+
+class Throughput:
+    """Opakowanie callbacku progress(done, total, rate) – licznik MB/s co 0,5 s i span całości."""
+
+    def __init__(self, name: str, progress: Optional[Callable] = None):
+        self.name = name
+        self.progress = progress
+        self.start = now_us()
+        self.done = 0
+        self._last = 0.0
+
+    def __call__(self, done, total, rate=0.0, *extra):
+        self.done = done
+        now = time.monotonic()
+        if now - self._last >= COUNTER_INTERVAL:
+            self._last = now
+            _emit({'name': self.name, 'ph': 'C', 'ts': now_us(),
+                   'args': {'MB/s': round(rate / 1024**2, 2)}})
+        if self.progress:
+            self.progress(done, total, rate, *extra)
+
+    def close(self):
+        dur = now_us() - self.start
+        mbps = self.done / 1024**2 / max(dur / 1e6, 1e-6)
+        complete(self.name, 'io', self.start, dur, bytes=self.done, mb_per_s=round(mbps, 2))
+
+
+# ---- procesy potomne ----
+
+_RealPopen = subprocess.Popen
+
+
+def _proc_cpu(pid: int) -> Optional[float]:
+    """utime+stime (z zebranymi wnukami) procesu – także zombie – w sekundach."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rpartition(')')[2].split()
+        return sum(int(fields[i]) for i in (11, 12, 13, 14)) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class TracedPopen(_RealPopen):
+    """
+    Popen zapisujący span: argv, kod wyjścia, czas ścienny i CPU. Tylko
+    publiczne API: koniec odnotowują `wait()`/`poll()` (przez nie idą też
+    `communicate()`, `run()` i `__exit__`); CPU czytane jest z /proc po
+    `waitid(WNOWAIT)` – dziecko już się zakończyło, ale nie zostało zebrane.
+    """
+
+    def __init__(self, args, *a, **kw):
+        self._trace_start = now_us()
+        self._trace_tid = threading.get_ident()
+        self._trace_args = args
+        self._trace_cpu: Optional[float] = None
+        self._traced = False
+        super().__init__(args, *a, **kw)
+
+    def _peek(self, block: bool) -> bool:
+        """True, gdy dziecko się zakończyło (zapamiętuje jego CPU, nie zbiera go)."""
+        if not hasattr(os, 'waitid'):
+            return True
+        flags = os.WEXITED | os.WNOWAIT | (0 if block else os.WNOHANG)
+        try:
+            if os.waitid(os.P_PID, self.pid, flags) is None:
+                return False
+        except ChildProcessError:
+            return True         # już zebrane – kod wyjścia zna Popen
+        if self._trace_cpu is None:
+            self._trace_cpu = _proc_cpu(self.pid)
+        return True
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            if timeout is None:
+                self._peek(block=True)
+            else:
+                deadline = time.monotonic() + timeout
+                delay = 0.0005
+                while not self._peek(block=False):
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        raise subprocess.TimeoutExpired(self.args, timeout)
+                    time.sleep(min(delay, left))
+                    delay = min(delay * 2, 0.05)
+        rc = super().wait(timeout)
+        self._record()
+        return rc
+
+    def poll(self):
+        if self.returncode is None:
+            self._peek(block=False)
+        rc = super().poll()
+        if rc is not None:
+            self._record()
+        return rc
+
+    def _record(self):
+        if self._traced or self.returncode is None:
+            return
+        self._traced = True
+        argv = self._trace_args
+        if isinstance(argv, (list, tuple)):
+            argv = redact([str(x) for x in argv])
+        else:
+            # polecenie powłoki w jednym napisie (shell=True)
+            argv = [' '.join(redact(str(argv).split(' ')))]
+        _emit({'name': os.path.basename(argv[0].split()[0]) if argv and argv[0] else '?',
+               'cat': 'subprocess', 'ph': 'X',
+               'ts': self._trace_start, 'dur': now_us() - self._trace_start,
+               'tid': self._trace_tid,
+               'args': {'argv': argv, 'exit': self.returncode,
+                        'cpu_s': round(self._trace_cpu or 0.0, 3)}})
+
+
+def install():
+    """Włącza śledzenie procesów potomnych (subprocess.run/Popen/getoutput)."""
+    subprocess.Popen = TracedPopen
+    atexit.register(finish)
+
+
+# ---- przestoje wątku GUI ----
+
+def watch_ui_stalls(threshold: float = STALL_THRESHOLD, interval_ms: int = 50):
+    """Timer Qt w wątku GUI; opóźnienie ponad `threshold` zapisywane jest jako span 'stall'."""
+    from PySide6.QtCore import QTimer
+
+    timer = QTimer()
+    timer.setInterval(interval_ms)
+    last = [time.perf_counter()]
+
+    def tick():
+        now = time.perf_counter()
+        late = now - last[0] - interval_ms / 1000
+        if late > threshold:
+            complete('stall', 'ui', (last[0] + interval_ms / 1000 - _t0) * 1e6, late * 1e6,
+                     stage=_stage['name'] if _stage else None)
+        last[0] = now
+
+    timer.timeout.connect(tick)
+    timer.start()
+    return timer
+
+
+# ---- zapis i podsumowanie ----
+
+def summary() -> str:
+    with _lock:
+        evs = list(_events)
+    lines = ["Etapy:"]
+    for e in (e for e in evs if e.get('cat') == 'stage'):
+        lines.append(f"  {e['name']:<24} {e['dur'] / 1e6:8.1f} s")
+
+    procs: Dict[str, List[float]] = {}
+    # polecenia sesji chroot (chroot.py) liczone jak procesy, bez własnego CPU
+    for e in (e for e in evs if e.get('cat') in ('subprocess', 'chroot')):
+        p = procs.setdefault(e['name'], [0, 0.0, 0.0, 0])
+        p[0] += 1
+        p[1] += e['dur'] / 1e6
+        p[2] += e['args'].get('cpu_s', 0.0)
+        p[3] += e['args']['exit'] != 0
+    if procs:
+        lines.append("Procesy (najdłuższe):")
+        lines.append(f"  {'polecenie':<16} {'ile':>4} {'ściennie':>9} {'CPU':>8} {'błędy':>6}")
+        for name, (n, wall, cpu, bad) in sorted(procs.items(), key=lambda kv: -kv[1][1])[:15]:
+            lines.append(f"  {name:<16} {n:>4} {wall:8.1f}s {cpu:7.1f}s {bad:>6}")
+
+    io = [e for e in evs if e.get('cat') == 'io']
+    if io:
+        lines.append("Przepustowość:")
+        for e in io:
+            lines.append(f"  {e['name']:<16} {e['args']['bytes'] / 1024**2:9.0f} MiB "
+                         f"{e['args']['mb_per_s']:7.1f} MB/s")
+
+    first = next((e for e in evs if e['name'] == 'first_window'), None)
+    if first:
+        lines.append(f"Pierwsze okno: {first['dur'] / 1e6:0.2f} s")
+    switches = [e for e in evs if e['name'] == 'switch' and e.get('cat') == 'ui']
+    if switches:
+        lines.append("Przełączenia etapów:")
+        for e in switches:
+            how = "przygotowany" if e['args'].get('preloaded') else "na zimno"
+            lines.append(f"  → {e['args'].get('stage', '?'):<22} {e['dur'] / 1e3:7.0f} ms  ({how})")
+
+    stalls = [e['dur'] / 1e3 for e in evs if e['name'] == 'stall']
+    if stalls:
+        lines.append(f"Przestoje GUI: {len(stalls)} (najdłuższy {max(stalls):0.0f} ms, "
+                     f"razem {sum(stalls) / 1e3:0.1f} s)")
+    return "\n".join(lines)
+
+
+def save() -> str:
+    path = os.path.join(trace_dir(), 'trace.json')
+    with _lock:
+        evs = list(_events)
+    meta = [{'name': 'process_name', 'ph': 'M', 'pid': _pid, 'tid': 0, 'args': {'name': 'aghos-installer'}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': _pid, 'tid': threading.main_thread().ident,
+             'args': {'name': 'main'}}]
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'traceEvents': meta + evs, 'displayTimeUnit': 'ms'}, f)
+    os.replace(tmp, path)
+    return path
+
+
+def finish(log: Callable[[str], None] = print):
+    """Zamyka bieżący etap, zapisuje trace.json i summary.txt, loguje tabelę (raz)."""
+    global _finished
+    if _finished:
+        return
+    _finished = True
+    leave_stage()
+    try:
+        path = save()
+        text = summary()
+        with open(os.path.join(trace_dir(), 'summary.txt'), 'w') as f:
+            f.write(text + "\n")
+        log(text)
+        log(f"Ślad: {path}")
+    except Exception as e:
+        log(f"⚠️ trace: {e}")
@@ -0,0 +1,212 @@
+"""
+Indeks stref czasowych i locale dla kreatora (bez Qt).
+
+Strefy pochodzą z `tzdata.zi` (strefy „Z” i aliasy „L”) oraz `zone1970.tab`
+(kraje → strefy), locale z `/usr/share/i18n/SUPPORTED` – zamiast chodzenia
+`os.walk` po setkach plików w /usr/share/zoneinfo. Wyniki są cache'owane
+na dysku (`cache_dir()`) i unieważniane zmianą mtime/rozmiaru źródeł.
+
+Wstępny wybór strefy bez GeoIP: dowiązanie /etc/localtime systemu live,
+a gdy to UTC – przesunięcie zegara RTC (Windows trzyma w nim czas lokalny)
+zestawione ze strefami kraju z języka instalatora.
+"""
+
+import os
+import json
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+ZONEINFO = '/usr/share/zoneinfo'
+SUPPORTED = 'usr/share/i18n/SUPPORTED'
+FALLBACK_LOCALES = [('en_US.UTF-8', 'UTF-8'), ('pl_PL.UTF-8', 'UTF-8'), ('fr_FR.UTF-8', 'UTF-8'),
+                    ('de_DE.UTF-8', 'UTF-8'), ('es_ES.UTF-8', 'UTF-8')]
+# katalogi zoneinfo, które nie są strefami do wyboru
+_SKIP = ('posix/', 'right/', 'Etc/', 'SystemV/')
+
+
+def cache_dir() -> str:
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'aghos-installer')
+
+
+def _cached(name: str, sources: Sequence[str], build: Callable[[], object]):
+    """Wynik `build()` z pliku cache, dopóki źródła mają te same mtime i rozmiar."""
+    key = []
+    for p in sources:
+        try:
+            st = os.stat(p)
+            key.append([p, st.st_mtime_ns, st.st_size])
+        except OSError:
+            key.append([p, None, None])
+    path = os.path.join(cache_dir(), name)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('key') == key:
+            return data['value']
+    except (OSError, ValueError):
+        pass
+    value = build()
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'key': key, 'value': value}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return value
+
+
+# ---- strefy ----
+
+def _build_zones(zoneinfo: str) -> dict:
+    names = set()
+    try:
+        with open(os.path.join(zoneinfo, 'tzdata.zi')) as f:
+            for line in f:
+                if line.startswith('Z '):
+                    names.add(line.split()[1])
+                elif line.startswith('L '):
+                    names.add(line.split()[2])
+    except OSError:
+        # starsze tzdata bez tzdata.zi – ostatecznie przegląd katalogu
+        for r, _d, files in os.walk(zoneinfo):
+            for fn in files:
+                if fn[0].isupper():
+                    names.add(os.path.relpath(os.path.join(r, fn), zoneinfo))
+
+    countries: Dict[str, List[str]] = {}
+    try:
+        with open(os.path.join(zoneinfo, 'zone1970.tab')) as f:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                cols = line.rstrip('\n').split('\t')
+                for cc in cols[0].split(','):
+                    countries.setdefault(cc, []).append(cols[2])
+                names.add(cols[2])
+    except OSError:
+        pass
+
+    zones = sorted(n for n in names if '/' in n and not n.startswith(_SKIP))
+    return {'zones': ['UTC'] + zones, 'countries': countries}
+
+
+def _zone_index(zoneinfo: str = ZONEINFO) -> dict:
+    return _cached('timezones.json',
+                   [os.path.join(zoneinfo, 'tzdata.zi'), os.path.join(zoneinfo, 'zone1970.tab')],
+                   lambda: _build_zones(zoneinfo))
+
+
+def timezones(zoneinfo: str = ZONEINFO) -> List[str]:
+    """Posortowane nazwy stref (UTC na początku)."""
+    return _zone_index(zoneinfo)['zones']
+
+
+def country_zones(cc: str, zoneinfo: str = ZONEINFO) -> List[str]:
+    """Strefy kraju (ISO 3166, np. 'PL') w kolejności zone1970.tab – główna pierwsza."""
+    return _zone_index(zoneinfo)['countries'].get(cc.upper(), [])
+
+
+def _live_zone(zoneinfo: str) -> Optional[str]:
+    try:
+        target = os.path.realpath('/etc/localtime')
+    except OSError:
+        return None
+    rel = os.path.relpath(target, os.path.realpath(zoneinfo))
+    if rel.startswith('..') or rel.startswith(_SKIP) or rel in ('UTC', 'Etc/UTC', 'UCT', 'Zulu'):
+        return None
+    return rel
+
+
+def rtc_offset(rtc: str = '/sys/class/rtc/rtc0/since_epoch') -> Optional[int]:
+    """
+    Przesunięcie RTC względem UTC w minutach (wielokrotność 15), gdy zegar
+    sprzętowy trzyma czas lokalny; None, gdy RTC jest w UTC albo brak RTC.
+    """
+    try:
+        with open(rtc) as f:
+            diff = int(f.read()) - time.time()
+    except (OSError, ValueError):
+        return None
+    minutes = int(round(diff / 900.0)) * 15
+    if minutes == 0 or abs(minutes) > 14 * 60 or abs(diff - minutes * 60) > 120:
+        return None
+    return minutes
+
+
+def _offset(zone: str) -> Optional[int]:
+    try:
+        from zoneinfo import ZoneInfo
+        off = datetime.now(timezone.utc).astimezone(ZoneInfo(zone)).utcoffset()
+        return int(off.total_seconds() // 60)
+    except Exception:
+        return None
+
+
+def guess_timezone(country: Optional[str] = None, zoneinfo: str = ZONEINFO,
+                   offset: Optional[int] = None) -> Optional[str]:
+    """Strefa systemu live albo strefa kraju `country` zgodna z przesunięciem RTC; None gdy brak tropu."""
+    live = _live_zone(zoneinfo)
+    if live:
+        return live
+    if offset is None:
+        offset = rtc_offset()
+    cands = country_zones(country, zoneinfo) if country else []
+    if offset is None:
+        return cands[0] if cands else None
+    for z in cands:
+        if _offset(z) == offset:
+            return z
+    # kraj nie pasuje – pierwsza strefa (z kraju z zone1970.tab) o tym przesunięciu
+    for zones in _zone_index(zoneinfo)['countries'].values():
+        if _offset(zones[0]) == offset:
+            return zones[0]
+    return None
+
+
+# ---- locale ----
+
+def _build_locales(path: str) -> List[Tuple[str, str]]:
+    out = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2 and not line.startswith('#'):
+                out.append((parts[0], parts[1]))
+    # UTF-8 najpierw – to je wybiera prawie każdy
+    out.sort(key=lambda lc: (not lc[0].endswith('.UTF-8'), lc[0]))
+    return out
+
+
+def locales(root: str = '/') -> List[Tuple[str, str]]:
+    """[(locale, kodowanie)] z SUPPORTED; awaryjnie pięć locale języków instalatora."""
+    path = os.path.join(root, SUPPORTED)
+    if not os.path.exists(path):
+        return list(FALLBACK_LOCALES)
+    name = 'locales.json' if root == '/' else f"locales-{root.strip('/').replace('/', '_')}.json"
+    return [tuple(lc) for lc in _cached(name, [path], lambda: _build_locales(path))]
+
+
+def locale_gen_lines(selected: Sequence[str], root: str = '/') -> List[str]:
+    """Wiersze locale.gen tylko dla wybranych locale (kodowanie z SUPPORTED systemu `root`)."""
+    charset = dict(locales(root))
+    lines = []
+    for name in dict.fromkeys(selected):
+        cs = charset.get(name) or ('UTF-8' if name.endswith(('.UTF-8', '.utf8')) else None)
+        if cs:
+            lines.append(f"{name} {cs}")
+    return lines
+
+
+if __name__ == '__main__':
+    t0 = time.perf_counter()
+    z = timezones()
+    t1 = time.perf_counter()
+    loc = locales()
+    t2 = time.perf_counter()
+    print(f"{len(z)} stref w {(t1 - t0) * 1e3:0.1f} ms, {len(loc)} locale w {(t2 - t1) * 1e3:0.1f} ms")
+    print(f"cache: {cache_dir()}")
+    print(f"zgadnięta strefa (PL): {guess_timezone('PL')}")
@@ -0,0 +1,216 @@
+"""
+Wybór łącza: fizyczne interfejsy z /sys/class/net, od najlepszego.
+
+Interfejsy bez dowiązania `device` (lo, docker0, mostki, veth, tun) są
+wirtualne i pomijane, podobnie jak typy inne niż Ethernet (ARPHRD_ETHER).
+Kolejność (`rank`):
+  1. kabel z nośną (`carrier`), od najwyższego `speed`, pełny dupleks
+     przed półdupleksem; przy kilku takich łączach opcjonalnie wg krótkiej
+     próby przepustowości do serwera pobierania (`probe`),
+  2. Wi-Fi (nośną ma dopiero po połączeniu, więc nie jest filtrowane),
+  3. kabel bez nośnej – na końcu, ale do wyboru (kabel można podłączyć).
+
+Ścieżka `sysfs` jest parametrem, więc całość da się sprawdzić na
+sztucznym drzewie (`python -m aghos_installer.uplink --selftest`).
+"""
+
+import os
+import sys
+import time
+import socket
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+ARPHRD_ETHER = 1
+PROBE_SAMPLE = 256 * 1024
+PROBE_TIMEOUT = 3.0
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ''       # np. EINVAL przy `speed`/`carrier` wyłączonego interfejsu
+
+
+def _int(text: str) -> int:
+    try:
+        return int(text)
+    except ValueError:
+        return 0
+
+
+class Link:
+    __slots__ = ('name', 'wireless', 'carrier', 'speed', 'duplex', 'rate', 'error')
+
+    def __init__(self, name: str, wireless: bool, carrier: bool, speed: int, duplex: str):
+        self.name = name
+        self.wireless = wireless
+        self.carrier = carrier
+        self.speed = speed          # Mb/s; 0 – nieznana (sterownik zwraca -1)
+        self.duplex = duplex
+        self.rate = 0.0             # B/s z `probe`, 0 – nie mierzono
+        self.error = None
+
+    @property
+    def tier(self) -> int:
+        if self.wireless:
+            return 1
+        return 0 if self.carrier else 2
+
+    def describe(self) -> str:
+        if self.wireless:
+            return f"{self.name} (Wi-Fi)"
+        if not self.carrier:
+            return f"{self.name} (kabel niepodłączony)"
+        speed = f"{self.speed} Mb/s" if self.speed else "? Mb/s"
+        rate = f", {self.rate / 1e6:0.1f} MB/s" if self.rate else ""
+        return f"{self.name} ({speed} {self.duplex or '?'}{rate})"
+
+    def __repr__(self):
+        return f"Link({self.describe()})"
+
+
+def read_link(name: str, sysfs: str = '/sys') -> Optional[Link]:
+    """Fizyczny interfejs Ethernet/Wi-Fi albo None (wirtualny lub inny typ)."""
+    d = os.path.join(sysfs, 'class', 'net', name)
+    if not os.path.exists(os.path.join(d, 'device')):
+        return None
+    if _int(_read(os.path.join(d, 'type'))) != ARPHRD_ETHER:
+        return None
+    wireless = os.path.isdir(os.path.join(d, 'wireless')) or \
+        os.path.exists(os.path.join(d, 'phy80211'))
+    return Link(name, wireless,
+                carrier=_read(os.path.join(d, 'carrier')) == '1',
+                speed=max(_int(_read(os.path.join(d, 'speed'))), 0),
+                duplex=_read(os.path.join(d, 'duplex')))
+
+
+def links(sysfs: str = '/sys') -> List[Link]:
+    try:
+        names = sorted(os.listdir(os.path.join(sysfs, 'class', 'net')))
+    except OSError:
+        return []
+    return [l for l in (read_link(n, sysfs) for n in names) if l is not None]
+
+
+def _bound_connection(url: str, iface: str, timeout: float) -> http.client.HTTPConnection:
+    """Połączenie HTTP(S) wychodzące tylko przez `iface` (SO_BINDTODEVICE, wymaga roota)."""
+    u = urllib.parse.urlsplit(url)
+    cls = http.client.HTTPSConnection if u.scheme == 'https' else http.client.HTTPConnection
+    conn = cls(u.hostname, u.port, timeout=timeout)
+
+    def create(addr, timeout=None, source_address=None):
+        err = None
+        for family, stype, proto, _c, sa in socket.getaddrinfo(*addr, type=socket.SOCK_STREAM):
+            s = socket.socket(family, stype, proto)
+            try:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, iface.encode())
+                s.settimeout(timeout)
+                s.connect(sa)
+                return s
+            except OSError as e:
+                s.close()
+                err = e
+        raise err or OSError(f"{addr[0]}: brak adresu")
+
+    conn._create_connection = create
+    return conn
+
+
+def probe(link: Link, url: str, sample: int = PROBE_SAMPLE, timeout: float = PROBE_TIMEOUT) -> Link:
+    """Przepustowość pobrania `sample` bajtów z `url` przez to łącze (link.rate / link.error)."""
+    u = urllib.parse.urlsplit(url)
+    conn = _bound_connection(url, link.name, timeout)
+    try:
+        t0 = time.perf_counter()
+        conn.request('GET', u.path or '/', headers={'Range': f'bytes=0-{sample - 1}'})
+        r = conn.getresponse()
+        got = len(r.read(sample))
+        link.rate = got / max(time.perf_counter() - t0, 1e-3)
+    except Exception as e:
+        link.error = str(e) or type(e).__name__
+    finally:
+        conn.close()
+    return link
+
+
+def _key(l: Link):
+    return (l.tier, -l.rate, -l.speed, l.duplex != 'full', l.name)
+
+
+def rank(found: List[Link], probe_url: Optional[str] = None,
+         timeout: float = PROBE_TIMEOUT) -> List[Link]:
+    """
+    Od najlepszego łącza. `probe_url` – gdy kabli z nośną jest kilka, mierzy
+    je równolegle (najwyżej `timeout` s) i stawia zmierzoną przepustowość
+    przed deklarowaną prędkością.
+    """
+    wired = [l for l in found if l.tier == 0]
+    if probe_url and len(wired) > 1:
+        with ThreadPoolExecutor(len(wired)) as pool:
+            list(pool.map(lambda l: probe(l, probe_url, timeout=timeout), wired))
+    return sorted(found, key=_key)
+
+
+def _selftest() -> int:
+    import shutil
+    import tempfile
+
+    root = tempfile.mkdtemp()
+    net = os.path.join(root, 'class', 'net')
+
+    def nic(name, type_=1, device=True, carrier='1', speed='1000', duplex='full', wireless=False):
+        d = os.path.join(net, name)
+        os.makedirs(d)
+        if device:
+            os.makedirs(os.path.join(root, 'devices', name))
+            os.symlink(os.path.join(root, 'devices', name), os.path.join(d, 'device'))
+        if wireless:
+            os.mkdir(os.path.join(d, 'wireless'))
+        for attr, val in (('type', type_), ('carrier', carrier), ('speed', speed), ('duplex', duplex)):
+            if val is not None:
+                with open(os.path.join(d, attr), 'w') as f:
+                    f.write(f"{val}\n")
+
+    try:
+        nic('lo', type_=772, device=False)
+        nic('docker0', device=False)
+        nic('veth1a2b', device=False)
+        nic('tun0', type_=65534)
+        nic('eno1', speed='100')
+        nic('enp3s0', speed='2500')
+        nic('enp4s0', speed='2500', duplex='half')
+        nic('enp5s0', carrier='0', speed=None, duplex=None)     # EINVAL ~ brak pliku
+        nic('enx0', speed='-1', duplex='unknown')
+        nic('wlp2s0', carrier='0', speed=None, duplex=None, wireless=True)
+
+        order = [l.name for l in rank(links(root))]
+        expect = ['enp3s0', 'enp4s0', 'eno1', 'enx0', 'wlp2s0', 'enp5s0']
+        print(order)
+        for l in rank(links(root)):
+            print(f"  {l.describe()}")
+        ok = order == expect
+        print("✅ kolejność zgodna" if ok else f"❌ oczekiwano {expect}")
+
+        # próba przepustowości: pomiar wyprzedza deklarowaną prędkość
+        found = links(root)
+        by = {l.name: l for l in found}
+        by['eno1'].rate, by['enp3s0'].rate = 90e6, 10e6
+        order = [l.name for l in sorted(found, key=_key)]
+        ok2 = order[0] == 'eno1'
+        print("✅ pomiar ma pierwszeństwo" if ok2 else f"❌ {order}")
+        return 0 if ok and ok2 else 1
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    if '--selftest' in sys.argv:
+        sys.exit(_selftest())
+    url = sys.argv[1] if len(sys.argv) > 1 else None
+    for l in rank(links(), probe_url=url):
+        print(l.describe(), f"– {l.error}" if l.error else "")
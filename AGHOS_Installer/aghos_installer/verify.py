@@ -0,0 +1,84 @@
+"""
+SHA-512 archiwów RootFS z pamięcią podręczną weryfikacji.
+
+Wynik liczenia sumy zapisywany jest obok archiwum w `<plik>.verified`
+razem z (rozmiar, mtime_ns, inode). Ponowna instalacja z tego samego
+archiwum w cache nie musi go więc czytać drugi raz – wystarczy `stat()`.
+Samo liczenie idzie po `mmap` dużymi kawałkami; hashlib zwalnia GIL przy
+tak dużych buforach, więc wątek roboczy nie blokuje GUI.
+"""
+
+import os
+import json
+import mmap
+import hashlib
+from typing import Callable, Optional
+
+READ_SIZE = 8 * 1024 * 1024
+
+
+def sidecar_path(path: str) -> str:
+    return path + ".verified"
+
+
+def _key(st: os.stat_result) -> dict:
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'ino': st.st_ino}
+
+
+def cached_sha512(path: str) -> Optional[str]:
+    """Suma z pliku .verified, o ile archiwum nie zmieniło się od zapisu."""
+    try:
+        st = os.stat(path)
+        with open(sidecar_path(path)) as f:
+            d = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if d.get('path') != os.path.abspath(path) or any(d.get(k) != v for k, v in _key(st).items()):
+        return None
+    return d.get('sha512')
+
+
+def remember(path: str, digest: str):
+    st = os.stat(path)
+    data = dict(_key(st), path=os.path.abspath(path), sha512=digest)
+    tmp = sidecar_path(path) + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, sidecar_path(path))
+
+
+def forget(path: str):
+    try:
+        os.remove(sidecar_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def sha512_file(path: str, report: Optional[Callable[[int, int], None]] = None) -> str:
+    h = hashlib.sha512()
+    with open(path, 'rb') as f:
+        total = os.fstat(f.fileno()).st_size
+        if total == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if hasattr(m, 'madvise'):
+                m.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(m)
+            try:
+                for off in range(0, total, READ_SIZE):
+                    h.update(view[off:off + READ_SIZE])
+                    if report:
+                        report(min(off + READ_SIZE, total), total)
+            finally:
+                view.release()
+    return h.hexdigest()
+
+
+def file_sha512(path: str, report: Optional[Callable[[int, int], None]] = None) -> str:
+    """SHA-512 pliku – z pamięci podręcznej albo policzona i zapamiętana."""
+    digest = cached_sha512(path)
+    if digest:
+        return digest
+    digest = sha512_file(path, report)
+    remember(path, digest)
+    return digest
@@ -0,0 +1,121 @@
+"""
+Skanowanie sieci Wi-Fi przez nmcli, poza wątkiem GUI.
+
+`nmcli -t -f SSID,BSSID,SIGNAL,SECURITY,CHAN dev wifi list` zwraca jeden
+wiersz na BSSID, więc ta sama sieć z kilku punktów dostępowych pojawia się
+kilka razy. `dedupe()` zostawia dla każdego SSID najsilniejszy BSSID
+i sortuje od najlepszego sygnału.
+
+Wyniki są cache'owane per interfejs na `TTL` sekund. Odświeżanie jest
+dwustopniowe: `scan(iface, rescan=False)` zwraca od razu to, co NM już
+zna (bez czekania na skan radiowy), a `scan(iface, rescan=True)` wymusza
+nowy skan – GUI pokazuje pierwszą listę i podmienia ją na drugą.
+"""
+
+import time
+import threading
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+TTL = 15.0
+FIELDS = 'SSID,BSSID,SIGNAL,SECURITY,CHAN'
+
+
+class AccessPoint:
+    __slots__ = ('ssid', 'bssid', 'signal', 'security', 'chan')
+
+    def __init__(self, ssid: str, bssid: str, signal: int, security: str, chan: int):
+        self.ssid = ssid
+        self.bssid = bssid
+        self.signal = signal
+        self.security = security
+        self.chan = chan
+
+    @property
+    def secured(self) -> bool:
+        return bool(self.security) and self.security != '--'
+
+    @property
+    def band(self) -> str:
+        return '5 GHz' if self.chan > 14 else '2.4 GHz'
+
+    def label(self) -> str:
+        bars = '▂▄▆█'[:max(1, min(4, (self.signal + 24) // 25))]
+        lock = ' 🔒' if self.secured else ''
+        return f"{self.ssid}   {bars:<4} {self.signal}% · {self.band}{lock}"
+
+    def __repr__(self):
+        return f"AccessPoint({self.ssid!r}, {self.bssid}, {self.signal}%, ch {self.chan})"
+
+
+def split_terse(line: str) -> List[str]:
+    """Pola wiersza `nmcli -t`: ':' rozdziela, '\\:' i '\\\\' to znaki w polu."""
+    out, cur, esc = [], [], False
+    for ch in line:
+        if esc:
+            cur.append(ch)
+            esc = False
+        elif ch == '\\':
+            esc = True
+        elif ch == ':':
+            out.append(''.join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+    out.append(''.join(cur))
+    return out
+
+
+def parse(output: str) -> List[AccessPoint]:
+    aps = []
+    for line in output.splitlines():
+        f = split_terse(line)
+        if len(f) < 5 or not f[0]:
+            continue        # ukryte sieci (pusty SSID) nie nadają się do wyboru z listy
+        try:
+            aps.append(AccessPoint(f[0], f[1], int(f[2] or 0), f[3], int(f[4] or 0)))
+        except ValueError:
+            continue
+    return aps
+
+
+def dedupe(aps: List[AccessPoint]) -> List[AccessPoint]:
+    """Najsilniejszy BSSID na SSID, od najlepszego sygnału."""
+    best: Dict[str, AccessPoint] = {}
+    for ap in aps:
+        cur = best.get(ap.ssid)
+        # przy równym sygnale wolimy 5 GHz
+        if cur is None or (ap.signal, ap.chan > 14) > (cur.signal, cur.chan > 14):
+            best[ap.ssid] = ap
+    return sorted(best.values(), key=lambda ap: (-ap.signal, ap.ssid))
+
+
+_cache: Dict[str, Tuple[float, List[AccessPoint]]] = {}
+_lock = threading.Lock()
+
+
+def cached(iface: str, max_age: float = TTL) -> Optional[List[AccessPoint]]:
+    with _lock:
+        hit = _cache.get(iface)
+    if hit and time.monotonic() - hit[0] < max_age:
+        return hit[1]
+    return None
+
+
+def scan(iface: str, rescan: bool = False, max_age: float = TTL) -> List[AccessPoint]:
+    """
+    Sieci widoczne z `iface`: z cache (młodszego niż `max_age`), z wiedzy NM
+    (`rescan=False`, natychmiast) albo po nowym skanie radiowym (`rescan=True`).
+    """
+    if not rescan:
+        hit = cached(iface, max_age)
+        if hit is not None:
+            return hit
+    out = subprocess.run(['nmcli', '-t', '-f', FIELDS, 'dev', 'wifi', 'list',
+                          'ifname', iface, '--rescan', 'yes' if rescan else 'no'],
+                         capture_output=True, text=True).stdout
+    aps = dedupe(parse(out))
+    if aps or rescan:
+        with _lock:
+            _cache[iface] = (time.monotonic(), aps)
+    return aps
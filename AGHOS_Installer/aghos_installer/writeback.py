@@ -0,0 +1,156 @@
+"""
+Opróżnianie buforów systemu docelowego przed odmontowaniem i restartem.
+
+Zamiast globalnego `sync` i czekania, aż Dirty/Writeback z /proc/meminfo
+spadną do zera (te liczniki obejmują też system live), `flush()` wywołuje
+równolegle `syncfs()` na każdym systemie plików pod /mnt, a postęp czyta per
+dysk z /sys/block/<dysk>/stat (sektory zapisane, żądania w toku). Koniec,
+gdy wszystkie syncfs wróciły i dyski docelowe nie mają I/O w toku.
+
+Ile zostało do zapisania: BdiDirty+BdiWriteback dysku z debugfs
+(/sys/kernel/debug/bdi/<maj:min>/stats), a bez debugfs – Dirty+Writeback
+z /proc/meminfo jako górne oszacowanie.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aghos_installer import trace
+from aghos_installer.mounts import mounts_under
+from aghos_installer.slowtarget import disk_of, syncfs
+
+SECTOR = 512
+MiB = 1024 ** 2
+# format wiersza statusu (etap 4 podaje przetłumaczony); ETA dopisywane jako " · ~N s"
+STATUS_FMT = "Zapisuję {mib:0.0f} MiB na {disks}"
+
+Progress = Optional[Callable[[int, int, float], None]]
+
+
+def _nolog(_msg: str):
+    pass
+
+
+class Disk:
+    __slots__ = ('name', 'node', 'targets', 'base', 'written', 'inflight')
+
+    def __init__(self, node: str):
+        self.name = os.path.basename(node)
+        self.node = node
+        self.targets: List[str] = []
+        self.base = 0           # bajty zapisane przed flush()
+        self.written = 0        # bajty zapisane od początku flush()
+        self.inflight = 0
+
+    def sample(self):
+        total, self.inflight = read_stat(self.node)
+        self.written = total - self.base
+
+    def __repr__(self):
+        return f"Disk({self.name}, {self.targets})"
+
+
+def read_stat(node: str) -> Tuple[int, int]:
+    """(bajty zapisane od startu systemu, żądania I/O w toku) z <węzeł>/stat."""
+    with open(os.path.join(node, 'stat')) as f:
+        v = f.read().split()
+    return int(v[6]) * SECTOR, int(v[8])
+
+
+def bdi_pending(node: str, debugfs: str = '/sys/kernel/debug') -> Optional[int]:
+    """Brudne + zapisywane bajty dysku wg debugfs; None bez debugfs."""
+    try:
+        with open(os.path.join(node, 'dev')) as f:
+            devno = f.read().strip()
+        kb = 0
+        with open(os.path.join(debugfs, 'bdi', devno, 'stats')) as f:
+            for line in f:
+                key, _, val = line.partition(':')
+                if key.strip() in ('BdiDirty', 'BdiWriteback'):
+                    kb += int(val.split()[0])
+        return kb * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def meminfo_pending(path: str = '/proc/meminfo') -> int:
+    kb = 0
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(('Dirty:', 'Writeback:')):
+                    kb += int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return kb * 1024
+
+
+def target_disks(root: str = '/mnt', sysfs: str = '/sys', mounts=None) -> Dict[str, Disk]:
+    """Dyski pod systemami plików w `root` (z punktami montowania na każdym)."""
+    disks: Dict[str, Disk] = {}
+    for m in mounts_under(root, mounts):
+        node = disk_of(m.source, sysfs)
+        if not node:
+            continue
+        d = disks.setdefault(node, Disk(node))
+        d.targets.append(m.target)
+    return {d.name: d for d in disks.values()}
+
+
+def _status_text(disks: List[Disk], left: int, rate: float, fmt: str = STATUS_FMT) -> str:
+    text = fmt.format(mib=left / MiB, disks=", ".join(d.name for d in disks))
+    return text + (f" · ~{left / rate:0.0f} s" if rate > 0 and left > 0 else "")
+
+
+def flush(root: str = '/mnt', progress: Progress = None, status: Callable[[str], None] = _nolog,
+          log: Callable[[str], None] = print, sysfs: str = '/sys', mounts=None,
+          timeout: float = 120.0, interval: float = 0.2, status_fmt: str = STATUS_FMT) -> bool:
+    """
+    syncfs() na wszystkich systemach plików w `root` naraz, z postępem
+    progress(zapisane, szacunek całości, B/s); False po `timeout`.
+    `status_fmt` – format statusu z polami {mib} i {disks}.
+    """
+    disks = list(target_disks(root, sysfs, mounts).values())
+    if not disks:
+        return True
+    targets = [t for d in disks for t in d.targets]
+
+    per_disk = [bdi_pending(d.node) for d in disks]
+    total = sum(per_disk) if None not in per_disk else meminfo_pending()
+    for d in disks:
+        d.base, d.inflight = read_stat(d.node)
+
+    tp = trace.Throughput('writeback', progress)
+    t0 = time.monotonic()
+    ex = ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix='syncfs')
+    futs = {ex.submit(syncfs, t): t for t in targets}
+    try:
+        while True:
+            for d in disks:
+                d.sample()
+            done = sum(max(d.written, 0) for d in disks)
+            total = max(total, done)
+            elapsed = max(time.monotonic() - t0, 1e-3)
+            rate = done / elapsed
+            syncing = any(not f.done() for f in futs)
+            if not syncing and not any(d.inflight for d in disks):
+                tp(done, done, rate)
+                break
+            tp(done, total, rate)
+            status(_status_text(disks, total - done, rate, status_fmt))
+            if elapsed > timeout:
+                log(f"⚠️ Zapis na {', '.join(d.name for d in disks)} trwa ponad {timeout:0.0f} s – przerywam czekanie")
+                return False
+            time.sleep(interval)
+    finally:
+        ex.shutdown(wait=False)
+        tp.close()
+
+    for f, t in futs.items():
+        if f.exception():
+            log(f"⚠️ syncfs {t}: {f.exception()}")
+    log("⏱ Zapisano " + ", ".join(f"{d.name}: {d.written / MiB:0.0f} MiB" for d in disks)
+        + f" w {time.monotonic() - t0:0.1f} s")
+    return True
@@ -1,14 +1,21 @@
 import sys
 import os
-import socket
-import subprocess
-import importlib.util
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QVBoxLayout, QComboBox,
     QLineEdit, QPushButton, QRadioButton, QButtonGroup, QHBoxLayout
 )
 from PySide6.QtCore import Qt
 
+# wspólne moduły z AGHOS_Installer/aghos_installer (skrypt ładowany jest po ścieżce)
+_INSTALLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _INSTALLER_DIR not in sys.path:
+    sys.path.insert(0, _INSTALLER_DIR)
+
+from aghos_installer import stages, prefetch, wifi
+from aghos_installer.jobs import submit
+from aghos_installer.engine import network, rootfs
+from aghos_installer.engine.network import is_connected
+
 translations = {
     "pl": {
         "title": "Konfiguracja sieci",
@@ -16,6 +23,7 @@ translations = {
         "not_connected": "❌ Brak połączenia z internetem",
         "select_iface": "Wybierz interfejs:",
         "select_wifi": "Wybierz sieć WiFi:",
+        "scanning": "Wyszukiwanie sieci...",
         "password": "Hasło:",
         "dhcp": "Użyj DHCP",
         "static": "Statyczne IP",
@@ -35,6 +43,7 @@ translations = {
         "not_connected": "❌ No internet connection",
         "select_iface": "Select interface:",
         "select_wifi": "Select WiFi network:",
+        "scanning": "Scanning for networks...",
         "password": "Password:",
         "dhcp": "Use DHCP",
         "static": "Static IP",
@@ -51,43 +60,16 @@ translations = {
     # Add other languages as needed...
 }
 
-def is_connected():
-    try:
-        socket.create_connection(("1.1.1.1", 53), timeout=2)
-        return True
-    except OSError:
-        return False
-
-def launch_next(lang, console):
-    try:
-        # Use the same directory as this script
-        script_dir = os.path.dirname(__file__)
-        files = sorted(f for f in os.listdir(script_dir) if f.endswith(".py"))
-        # Skip this script itself
-        if len(files) > 1:
-            next_script = files[1]
-            console.append(f"➡️ [{lang}] Uruchamiam skrypt: {next_script}")
-            path = os.path.join(script_dir, next_script)
-            spec = importlib.util.spec_from_file_location("next_mod", path)
-            mod = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
-            if hasattr(mod, "run"):
-                mod.run(lang, console)
-            else:
-                console.append(f"❌ [{lang}] Brak funkcji run() w {next_script}")
-        else:
-            console.append(f"⚠️ [{lang}] Brak kolejnych skryptów w folderze.")
-    except Exception as e:
-        console.append(f"❌ [{lang}] Błąd uruchamiania kolejnego skryptu: {e}")
-
 class NetConfigurator(QWidget):
-    def __init__(self, lang, console):
+    def __init__(self, lang, console, data=None):
         super().__init__()
         self.lang = lang
         self.console = console
         self.tr = translations.get(lang, translations["en"])
+        self._scan_gen = 0      # wyniki skanu dla poprzedniego interfejsu są odrzucane
+        self._scan_full = 0     # generacja, dla której przyszedł już pełny skan
         self.init_ui()
-        self.post_init()
+        self.post_init(data or preload())
 
     def init_ui(self):
         self.setWindowTitle(self.tr["title"])
@@ -110,18 +92,22 @@ class NetConfigurator(QWidget):
 
         self.cont_btn = QPushButton(self.tr["continue"])
         self.cont_btn.setEnabled(False)
-        self.cont_btn.clicked.connect(lambda: (self.close(), launch_next(self.lang, self.console)))
+        self.cont_btn.clicked.connect(stages.advance)
         layout.addWidget(self.cont_btn)
 
-    def post_init(self):
-        if is_connected():
+    def post_init(self, data):
+        if data['connected']:
             self.status.setText(self.tr["connected"])
             self.console.append(f"[{self.lang}] {self.tr['connected']}")
             self.cont_btn.setEnabled(True)
+            # archiwum RootFS pobiera się w tle, gdy użytkownik partycjonuje dysk
+            prefetch.start(log=self.console.append)
         else:
             self.status.setText(self.tr["not_connected"])
             self.console.append(f"[{self.lang}] {self.tr['not_connected']}")
-            ifaces = [i for i in os.listdir("/sys/class/net") if i != "lo"]
+            ifaces = [l.name for l in data['links']]
+            for l in data['links']:
+                self.console.append(f"  ➡️ {l.describe()}")
             self.iface_combo.addItems(ifaces)
             self.iface_combo.currentTextChanged.connect(self.on_iface_changed)
             if ifaces:
@@ -133,17 +119,17 @@ class NetConfigurator(QWidget):
             w = self.dynamic_layout.takeAt(0).widget()
             if w: w.deleteLater()
         self.connect_btn.setEnabled(False)
+        self._scan_gen += 1
 
         if iface.startswith("wl"):
             self.dynamic_layout.addWidget(QLabel(self.tr["select_wifi"]))
             self.ssid_combo = QComboBox()
-            out = subprocess.getoutput(f"nmcli -t -f SSID dev wifi list ifname {iface}")
-            self.ssid_combo.addItems([s for s in out.splitlines() if s])
+            self.ssid_combo.setPlaceholderText(self.tr["scanning"])
             self.dynamic_layout.addWidget(self.ssid_combo)
             self.dynamic_layout.addWidget(QLabel(self.tr["password"]))
             self.pwd_edit = QLineEdit(echoMode=QLineEdit.Password)
             self.dynamic_layout.addWidget(self.pwd_edit)
-            self.connect_btn.setEnabled(True)
+            self.scan_wifi(iface)
         else:
             box = QHBoxLayout()
             rd_dhcp = QRadioButton(self.tr["dhcp"])
@@ -162,39 +148,83 @@ class NetConfigurator(QWidget):
             rd_dhcp.toggled.connect(lambda checked: [w.setVisible(not checked) for w in (self.ip_edit, self.mask_edit, self.gw_edit, self.dns_edit)])
             self.connect_btn.setEnabled(True)
 
+    def scan_wifi(self, iface: str):
+        """Najpierw sieci znane już NM (od razu), potem pełny skan radiowy – oba w tle."""
+        gen = self._scan_gen
+        for rescan in (False, True):
+            submit(self._scan_job, iface, rescan,
+                   on_done=lambda aps, gen=gen, rescan=rescan: self._on_scan(gen, rescan, aps),
+                   on_error=lambda e: self.console.append(f"⚠️ Skan Wi-Fi ({iface}): {e}"))
+
+    def _scan_job(self, job, iface: str, rescan: bool) -> list:
+        """Wątek roboczy: nmcli dev wifi list (z cache wifi.TTL, gdy bez rescan)."""
+        return wifi.scan(iface, rescan=rescan)
+
+    def _on_scan(self, gen: int, rescan: bool, aps: list):
+        if gen != self._scan_gen or (not rescan and self._scan_full == gen):
+            return      # zmieniono interfejs albo szybki wynik przyszedł po pełnym
+        if rescan:
+            self._scan_full = gen
+        if not aps:
+            return
+        chosen = self.ssid_combo.currentData()
+        self.ssid_combo.clear()
+        for ap in aps:
+            self.ssid_combo.addItem(ap.label(), ap.ssid)
+        idx = self.ssid_combo.findData(chosen) if chosen else -1
+        self.ssid_combo.setCurrentIndex(max(idx, 0))
+        self.connect_btn.setEnabled(True)
+
     def connect_network(self):
         iface = self.iface_combo.currentText()
         self.console.append(f"[{self.lang}] {self.tr['connecting']}")
+        self.status.setText(self.tr['connecting'])
         if iface.startswith("wl"):
-            ssid = self.ssid_combo.currentText()
-            pwd = self.pwd_edit.text()
-            subprocess.run(["nmcli","dev","wifi","connect",ssid,"password",pwd,"ifname",iface], capture_output=True)
+            kw = dict(ssid=self.ssid_combo.currentData(), password=self.pwd_edit.text())
         else:
             # find DHCP radio
             use_dhcp = any(btn.isChecked() for btn in self.findChildren(QRadioButton) if btn.text()==self.tr["dhcp"])
-            if use_dhcp:
-                subprocess.run(["nmcli","con","up",iface], capture_output=True)
-            else:
-                subprocess.run(["nmcli","con","mod",iface,
-                                "ipv4.addresses",self.ip_edit.text(),
-                                "ipv4.gateway",self.gw_edit.text(),
-                                "ipv4.dns",self.dns_edit.text(),
-                                "ipv4.method","manual"], capture_output=True)
-                subprocess.run(["nmcli","con","up",iface], capture_output=True)
-        if is_connected():
+            kw = {} if use_dhcp else dict(dhcp=False, ip=self.ip_edit.text(), gateway=self.gw_edit.text(),
+                                          dns=self.dns_edit.text())
+        # nmcli --wait i czekanie na łączność (zdarzenia NM) idą w tle; postęp w etykiecie statusu
+        self.connect_btn.setEnabled(False)
+        submit(self._connect_job, iface, kw,
+               on_done=self._on_connected,
+               on_error=lambda e: self._on_connected(False),
+               on_status=self.status.setText,
+               on_log=self.console.append)
+
+    def _connect_job(self, job, iface: str, kw: dict) -> bool:
+        """Wątek roboczy: aktywacja interfejsu i czekanie, aż sieć działa."""
+        return network.connect(iface, log=job.log, status=job.status, **kw)
+
+    def _on_connected(self, ok: bool):
+        self.connect_btn.setEnabled(True)
+        if ok:
             self.status.setText(self.tr["connected_ok"])
             self.console.append(f"[{self.lang}] {self.tr['connected_ok']}")
             self.cont_btn.setEnabled(True)
+            prefetch.start(log=self.console.append)
         else:
             self.status.setText(self.tr["error"])
             self.console.append(f"[{self.lang}] {self.tr['error']}")
 
+def preload():
+    """Wątek roboczy (orkiestrator): stan łącza i interfejsy, od najlepszego."""
+    connected = is_connected()
+    return {'connected': connected,
+            'links': [] if connected else network.links(probe_url=rootfs.DISTRO_URL)}
+
+def build(lang, console, data=None):
+    return NetConfigurator(lang, console, data)
+
 def run(lang, console):
     app = QApplication.instance() or QApplication(sys.argv)
-    win = NetConfigurator(lang, console)
-    win.show()
+    return stages.start(lang, console, first="1_connect_network").widget
 
 if __name__ == "__main__":
     class DummyConsole:
         def append(self, txt): print(txt)
+    app = QApplication(sys.argv)
     run("pl", DummyConsole())
+    sys.exit(app.exec())
@@ -3,8 +3,6 @@
 import sys
 import os
 import subprocess
-import re
-import importlib.util
 
 from math import floor
 from PySide6.QtWidgets import (
@@ -14,10 +12,22 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QPainter, QColor
 from PySide6.QtCore import Qt
 
+# wspólne moduły z AGHOS_Installer/aghos_installer (skrypt ładowany jest po ścieżce)
+_INSTALLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _INSTALLER_DIR not in sys.path:
+    sys.path.insert(0, _INSTALLER_DIR)
+
+from aghos_installer import stages
+from aghos_installer.jobs import submit
+from aghos_installer.blockdev import inventory
+from aghos_installer import mkfs, mounts
+from aghos_installer.engine import disks
+
 # Pełne sekcje „translations” dla PL, EN, FR, DE i ES
 translations = {
     "pl": {
         "format_question": "Czy sformatować?",
+        "no_discard": "Szybkie formatowanie (bez discard/TRIM)",
         "title": "Zarządzanie dyskiem",
         "select_disk": "Wybierz dysk do instalacji:",
         "mode_question": "Czy wyczyścić cały dysk i zastosować domyślny schemat?",
@@ -57,6 +67,7 @@ translations = {
     },
     "en": {
         "format_question": "Format partitions?",
+        "no_discard": "Fast format (skip discard/TRIM)",
         "title": "Disk Management",
         "select_disk": "Select disk for installation:",
         "mode_question": "Clear entire disk and apply default layout?",
@@ -93,6 +104,7 @@ translations = {
     },
     "fr": {
         "format_question": "Formater les partitions ?",
+        "no_discard": "Formatage rapide (sans discard/TRIM)",
         "title": "Gestion du disque",
         "select_disk": "Sélectionnez le disque pour l'installation :",
         "mode_question": "Effacer tout le disque et appliquer le schéma par défaut ?",
@@ -129,6 +141,7 @@ translations = {
     },
     "de": {
         "format_question": "Partitionen formatieren?",
+        "no_discard": "Schnellformatierung (ohne Discard/TRIM)",
         "title": "Datenträgerverwaltung",
         "select_disk": "Wählen Sie die Festplatte zur Installation:",
         "mode_question": "Gesamte Festplatte löschen und Standardlayout anwenden?",
@@ -165,6 +178,7 @@ translations = {
     },
     "es": {
         "format_question": "¿Formatear particiones?",
+        "no_discard": "Formateo rápido (sin discard/TRIM)",
         "title": "Gestión de disco",
         "select_disk": "Seleccione el disco para la instalación:",
         "mode_question": "¿Borrar todo el disco and aplicar esquema por defecto?",
@@ -265,26 +279,8 @@ class PartitionRow(QWidget):
         layout.addWidget(btn_del)
 
     def update_size(self):
-        txt = self.size_edit.text().strip().upper()
-        if txt.endswith('%'):
-            try:
-                pct = float(txt.strip('%'))
-                dev = f"/dev/{self.manager.disk_combo.currentData()}"
-                total = int(subprocess.getoutput(f"lsblk -b -n -l -o SIZE {dev}").splitlines()[0])
-                self.size = int(pct/100 * total)
-            except ValueError:
-                self.size = 0
-        else:
-            m = re.match(r'^(\d+(?:\.\d+)?)([MGT]B?)?$', txt)
-            if m:
-                num, suf = m.groups()
-                mul = {'M':1024**2,'MB':1024**2,'G':1024**3,'GB':1024**3,'T':1024**4,'TB':1024**4,None:1}
-                self.size = int(float(num)*mul[suf])
-            else:
-                try:
-                    self.size = int(txt)
-                except ValueError:
-                    self.size = 0
+        total = inventory().size(self.manager.disk_combo.currentData())
+        self.size = disks.parse_size(self.size_edit.text(), total)
         self.manager.update_free()
 
     def set_free(self, free):
@@ -318,14 +314,9 @@ class DiskManager(QWidget):
         self.layout.addWidget(QLabel(self.tr['select_disk']))
         self.disk_combo = QComboBox()
         self.disk_combo.addItem("", "")
-        out = subprocess.getoutput("lsblk -nd -b -o NAME,SIZE,MODEL")
-        for line in out.splitlines():
-            parts = re.split(r"\s+", line, maxsplit=2)
-            if len(parts) != 3:
-                continue
-            name, size_str, model = parts
-            size_gb = int(size_str)/(1024**3) if size_str.isdigit() else 0
-            self.disk_combo.addItem(f"/dev/{name} – {model.strip()} – {size_gb:.1f} GB", name)
+        for disk in inventory().disks():
+            size_gb = disk.size/(1024**3)
+            self.disk_combo.addItem(f"{disk.path} – {disk.model} – {size_gb:.1f} GB", disk.name)
         self.layout.addWidget(self.disk_combo)
 
         # Flow container
@@ -343,19 +334,20 @@ class DiskManager(QWidget):
         self.cancel_btn.clicked.connect(self._on_cancel)
         self.cont_btn = QPushButton(self.tr['continue'])
         self.cont_btn.setEnabled(False)
-        self.cont_btn.clicked.connect(lambda: launch_next(self.lang, self.console))
+        self.cont_btn.clicked.connect(stages.advance)
         btn_box.addWidget(self.cancel_btn)
         btn_box.addWidget(self.cont_btn)
         self.layout.addLayout(btn_box)
 
         self.disk_combo.currentIndexChanged.connect(self.on_disk_selected)
 
+    def on_enter(self):
+        open_docs(self.lang, self.console)
+
     def _on_cancel(self):
-        # Unmount in reverse order
-        for mp in ['/home', '/boot', '/']:
-            tgt = '/mnt'+mp if mp != '/' else '/mnt'
-            subprocess.run(['umount', '-R', tgt], check=False)
-            self.console.append(f"🔄 Odmontowano {tgt}")
+        # całe drzewo pod /mnt, od liści
+        for tgt, err in mounts.unmount_tree('/mnt', log=self.console.append):
+            self.console.append(f"⚠️ umount {tgt}: {err}")
         self.close()
 
     def on_disk_selected(self):
@@ -386,16 +378,10 @@ class DiskManager(QWidget):
         self.scan_and_build_default()
 
     def scan_and_build_default(self):
-        dev = f"/dev/{self.disk_combo.currentData()}"
-        parts = []
-        out = subprocess.getoutput(f"lsblk -b -n -l -o NAME,TYPE,SIZE {dev}")
-        total = int(subprocess.getoutput(f"lsblk -b -n -l -o SIZE {dev}").splitlines()[0])
+        disk = self.disk_combo.currentData()
+        total = inventory().size(disk)
         self.total_size = total  # Dodane z drugiego skryptu
-
-        for line in out.splitlines():
-            cols = re.split(r"\s+", line)
-            if len(cols)>=3 and cols[1]=='part':
-                parts.append((cols[0],int(cols[2])))
+        parts = [(p.name, p.size) for p in inventory().partitions(disk)]
         ub = UsageBar(); ub.setFixedHeight(30); ub.set_partitions(parts)
         self.flow_layout.addWidget(QLabel(self.tr['usage']))
         self.flow_layout.addWidget(ub)
@@ -427,6 +413,9 @@ class DiskManager(QWidget):
             self.table.addWidget(row)
             self.rows.append(row)
 
+        self.nodiscard_chk = QCheckBox(self.tr['no_discard'])
+        self.flow_layout.addWidget(self.nodiscard_chk)
+
         # Dodanie przycisku commit
         commit_btn = QPushButton(self.tr['commit'])
         commit_btn.clicked.connect(self.commit_changes)
@@ -436,8 +425,7 @@ class DiskManager(QWidget):
         self.update_free()
 
     def add_row(self):
-        dev = f"/dev/{self.disk_combo.currentData()}"
-        total = int(subprocess.getoutput(f"lsblk -b -n -l -o SIZE {dev}").splitlines()[0])
+        total = inventory().size(self.disk_combo.currentData())
         used = sum(r.size for r in self.rows)
         free = total - used
         row = PartitionRow(self.lang, self.tr, free, self.pt.currentText(), self)
@@ -465,22 +453,8 @@ class DiskManager(QWidget):
         else:
             self.free_label.setStyleSheet("color: green;")
 
-    def build_mkfs_cmd(self, device, fstype):
-        fstype = fstype.lower()
-        if fstype in ('swap', 'linux-swap', 'swapspace'):
-            return ['mkswap', device]
-        elif fstype == 'btrfs':
-            return ['mkfs.btrfs', '-f', device]
-        elif fstype == 'vfat':
-            return ['mkfs.vfat', '-F', '32', device]
-        elif fstype in ('ext2','ext3','ext4'):
-            return ['mkfs.'+fstype, '-F', device]
-        elif fstype == 'xfs':
-            return ['mkfs.xfs', '-f', device]
-        elif fstype == 'f2fs':
-            return ['mkfs.f2fs', '-f', device]
-        else:
-            return ['mkfs.ext4', '-F', device]
+    def build_mkfs_cmd(self, device, fstype, discard=True):
+        return mkfs.mkfs_cmd(device, fstype, discard)
 
     def commit_changes(self):
         if QMessageBox.question(
@@ -489,195 +463,36 @@ class DiskManager(QWidget):
         ) != QMessageBox.Yes:
             return
 
-        dev = f"/dev/{self.disk_combo.currentData()}"
+        disk = self.disk_combo.currentData()
         ptype = self.pt.currentText().lower()
-
-        # 1. Partition table
-        self.console.append(f"parted -s {dev} mklabel {ptype}")
-        result = subprocess.run(['parted','-s',dev,'mklabel',ptype], capture_output=True, text=True)
-        if result.returncode != 0:
-            QMessageBox.critical(self, "Błąd", f"Nie udało się utworzyć tablicy partycji: {result.stderr}")
-            return
-
-        # 2. Create parts - poprawione obliczenia
-        start_mb = 1  # Zaczynamy od 1MB (zostawiamy miejsce na MBR/GPT)
-
-        for r in self.rows:
-            # Konwertuj rozmiar z bajtów na MB
-            size_mb = max(1, floor(r.size / (1024**2)))
-            end_mb = start_mb + size_mb
-
-            fs = r.fs_combo.currentText().lower()
-
-            # mapowanie typu do parted
-            if fs.startswith('vfat'):
-                part_fs = 'fat32'
-            elif fs in ('swap', 'linux-swap', 'swapspace'):
-                part_fs = 'linux-swap'
-            else:
-                part_fs = fs
-
-            self.console.append(f"Tworzenie partycji: {start_mb}MiB - {end_mb}MiB ({size_mb}MB)")
-
-            # Sprawdź czy rozmiar jest poprawny
-            if end_mb <= start_mb:
-                QMessageBox.critical(self, "Błąd", f"Nieprawidłowy rozmiar partycji: {size_mb}MB")
-                return
-
-            try:
-                result = subprocess.run([
-                    'parted', '-s', dev, 'mkpart', 'primary', part_fs,
-                    f"{start_mb}MiB", f"{end_mb}MiB"
-                ], capture_output=True, text=True, check=True)
-                self.console.append(result.stdout)
-            except subprocess.CalledProcessError as e:
-                error_msg = f"Błąd tworzenia partycji: {e.stderr}\nCommand: {e.cmd}"
-                QMessageBox.critical(self, "Błąd", error_msg)
-                return
-
-            idx = r.get_index()
-
-            # Ustaw flagę ESP dla partycji /boot w GPT
-            if r.mount_edit.text().strip() == '/boot' and ptype == 'gpt':
-                try:
-                    result = subprocess.run(['parted','-s',dev,'set',idx,'esp','on'],
-                                        capture_output=True, text=True, check=True)
-                    self.console.append(f"Ustawiono flagę ESP: {result.stdout}")
-                except subprocess.CalledProcessError as e:
-                    self.console.append(f"Ostrzeżenie: Nie udało się ustawić flagi ESP: {e.stderr}")
-
-            # Flaga swap dla GPT
-            if fs in ('swap','linux-swap','swapspace') and ptype == 'gpt':
-                try:
-                    result = subprocess.run(['parted','-s',dev,'set',idx,'swap','on'],
-                                        capture_output=True, text=True, check=True)
-                    self.console.append(f"Ustawiono flagę swap: {result.stdout}")
-                except subprocess.CalledProcessError as e:
-                    self.console.append(f"Ostrzeżenie: Nie udało się ustawić flagi swap: {e.stderr}")
-
-            # Ustaw nazwę partycji dla GPT
-            if ptype == 'gpt' and hasattr(r, 'name_edit') and r.name_edit.text().strip():
-                try:
-                    result = subprocess.run(['parted','-s',dev,'name',idx,r.name_edit.text().strip()],
-                                        capture_output=True, text=True, check=True)
-                    self.console.append(f"Ustawiono nazwę: {result.stdout}")
-                except subprocess.CalledProcessError as e:
-                    self.console.append(f"Ostrzeżenie: Nie udało się ustawić nazwy: {e.stderr}")
-
-            start_mb = end_mb + 1  # Zostaw 1MB przerwy między partycjami
-
-        # 3. Odczekaj chwilę aby system wykrył nowe partycje
-        import time
-        time.sleep(2)
-
-        # 4. Sformatuj i zamontuj partycje
-        os.makedirs('/mnt', exist_ok=True)
-
-        # root
-        root = next((r for r in self.rows if r.mount_edit.text().strip() == '/'), None)
-        if not root:
-            QMessageBox.critical(self, self.tr['mount_error'], "Nie znaleziono partycji root (/)")
-            return
-
-        root_idx = root.get_index()
-        root_dev = f"/dev/{self.disk_combo.currentData()}{root_idx}"
-        root_fs = root.fs_combo.currentText().lower()
-
-        # Sprawdź czy urządzenie istnieje
-        if not os.path.exists(root_dev):
-            self.console.append(f"Oczekiwanie na urządzenie {root_dev}...")
-            time.sleep(3)
-            if not os.path.exists(root_dev):
-                QMessageBox.critical(self, "Błąd", f"Urządzenie {root_dev} nie istnieje!")
-                return
-
-        cmd = self.build_mkfs_cmd(root_dev, root_fs)
-        self.console.append(' '.join(cmd))
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            self.console.append(result.stdout + result.stderr)
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(self, "Błąd formatowania", f"Nie udało się sformatować {root_dev}: {e.stderr}")
-            return
-
-        try:
-            result = subprocess.run(['mount', root_dev, '/mnt'], capture_output=True, text=True, check=True)
-            self.console.append(result.stdout + result.stderr)
-            self.console.append(f"✅ {root_dev} → /")
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(self, "Błąd montowania", f"Nie udało się zamontować {root_dev}: {e.stderr}")
-            return
-
-        # Utwórz katalogi i zamontuj pozostałe partycje
-        for sub in ('boot', 'home'):
-            os.makedirs(f"/mnt/{sub}", exist_ok=True)
-
-        # --- SWAP: sformatuj i aktywuj ---
-        for r in self.rows:
-            mp_txt = r.mount_edit.text().strip().lower()
-            fs_txt = r.fs_combo.currentText().lower()
-            if mp_txt == 'swap' or fs_txt in ('swap', 'linux-swap', 'swapspace'):
-                idx = r.get_index()
-                devn = f"/dev/{self.disk_combo.currentData()}{idx}"
-
-                # upewnij się, że urządzenie istnieje
-                if not os.path.exists(devn):
-                    self.console.append(f"Oczekiwanie na urządzenie {devn}...")
-                    time.sleep(2)
-
-                # sformatuj na swap
-                cmd = self.build_mkfs_cmd(devn, 'swap')
-                self.console.append(' '.join(cmd))
-                try:
-                    subprocess.run(cmd, capture_output=True, text=True, check=True)
-                except subprocess.CalledProcessError as e:
-                    self.console.append(f"⚠️ Błąd mkswap {devn}: {e.stderr}")
-                    continue
-
-                # włącz swap
-                try:
-                    res = subprocess.run(['swapon', devn], capture_output=True, text=True, check=True)
-                    self.console.append(res.stdout + res.stderr)
-                    self.console.append(f"✅ {devn} → swap (aktywowany)")
-                except subprocess.CalledProcessError as e:
-                    self.console.append(f"⚠️ Błąd swapon {devn}: {e.stderr}")
-
-        for mp in ('/boot', '/home'):
-            part = next((r for r in self.rows if r.mount_edit.text().strip() == mp), None)
-            if not part:
-                continue
-
-            part_idx = part.get_index()
-            devn = f"/dev/{self.disk_combo.currentData()}{part_idx}"
-            fs = part.fs_combo.currentText().lower()
-
-            # Sprawdź czy urządzenie istnieje
-            if not os.path.exists(devn):
-                self.console.append(f"Oczekiwanie na urządzenie {devn}...")
-                time.sleep(2)
-                if not os.path.exists(devn):
-                    self.console.append(f"⚠️ Urządzenie {devn} nie istnieje, pomijam...")
-                    continue
-
-            cmd = self.build_mkfs_cmd(devn, fs)
-            self.console.append(' '.join(cmd))
-            try:
-                result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                self.console.append(result.stdout + result.stderr)
-            except subprocess.CalledProcessError as e:
-                self.console.append(f"⚠️ Błąd formatowania {devn}: {e.stderr}")
-                continue
-
-            try:
-                result = subprocess.run(['mount', devn, f"/mnt{mp}"], capture_output=True, text=True, check=True)
-                self.console.append(result.stdout + result.stderr)
-                self.console.append(f"✅ {devn} → {mp}")
-            except subprocess.CalledProcessError as e:
-                self.console.append(f"⚠️ Błąd montowania {devn}: {e.stderr}")
-
+        plan = [{
+            'idx': r.get_index(),
+            'size': r.size,
+            'mount': r.mount_edit.text().strip(),
+            'fs': r.fs_combo.currentText().lower(),
+            'name': r.name_edit.text().strip() if hasattr(r, 'name_edit') else '',
+        } for r in self.rows]
+        self.setEnabled(False)
+        discard = not self.nodiscard_chk.isChecked()
+        submit(self._commit_job, disk, ptype, plan, discard,
+               on_done=self._on_mount_done, on_error=self._on_job_error,
+               on_log=self.console.append)
+
+    def _on_mount_done(self, _result):
+        inventory().invalidate()  # nowe partycje / UUID po mkfs
+        self.setEnabled(True)
         QMessageBox.information(self, self.tr['mount_done'], self.tr['mount_done_msg'])
         self.cont_btn.setEnabled(True)
 
+    def _on_job_error(self, e):
+        inventory().invalidate()
+        self.setEnabled(True)
+        QMessageBox.critical(self, getattr(e, 'title', "Błąd"), str(e))
+
+    def _commit_job(self, job, disk, ptype, plan, discard=True):
+        """Wątek roboczy: tablica partycji, partycje, mkfs, montowanie."""
+        disks.partition_and_mount(disk, ptype, plan, discard=discard, log=job.log)
+
     def init_partial_flow(self):
         self.clear_flow()
         dlg = QMessageBox(self)
@@ -685,42 +500,41 @@ class DiskManager(QWidget):
         dlg.setText(self.tr['early_warning'])
         dlg.addButton(self.tr['launch_gparted'], QMessageBox.AcceptRole)
         dlg.exec_()
-        subprocess.Popen(['gparted']).wait()
-        self.show_mount_ui()
+        self.setEnabled(False)
+        submit(lambda job: subprocess.run(['gparted']),
+               on_done=lambda _r: (inventory().invalidate(), self.setEnabled(True), self.show_mount_ui()),
+               on_error=self._on_job_error)
 
     def show_mount_ui(self):
-        dev = f"/dev/{self.disk_combo.currentData()}"
-        out = subprocess.getoutput(f"lsblk -b -n -l -o NAME,TYPE,SIZE {dev}")
         form = QFormLayout()
         self.rows_exist = []
         self.fs_selector = {}
-        for line in out.splitlines():
-            cols = re.split(r"\s+", line)
-            if len(cols)>=3 and cols[1]=='part':
-                name = cols[0]
-                size_mb = int(cols[2])//(1024**2)
-                mount_input = QLineEdit()
-                mount_input.setPlaceholderText(self.tr['mount'])
-                fs_combo = QComboBox()
-                for fs in ['vfat','ext2','ext3','ext4','btrfs','swap']:
-                    fs_combo.addItem(fs)
-                self.rows_exist.append((name, mount_input))
-                self.fs_selector[name] = fs_combo
-                row_w = QWidget()
-                row_l = QHBoxLayout(row_w)
-                row_l.addWidget(mount_input)
-                row_l.addWidget(fs_combo)
-                form.addRow(QLabel(f"/dev/{name} — {size_mb} MB"), row_w)
+        for part in inventory().partitions(self.disk_combo.currentData()):
+            name = part.name
+            size_mb = part.size//(1024**2)
+            mount_input = QLineEdit()
+            mount_input.setPlaceholderText(self.tr['mount'])
+            fs_combo = QComboBox()
+            for fs in ['vfat','ext2','ext3','ext4','btrfs','swap']:
+                fs_combo.addItem(fs)
+            self.rows_exist.append((name, mount_input))
+            self.fs_selector[name] = fs_combo
+            row_w = QWidget()
+            row_l = QHBoxLayout(row_w)
+            row_l.addWidget(mount_input)
+            row_l.addWidget(fs_combo)
+            form.addRow(QLabel(f"/dev/{name} — {size_mb} MB"), row_w)
         self.flow_layout.addLayout(form)
         self.format_checkbox = QCheckBox(self.tr['format_question'])
         self.format_checkbox.setChecked(True)
         self.flow_layout.addWidget(self.format_checkbox)
+        self.nodiscard_chk = QCheckBox(self.tr['no_discard'])
+        self.flow_layout.addWidget(self.nodiscard_chk)
         mbtn = QPushButton(self.tr['mount_button'])
         mbtn.clicked.connect(self.do_mount)
         self.flow_layout.addWidget(mbtn)
 
     def do_mount(self):
-        os.makedirs('/mnt', exist_ok=True)
         parts = {}
         for name, inp in self.rows_exist:
             mp = inp.text().strip()
@@ -731,80 +545,19 @@ class DiskManager(QWidget):
             QMessageBox.critical(self, self.tr['mount_error'], "Nie wybrano partycji root (/)")
             return
 
-        # root
-        dev_node, fstype = parts.pop('/')
-        if self.format_checkbox.isChecked():
-            cmd = self.build_mkfs_cmd(dev_node, fstype)
-            res = subprocess.run(cmd, capture_output=True, text=True)
-            if res.returncode:
-                QMessageBox.critical(self, 'Błąd formatowania', res.stderr.strip())
-                return
-        res = subprocess.run(['mount', dev_node, '/mnt'], capture_output=True, text=True)
-        if res.returncode:
-            QMessageBox.critical(self, 'Błąd montowania', res.stderr.strip())
-            return
-        self.console.append(f"✅ {dev_node} → /")
-
-        # Utwórz katalogi
-        for sub in ('boot', 'home'):
-            os.makedirs(f"/mnt/{sub}", exist_ok=True)
-
-        # Pozostałe MP (w tym SWAP)
-        for mp in sorted(parts.keys(), key=len):
-            # SWAP: specjalna ścieżka
-            if mp.lower() == 'swap':
-                dev_node, fstype = parts[mp]
-                if self.format_checkbox.isChecked():
-                    cmd = self.build_mkfs_cmd(dev_node, 'swap')
-                    res = subprocess.run(cmd, capture_output=True, text=True)
-                    if res.returncode:
-                        QMessageBox.critical(self, 'Błąd mkswap', res.stderr.strip())
-                        return
-                res = subprocess.run(['swapon', dev_node], capture_output=True, text=True)
-                if res.returncode:
-                    QMessageBox.critical(self, 'Błąd swapon', res.stderr.strip())
-                    return
-                self.console.append(f"✅ {dev_node} → swap (aktywowany)")
-                continue
-
-            dev_node, fstype = parts[mp]
-            tgt = f"/mnt{mp}"
-            os.makedirs(tgt, exist_ok=True)
-            if self.format_checkbox.isChecked():
-                cmd = self.build_mkfs_cmd(dev_node, fstype)
-                res = subprocess.run(cmd, capture_output=True, text=True)
-                if res.returncode:
-                    QMessageBox.critical(self, 'Błąd formatowania', res.stderr.strip())
-                    return
-            res = subprocess.run(['mount', dev_node, tgt], capture_output=True, text=True)
-            if res.returncode:
-                QMessageBox.critical(self, f'Błąd montowania {mp}', res.stderr.strip())
-                return
-            self.console.append(f"✅ {dev_node} → {mp}")
-
-        QMessageBox.information(self, self.tr['mount_done'], self.tr['mount_done_msg'])
-        self.cont_btn.setEnabled(True)
-
+        self.setEnabled(False)
+        submit(self._mount_job, parts, self.format_checkbox.isChecked(),
+               not self.nodiscard_chk.isChecked(),
+               on_done=self._on_mount_done, on_error=self._on_job_error,
+               on_log=self.console.append)
 
-def launch_next(lang, console):
-    script_dir = os.path.dirname(__file__)
-    files = sorted(f for f in os.listdir(script_dir) if re.match(r'^\d+_.*\.py$', f))
-    current = os.path.basename(__file__)
-    if current in files:
-        idx = files.index(current)
-        if idx+1 < len(files):
-            path = os.path.join(script_dir, files[idx+1])
-            spec = importlib.util.spec_from_file_location('mod', path)
-            mod  = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
-            if hasattr(mod, 'run'):
-                mod.run(lang, console)
-            else:
-                console.append(f"❌ Brak funkcji run() w {files[idx+1]}")
+    def _mount_job(self, job, parts, do_format, discard=True):
+        """Wątek roboczy: (opcjonalny) równoległy mkfs i montowanie istniejących partycji."""
+        disks.mount_existing(parts, do_format, discard=discard, log=job.log)
 
 
-def run(lang, console):
-    # Otwórz plik HTML w domyślnej przeglądarce
+def open_docs(lang, console):
+    """Otwórz plik HTML z dokumentacją w domyślnej przeglądarce."""
     script_dir = os.path.dirname(__file__)
     html_file = os.path.join(script_dir, f"{lang}.html")
 
@@ -832,14 +585,24 @@ def run(lang, console):
         console.append(f"⚠️ Plik dokumentacji nie istnieje: {html_file}")
         console.append("ℹ️ Kontynuuję instalację bez dokumentacji")
 
-    # Kontynuuj z głównym interfejsem zarządzania dyskiem
+
+def preload():
+    """Wątek roboczy (orkiestrator): lsblk + sysfs, zanim etap się pokaże."""
+    inventory().refresh()
+
+
+def build(lang, console, data=None):
+    return DiskManager(lang, console)
+
+
+def run(lang, console):
     app = QApplication.instance() or QApplication(sys.argv)
-    w = DiskManager(lang, console)
-    w.show()
-    app.exec_()
+    return stages.start(lang, console, first='2_manage_disks').widget
 
 
 if __name__ == '__main__':
     class DummyConsole:
         def append(self, txt): print(txt)
+    app = QApplication(sys.argv)
     run('pl', DummyConsole())
+    sys.exit(app.exec())
@@ -5,15 +5,23 @@ import os
 import sys
 import time
 import random
-import subprocess
 
 from PySide6.QtCore import Qt, QTimer, QRectF, QSize
-from PySide6.QtGui import QPainter, QColor, QFont, QFontDatabase
+from PySide6.QtGui import QPainter, QColor, QFont, QFontDatabase, QFontMetrics, QPixmap, QImage
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QPushButton,
-    QHBoxLayout, QMessageBox
+    QHBoxLayout, QMessageBox, QProgressBar
 )
 
+# wspólne moduły z AGHOS_Installer/aghos_installer (skrypt ładowany jest po ścieżce)
+_INSTALLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _INSTALLER_DIR not in sys.path:
+    sys.path.insert(0, _INSTALLER_DIR)
+
+from aghos_installer import trace, stages
+from aghos_installer.jobs import submit
+from aghos_installer.engine import finish
+
 # ---- Tłumaczenia tekstów UI ----
 TR = {
     "pl": {
@@ -24,6 +32,7 @@ TR = {
         "unmount": "Odmontuj i zostań w Live",
         "close": "Zamknij instalator",
         "syncing": "Kończę zapisy na dysk…",
+        "flush_status": "Zapisuję {mib:0.0f} MiB na {disks}",
         "flushed": "Zapisy zakończone.",
         "ask_reboot": "Czy na pewno chcesz teraz uruchomić ponownie komputer?",
         "unmounting": "Odmontowuję punkty montowania…",
@@ -40,6 +49,7 @@ TR = {
         "unmount": "Unmount and stay in Live",
         "close": "Close installer",
         "syncing": "Flushing file system buffers…",
+        "flush_status": "Writing {mib:0.0f} MiB to {disks}",
         "flushed": "Flush complete.",
         "ask_reboot": "Are you sure you want to reboot now?",
         "unmounting": "Unmounting targets…",
@@ -56,6 +66,7 @@ TR = {
         "unmount": "Aushängen und im Live-System bleiben",
         "close": "Installer beenden",
         "syncing": "Schreibe Puffer auf Datenträger…",
+        "flush_status": "Schreibe {mib:0.0f} MiB auf {disks}",
         "flushed": "Schreiben abgeschlossen.",
         "ask_reboot": "Möchtest du jetzt wirklich neu starten?",
         "unmounting": "Hänge Mountpoints aus…",
@@ -72,6 +83,7 @@ TR = {
         "unmount": "Desmontar y permanecer en Live",
         "close": "Cerrar instalador",
         "syncing": "Vaciando buffers al disco…",
+        "flush_status": "Escribiendo {mib:0.0f} MiB en {disks}",
         "flushed": "Vaciado completado.",
         "ask_reboot": "¿Seguro que quieres reiniciar ahora?",
         "unmounting": "Desmontando puntos…",
@@ -88,6 +100,7 @@ TR = {
         "unmount": "Démonter et rester en Live",
         "close": "Fermer l’installateur",
         "syncing": "Vidage des buffers sur le disque…",
+        "flush_status": "Écriture de {mib:0.0f} Mio sur {disks}",
         "flushed": "Vidage terminé.",
         "ask_reboot": "Voulez-vous vraiment redémarrer maintenant ?",
         "unmounting": "Démontage…",
@@ -101,6 +114,7 @@ TR = {
 AGHOS_BG = QColor(12, 15, 18)            # tło
 AGHOS_NEON = QColor(80, 180, 255)        # niebieski neon
 AGHOS_NEON_GLOW = QColor(80, 180, 255, 70)
+GLOW_PAD = 2                             # margines pixmapy na przesunięcia poświaty
 
 # ---- Generator runicznych linii ----
 
@@ -170,7 +184,20 @@ class RuneStream:
 
 # ---- Widget: przewijający się, świecący „terminal runiczny” ----
 
+def draw_glow_text(painter: QPainter, x: int, y: int, text: str):
+    """Tekst z poświatą: 7 przesuniętych półprzezroczystych kopii + właściwy tekst."""
+    painter.setPen(AGHOS_NEON_GLOW)
+    for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1), (0, 0), (2, 1), (-2, -1)):
+        painter.drawText(x + dx, y + dy, text)
+    painter.setPen(AGHOS_NEON)
+    painter.drawText(x, y, text)
+
 class RuneTerminal(QWidget):
+    """
+    Każda linia jest rysowana (z poświatą) raz, do pixmapy; klatka animacji
+    to tylko kopiowanie pixmap z przesunięciem. Timer stoi, gdy widżet jest
+    ukryty albo okno nie jest widoczne na ekranie.
+    """
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMinimumHeight(260)
@@ -179,57 +206,135 @@ class RuneTerminal(QWidget):
         self.font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
         self.font.setPointSize(12)
         self.font.setStyleStrategy(QFont.PreferDefault)
+        fm = QFontMetrics(self.font)
+        self.line_h = fm.lineSpacing()
+        self.ascent = fm.ascent()
 
         self.stream = RuneStream()
         self.lines = []
-        self.line_h = None
+        self.pixmaps = []
         self.offset = 0.0
         self.speed = 0.8  # px/tick
         self.timer = QTimer(self)
+        self.timer.setInterval(16)  # ~60 FPS, tylko gdy widoczny (showEvent)
         self.timer.timeout.connect(self._tick)
-        self.timer.start(16)  # ~60 FPS
 
         self._fill_initial()
 
     def sizeHint(self):
         return QSize(720, 320)
 
+    def _render_line(self, text: str) -> QPixmap:
+        fm = QFontMetrics(self.font)
+        dpr = self.devicePixelRatioF()
+        w = fm.horizontalAdvance(text) + 2 * GLOW_PAD
+        h = fm.height() + 2 * GLOW_PAD
+        pm = QPixmap(int(w * dpr) + 1, int(h * dpr) + 1)
+        pm.setDevicePixelRatio(dpr)
+        pm.fill(Qt.transparent)
+        p = QPainter(pm)
+        p.setFont(self.font)
+        draw_glow_text(p, GLOW_PAD, GLOW_PAD + self.ascent, text)
+        p.end()
+        return pm
+
+    def _push_line(self):
+        text = self.stream.next_line()
+        self.lines.append(text)
+        self.pixmaps.append(self._render_line(text))
+
     def _fill_initial(self):
-        fm = self.fontMetrics()
-        self.line_h = fm.lineSpacing()
         visible = max(5, int(self.height() / self.line_h) + 3)
-        self.lines = [self.stream.next_line() for _ in range(visible)]
+        # przy zmianie rozmiaru zostają już narysowane linie – dorabiamy tylko brakujące
+        while len(self.lines) > visible:
+            self.lines.pop(0)
+            self.pixmaps.pop(0)
+        while len(self.lines) < visible:
+            self._push_line()
 
     def resizeEvent(self, _):
         self._fill_initial()
         self.update()
 
-    def _tick(self):
+    def showEvent(self, e):
+        self.timer.start()
+        super().showEvent(e)
+
+    def hideEvent(self, e):
+        self.timer.stop()
+        super().hideEvent(e)
+
+    def _scroll(self):
         self.offset += self.speed
         if self.offset >= self.line_h:
             self.offset -= self.line_h
             self.lines.pop(0)
-            self.lines.append(self.stream.next_line())
-        self.update()
+            self.pixmaps.pop(0)
+            self._push_line()
 
-    def paintEvent(self, _):
-        painter = QPainter(self)
-        painter.fillRect(self.rect(), AGHOS_BG)
-        painter.setFont(self.font)
+    def _tick(self):
+        win = self.window().windowHandle()
+        if win is not None and not win.isExposed():
+            return  # okno zminimalizowane / poza ekranem – nie ma czego rysować
+        self._scroll()
+        self.update()
 
+    def _visible(self):
+        """(y linii bazowej, indeks) dla linii mieszczących się w widżecie."""
         y_base = self.height() - self.offset
-        for i in range(len(self.lines)-1, -1, -1):
-            y = y_base - (len(self.lines)-1 - i) * self.line_h
+        n = len(self.lines)
+        for i in range(n-1, -1, -1):
+            y = y_base - (n-1 - i) * self.line_h
             if y < -self.line_h or y > self.height() + self.line_h:
                 continue
-            self._draw_glow_text(painter, 16, int(y), self.lines[i])
+            yield int(y), i
 
-    def _draw_glow_text(self, painter: QPainter, x: int, y: int, text: str):
-        painter.setPen(AGHOS_NEON_GLOW)
-        for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1), (0, 0), (2, 1), (-2, -1)):
-            painter.drawText(x + dx, y + dy, text)
-        painter.setPen(AGHOS_NEON)
-        painter.drawText(x, y, text)
+    def paintEvent(self, _):
+        painter = QPainter(self)
+        self._paint(painter)
+        painter.end()
+
+    def _paint(self, painter: QPainter):
+        painter.fillRect(self.rect(), AGHOS_BG)
+        for y, i in self._visible():
+            painter.drawPixmap(16 - GLOW_PAD, y - self.ascent - GLOW_PAD, self.pixmaps[i])
+
+def _bench(frames: int = 600) -> int:
+    """
+    python scripts/4_finish.py --bench – czas klatki i CPU terminala runicznego:
+    z pixmapami linii oraz po staremu (8× drawText na linię w każdej klatce).
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication(sys.argv)
+    term = RuneTerminal()
+    term.resize(720, 320)
+    term._fill_initial()
+    img = QImage(term.size() * term.devicePixelRatioF(), QImage.Format_ARGB32_Premultiplied)
+    img.setDevicePixelRatio(term.devicePixelRatioF())
+
+    def uncached(p: QPainter):
+        p.fillRect(term.rect(), AGHOS_BG)
+        p.setFont(term.font)
+        for y, i in term._visible():
+            draw_glow_text(p, 16, y, term.lines[i])
+
+    for label, paint in (("pixmapy", term._paint), ("drawText", uncached)):
+        times = []
+        cpu0 = time.process_time()
+        for _ in range(frames):
+            t0 = time.perf_counter()
+            term._scroll()
+            p = QPainter(img)
+            paint(p)
+            p.end()
+            times.append(time.perf_counter() - t0)
+        cpu = time.process_time() - cpu0
+        times.sort()
+        print(f"{label:<9} klatka: mediana {times[len(times)//2]*1e3:0.2f} ms, "
+              f"p99 {times[int(len(times)*0.99)]*1e3:0.2f} ms; "
+              f"CPU {cpu/frames*1e3:0.2f} ms/klatkę (≈{cpu/frames*60*100:0.0f}% rdzenia przy 60 FPS)")
+    app.processEvents()
+    return 0
 
 # ---- Okno końcowe z przyciskami ----
 
@@ -269,6 +374,17 @@ class FinishWindow(QWidget):
         banner.setStyleSheet("color: rgb(120,180,255);")
         v.addWidget(banner)
 
+        # postęp zapisu buforów na dyski docelowe (widoczny tylko w trakcie)
+        self.flush_status = QLabel()
+        self.flush_status.setAlignment(Qt.AlignCenter)
+        self.flush_status.setStyleSheet("color: rgb(150,150,150);")
+        self.flush_bar = QProgressBar()
+        self.flush_bar.setRange(0, 100)
+        self.flush_status.hide()
+        self.flush_bar.hide()
+        v.addWidget(self.flush_status)
+        v.addWidget(self.flush_bar)
+
         btns = QHBoxLayout()
         self.btn_reboot = QPushButton(self.tr["reboot"])
         self.btn_unmount = QPushButton(self.tr["unmount"])
@@ -293,93 +409,71 @@ class FinishWindow(QWidget):
             QPushButton:pressed { background: rgb(30,34,40); }
         """)
 
-    def _flush_writes(self):
-        if self.console: self.console.append(self.tr["syncing"])
-        try:
-            subprocess.run(["sync"], check=False)
-            t0 = time.time()
-            while time.time() - t0 < 30:
-                dirty = writeback = 0
-                with open("/proc/meminfo") as f:
-                    for line in f:
-                        if line.startswith("Dirty:"):
-                            dirty = int(line.split()[1])
-                        elif line.startswith("Writeback:"):
-                            writeback = int(line.split()[1])
-                if dirty <= 4 and writeback <= 4:
-                    break
-                time.sleep(0.3)
-            subprocess.run(["udevadm", "settle"], check=False)
-        except Exception as e:
-            if self.console: self.console.append(f"⚠️ flush: {e}")
-        if self.console: self.console.append(self.tr["flushed"])
-
-    def _umount_all_under_mnt(self):
-        if self.console: self.console.append(self.tr["unmounting"])
-        targets = []
-        try:
-            out = subprocess.run(
-                ["findmnt", "-Rrno", "TARGET", "/mnt"],
-                capture_output=True, text=True, check=False
-            ).stdout.strip().splitlines()
-            extras = ["/mnt/tmp", "/mnt/run", "/mnt/dev", "/mnt/sys", "/mnt/proc",
-                      "/mnt/boot/efi", "/mnt/boot/EFI", "/mnt/boot", "/mnt/efi", "/mnt/home", "/mnt"]
-            for t in extras:
-                if t not in out:
-                    out.append(t)
-            targets = sorted(set(filter(os.path.exists, out)), key=lambda p: (-len(p), p))
-        except Exception:
-            targets = ["/mnt/tmp", "/mnt/run", "/mnt/dev", "/mnt/sys", "/mnt/proc",
-                       "/mnt/boot/efi", "/mnt/boot/EFI", "/mnt/boot", "/mnt/efi", "/mnt/home", "/mnt"]
-
-        failed = []
-        for t in targets:
-            res = subprocess.run(["umount", "-R", t], capture_output=True, text=True)
-            if res.returncode != 0:
-                if t != "/mnt":
-                    res2 = subprocess.run(["umount", "-l", t], capture_output=True, text=True)
-                    if res2.returncode != 0:
-                        failed.append((t, res.stderr or res2.stderr))
-                else:
-                    failed.append((t, res.stderr))
-        return failed
+    def on_enter(self):
+        self._log("✅ Instalacja zakończona — ekran finałowy gotowy.")
+
+    def _log(self, msg: str):
+        if self.console: self.console.append(msg)
+
+    def _set_busy(self, busy: bool):
+        for b in (self.btn_reboot, self.btn_unmount):
+            b.setEnabled(not busy)
+        self.flush_status.setText(self.tr["syncing"] if busy else "")
+        self.flush_bar.setValue(0)
+        self.flush_status.setVisible(busy)
+        self.flush_bar.setVisible(busy)
+
+    def _on_flush_progress(self, done, total, _rate: float):
+        if total:
+            self.flush_bar.setValue(min(100, int(done * 100 / total)))
+
+    def _finish_job(self, job):
+        """Wątek roboczy: opróżnienie buforów i odmontowanie /mnt (finish.finish)."""
+        return finish.finish(log=job.log, progress=job.report, status=job.status,
+                             status_fmt=self.tr["flush_status"],
+                             step=lambda key: job.log(self.tr[key]))
 
     def _on_reboot(self):
         if QMessageBox.question(self, self.tr["title"], self.tr["ask_reboot"],
                                 QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
             return
-        self._flush_writes()
-        self._umount_all_under_mnt()
-        try:
-            rc = subprocess.run(["systemctl", "reboot", "-i"]).returncode
-            if rc != 0:
-                subprocess.run(["reboot"])
-        except Exception:
-            subprocess.run(["reboot"])
+        self._set_busy(True)
+        submit(self._finish_job, on_done=lambda _failed: self._do_reboot(),
+               on_error=lambda _e: self._do_reboot(), on_log=self._log,
+               on_progress=self._on_flush_progress, on_status=self.flush_status.setText)
+
+    def _do_reboot(self):
+        trace.finish(log=self._log)
+        finish.reboot()
 
     def _on_unmount(self):
-        self._flush_writes()
-        failed = self._umount_all_under_mnt()
+        self._set_busy(True)
+        submit(self._finish_job, on_done=self._on_unmount_done,
+               on_error=lambda e: self._on_unmount_done([("/mnt", str(e))]), on_log=self._log,
+               on_progress=self._on_flush_progress, on_status=self.flush_status.setText)
+
+    def _on_unmount_done(self, failed):
+        self._set_busy(False)
+        trace.finish(log=self._log)
         if failed:
-            if self.console:
-                for t, err in failed:
-                    self.console.append(f"⚠️ umount {t}: {err.strip() if err else 'busy'}")
+            for t, err in failed:
+                self._log(f"⚠️ umount {t}: {err.strip() if err else 'busy'}")
             QMessageBox.warning(self, self.tr["title"], f"{self.tr['unmount_warn']}\n{self.tr['busy_processes']}")
         else:
             QMessageBox.information(self, self.tr["title"], self.tr["unmounted_ok"])
 
+def build(lang, console, data=None):
+    return FinishWindow(lang, console)
+
 def run(lang, console):
     app = QApplication.instance() or QApplication(sys.argv)
-    w = FinishWindow(lang, console)
-    w.show()
-    if hasattr(console, "append"):
-        console.append("✅ Instalacja zakończona — ekran finałowy gotowy.")
-    return w
+    return stages.start(lang, console, first="4_finish").widget
 
 if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        sys.exit(_bench())
     class DummyConsole:
         def append(self, txt): print(txt)
     app = QApplication(sys.argv)
-    w = FinishWindow("pl", DummyConsole())
-    w.show()
+    run("pl", DummyConsole())
     sys.exit(app.exec())